@@ -0,0 +1,194 @@
+import os
+import threading
+import logging
+from collections import OrderedDict
+import numpy as np
+import soundfile as sf
+from resampler import resample, DEFAULT_QUALITY
+from dsp import render
+from metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CACHE_BYTES = 256 * 1024 * 1024
+DEFAULT_STREAM_THRESHOLD_SECONDS = 30.0
+
+
+def match_channels(data, channels):
+    if data.ndim == 1:
+        data = data[:, np.newaxis]
+    if data.shape[1] == channels:
+        return data
+    if channels == 1:
+        return data.mean(axis=1, keepdims=True)
+    if data.shape[1] == 1:
+        return np.repeat(data, channels, axis=1)
+    return data[:, :channels]
+
+
+class AudioCache:
+    """Decoded PCM cache shared by every button.
+
+    Entries are keyed by (path, mtime, samplerate, channels, gain) so an edited
+    file, a different output rate or a new loudness gain never returns stale
+    audio. Per-file gains are baked into the decoded PCM, so applying them
+    costs nothing at play time. The total size of the
+    cached arrays is kept under ``max_bytes`` by evicting the least recently
+    used entries.
+    """
+
+    def __init__(self, max_bytes=DEFAULT_CACHE_BYTES, quality=DEFAULT_QUALITY):
+        self.max_bytes = max_bytes
+        self.quality = quality
+        self.stream_threshold_seconds = DEFAULT_STREAM_THRESHOLD_SECONDS
+        self._durations = {}
+        self._gains = {}
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def make_key(self, path, samplerate=None, channels=None):
+        path, mtime = os.path.abspath(path), os.path.getmtime(path)
+        return (path, mtime, samplerate, channels, self._gains.get((path, mtime), 1.0))
+
+    def gain_for(self, path):
+        return self._gains.get((os.path.abspath(path), os.path.getmtime(path)), 1.0)
+
+    def set_gain(self, path, mtime, gain):
+        """Apply a linear gain to a file whenever its on-disk mtime matches."""
+        key = (os.path.abspath(path), mtime)
+        if self._gains.get(key, 1.0) == gain:
+            return
+        self._gains[key] = gain
+        self.invalidate(path)
+
+    def clear_gains(self):
+        self._gains.clear()
+        self.clear()
+
+    def load(self, path, samplerate=None, channels=None):
+        """Return (data, samplerate) for path, decoding only on a cache miss.
+
+        The returned array is shared between callers and marked read-only.
+        """
+        key = self.make_key(path, samplerate, channels)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry
+            self.misses += 1
+        data, fs = self.decode(path, samplerate, channels, key[4])
+        with self._lock:
+            self._store(key, (data, fs))
+        return data, fs
+
+    def render(self, path, base, samplerate, channels, params):
+        """base (the clip decoded at samplerate/channels) with the trim, pitch and speed of params.
+
+        Renders are cached next to the decoded clips, keyed on those
+        parameters, so editing a button's settings re-renders from memory
+        instead of decoding the file again.
+        """
+        key = self.make_key(path, samplerate, channels) + params.structure()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+            self.misses += 1
+        data = render(base, samplerate, params, self.quality)
+        with self._lock:
+            self._store(key, (data, samplerate))
+        return data
+
+    def duration(self, path):
+        key = (os.path.abspath(path), os.path.getmtime(path))
+        duration = self._durations.get(key)
+        if duration is None:
+            duration = sf.info(path).duration
+            self._durations[key] = duration
+        return duration
+
+    def should_stream(self, path):
+        """True if path is long enough to be streamed from disk instead of cached."""
+        return self.duration(path) > self.stream_threshold_seconds
+
+    def decode(self, path, samplerate=None, channels=None, gain=1.0):
+        with metrics.span('decode'):
+            data, fs = sf.read(path, dtype='float32')
+        if channels is not None:
+            data = match_channels(data, channels)
+        if samplerate is not None and fs != samplerate:
+            with metrics.span('resample'):
+                data = resample(data, fs, samplerate, self.quality)
+            fs = samplerate
+        data = np.ascontiguousarray(data, dtype=np.float32)
+        if gain != 1.0:
+            data = data * np.float32(gain)
+        data.setflags(write=False)
+        return data, fs
+
+    def _store(self, key, entry):
+        if key in self._entries:
+            self._entries.move_to_end(key)
+            return
+        size = entry[0].nbytes
+        if size > self.max_bytes:
+            logger.debug(f"Not caching {key[0]}: {size} bytes exceeds cache budget")
+            return
+        self._entries[key] = entry
+        self.current_bytes += size
+        self._evict()
+
+    def _evict(self):
+        while self.current_bytes > self.max_bytes and self._entries:
+            key, (data, _) = self._entries.popitem(last=False)
+            self.current_bytes -= data.nbytes
+            self.evictions += 1
+            logger.debug(f"Evicted {key[0]} from audio cache")
+
+    def set_max_bytes(self, max_bytes):
+        with self._lock:
+            self.max_bytes = max_bytes
+            self._evict()
+
+    def set_quality(self, quality):
+        if quality != self.quality:
+            self.quality = quality
+            self.clear()
+
+    def invalidate(self, path):
+        if not path:
+            return
+        path = os.path.abspath(path)
+        with self._lock:
+            for key in [k for k in self._entries if k[0] == path]:
+                data, _ = self._entries.pop(key)
+                self.current_bytes -= data.nbytes
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.current_bytes = 0
+
+    def stats(self):
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'bytes': self.current_bytes,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / (self.hits + self.misses) if self.hits + self.misses else 0.0,
+                'evictions': self.evictions,
+            }
+
+
+audio_cache = AudioCache()
+metrics.register('audio_cache', audio_cache.stats)
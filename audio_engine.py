@@ -0,0 +1,455 @@
+import time
+import queue
+import itertools
+import threading
+from collections import deque
+import logging
+import numpy as np
+from metrics import metrics, Histogram
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BLOCKSIZE = 512
+# Beyond this many simultaneous voices the oldest is dropped, so callback time stays bounded
+DEFAULT_MAX_VOICES = 64
+# Callbacks while a stream fills its buffers come in a burst; clock rate is measured from after this
+CLOCK_SETTLE_SECONDS = 2.0
+
+
+class Voice:
+    """Scheduling state every voice carries; subclasses implement read().
+
+    start_frame and stop_frame are positions on the engine's output timeline
+    (see AudioEngine.schedule_frame): None starts the voice with the next
+    block and plays it to the end. key identifies the button that started
+    it and mode is that button's PlayMode, for retriggers and choke groups.
+    """
+    voice_id = None
+    start_frame = None
+    stop_frame = None
+    # Timeline frame the first sample was actually mixed at
+    started_frame = None
+    key = None
+    mode = None
+    trigger_time = None
+    play_record = None
+    finished = False
+
+    def close(self):
+        pass
+
+
+class BufferVoice(Voice):
+    def __init__(self, data, voice_id, gain=1.0, loop=False):
+        if data.ndim == 1:
+            data = data[:, np.newaxis]
+        self.data = data
+        self.voice_id = voice_id
+        # Cached clips have their gain baked in; memory-mapped ones are scaled per block
+        self.gain = np.float32(gain)
+        self.loop = loop and len(data) > 0
+        self.trigger_time = None
+        self.play_record = None
+        self.position = 0
+        self.finished = False
+
+    def read(self, frames):
+        chunk = self.data[self.position:self.position + frames]
+        self.position += len(chunk)
+        if self.position >= len(self.data):
+            if self.loop:
+                chunk = self._wrap(chunk, frames)
+            else:
+                self.finished = True
+        if self.gain != 1.0:
+            return chunk * self.gain
+        return chunk
+
+    def _wrap(self, chunk, frames):
+        # Continue from the top in the same block, so the loop point is seamless
+        parts = [chunk]
+        remaining = frames - len(chunk)
+        self.position = 0
+        while remaining > 0:
+            part = self.data[:remaining]
+            parts.append(part)
+            remaining -= len(part)
+            self.position = len(part) % len(self.data)
+        return np.concatenate(parts)
+
+
+class AudioEngine:
+    """Long-lived output stream that mixes every playing voice in its callback.
+
+    The UI never touches the voice list directly: play, stop and stop_all only
+    put commands on a queue that the audio callback drains at the start of
+    each block, so none of them block the GUI thread.
+
+    Voices are placed on a timeline counted in output frames. A voice with a
+    start_frame begins at that exact offset inside the block that contains
+    it, so when it starts depends on the audio clock and not on when the
+    GUI or a trigger thread got around to sending the command. Queued voices
+    play one after another on a single lane, each starting on the frame the
+    previous one ended.
+    """
+
+    def __init__(self, device=None, info=None, blocksize=DEFAULT_BLOCKSIZE, max_voices=DEFAULT_MAX_VOICES, gain=1.0):
+        if info is None:
+            import sounddevice as sd
+            info = sd.query_devices(device, 'output')
+        self.device = device
+        self.device_name = info['name']
+        self.samplerate = int(info['default_samplerate'])
+        self.channels = max(1, min(2, info['max_output_channels']))
+        self.blocksize = blocksize
+        self.max_voices = max_voices
+        self.gain = gain
+        self.voices_stolen = 0
+        # Extra outputs (e.g. headphones) that every clip started on this engine also plays on
+        self.monitors = []
+        self.stream = None
+        # Plays from the GUI, trigger and daemon threads may all be first to start the stream
+        self._stream_lock = threading.Lock()
+        self.voices = []
+        self.commands = queue.SimpleQueue()
+        self._ids = itertools.count(1)
+        self.underruns = 0
+        self.callbacks = 0
+        self.callback_time_total = 0.0
+        self.callback_time_max = 0.0
+        # Seconds from a trigger event to the callback that renders its first sample
+        self.trigger_latencies = deque(maxlen=256)
+        # Only filled while metrics are enabled; written by the audio callback alone
+        self.callback_times = Histogram()
+        self.first_buffer_times = Histogram()
+        self._output_latency = 0.0
+        self.frames_played = 0
+        self._clock_start = None
+        self._clock_last = None
+        # Timeline frame of the next block to be mixed, and the perf_counter time it was reached
+        self.mix_frame = 0
+        self._mix_clock = None
+        # Queued voices waiting for the one on the lane to finish
+        self.queue = deque()
+        self._lane = None
+        # Frames each scheduled voice started after its start_frame; 0 unless its command missed the block
+        self.schedule_errors = deque(maxlen=256)
+        self.scheduled_starts = 0
+        self.late_starts = 0
+
+    def start(self):
+        with self._stream_lock:
+            if self.stream is not None:
+                return
+            import sounddevice as sd  # deferred so that importing the engine does not initialise PortAudio
+            self.stream = self._open_stream(sd)
+            self.stream.start()
+            self._output_latency = self.output_latency()
+
+    def _open_stream(self, sd):
+        logger.debug(f"Starting audio engine on {self.device_name} ({self.samplerate} Hz, {self.channels} ch)")
+        return sd.OutputStream(
+            samplerate=self.samplerate,
+            device=self.device,
+            channels=self.channels,
+            dtype='float32',
+            blocksize=self.blocksize,
+            callback=self._callback
+        )
+
+    def close(self):
+        with self._stream_lock:
+            if self.stream is None:
+                return
+            self.stream.stop()
+            self.stream.close()
+            self.stream = None
+        for voice in self.voices + list(self.queue):
+            voice.close()
+        self.voices = []
+        self.queue.clear()
+        self._lane = None
+        self._mix_clock = None
+        logger.debug(f"Audio engine on {self.device_name} closed: {self.stats()}")
+
+    def next_voice_id(self):
+        return next(self._ids)
+
+    def schedule_frame(self, when=None):
+        """Timeline frame for an event at perf_counter time when (default now), or None before the first block.
+
+        The event keeps its position within the block period: it sounds one
+        block after the callback clock reached it, so how long the command
+        takes to arrive only matters if it misses that block.
+        """
+        clock = self._mix_clock
+        if clock is None:
+            return None
+        frame, at = clock
+        when = time.perf_counter() if when is None else when
+        return frame + int(round((when - at) * self.samplerate))
+
+    def play(self, data, gain=1.0):
+        return self.play_voice(BufferVoice(data, self.next_voice_id(), gain))
+
+    def play_voice(self, voice):
+        self.start()
+        self.commands.put(('play', voice))
+        return voice.voice_id
+
+    def is_idle(self):
+        """True if no voice is playing, queued or about to be."""
+        return not self.voices and not self.queue and self.commands.empty()
+
+    def stop(self, voice_id):
+        self.commands.put(('stop', voice_id))
+        for monitor in self.monitors:
+            monitor.stop(voice_id)
+
+    def stop_all(self):
+        self.commands.put(('stop_all', None))
+        for monitor in self.monitors:
+            monitor.stop_all()
+
+    def _handle_commands(self):
+        while True:
+            try:
+                command, arg = self.commands.get_nowait()
+            except queue.Empty:
+                return
+            if command == 'play':
+                if not self._retrigger(arg):
+                    arg.close()
+                elif arg.mode is not None and arg.mode.queue and self._lane is not None:
+                    # Its latency is the queue's doing, not the trigger's
+                    arg.trigger_time = arg.play_record = None
+                    self.queue.append(arg)
+                else:
+                    if arg.mode is not None and arg.mode.queue:
+                        self._lane = arg
+                    self._start_voice(arg)
+            elif command == 'stop':
+                for voice in self.voices:
+                    if voice.voice_id == arg:
+                        voice.close()
+                self.voices = [v for v in self.voices if v.voice_id != arg]
+                self.queue = deque(v for v in self.queue if v.voice_id != arg)
+                if self._lane is not None and self._lane.voice_id == arg:
+                    self._next_in_lane(self.mix_frame)
+            elif command == 'stop_all':
+                for voice in self.voices + list(self.queue):
+                    voice.close()
+                self.voices = []
+                self.queue.clear()
+                self._lane = None
+
+    def _retrigger(self, voice):
+        """Apply the retrigger mode of voice's button; False if voice should not play."""
+        mode = voice.mode
+        if mode is None or voice.key is None or mode.retrigger == 'overlap':
+            return True
+        playing = [v for v in self.voices if v.key == voice.key and v.stop_frame is None and not v.finished]
+        queued = [v for v in self.queue if v.key == voice.key]
+        if not playing and not queued:
+            return True
+        if mode.retrigger == 'ignore':
+            return False
+        at = voice.start_frame if voice.start_frame is not None else self.mix_frame
+        for other in playing:
+            self._stop_at(other, at)
+        if queued:
+            self.queue = deque(v for v in self.queue if v.key != voice.key)
+            for other in queued:
+                other.close()
+        # toggle: the press that finds the button playing only stops it
+        return mode.retrigger == 'restart'
+
+    def _start_voice(self, voice):
+        """Add voice to the mix, cutting off its choke group from its first frame."""
+        if voice.mode is not None and voice.mode.choke_group:
+            at = voice.start_frame if voice.start_frame is not None else self.mix_frame
+            for other in self.voices:
+                if other.mode is not None and other.mode.choke_group == voice.mode.choke_group:
+                    self._stop_at(other, at)
+        if voice.trigger_time is not None:
+            self.trigger_latencies.append(time.perf_counter() - voice.trigger_time)
+        if voice.play_record is not None:
+            first_buffer = time.perf_counter() - voice.play_record['start'] + self._output_latency
+            voice.play_record['first_buffer_ms'] = first_buffer * 1000
+            self.first_buffer_times.observe(first_buffer)
+        self.voices.append(voice)
+        # Finished voices stay listed until the end of the block being mixed, so they are not counted
+        if sum(not v.finished for v in self.voices) > self.max_voices:
+            oldest = next(v for v in self.voices if not v.finished)
+            self.voices_stolen += 1
+            self._finish(oldest, self.mix_frame)
+
+    def _finish(self, voice, frame):
+        """Drop voice from the mix; if it holds the queue lane, the next queued voice starts at frame.
+
+        Marked rather than removed: this may run while a block is being mixed.
+        """
+        voice.finished = True
+        voice.close()
+        if voice is self._lane:
+            self._next_in_lane(frame)
+
+    def _stop_at(self, voice, frame):
+        if voice.stop_frame is not None and voice.stop_frame <= frame:
+            return
+        if voice.started_frame is None and (voice.start_frame is None or voice.start_frame >= frame):
+            # Cut off before its first sample
+            self._finish(voice, frame)
+            return
+        voice.stop_frame = frame
+
+    def _next_in_lane(self, frame):
+        """Start the next queued voice at frame, where the one before it ended."""
+        self._lane = None
+        if self.queue:
+            voice = self.queue.popleft()
+            voice.start_frame = frame
+            self._lane = voice
+            self._start_voice(voice)
+
+    def _callback(self, outdata, frames, time_info, status):
+        start = time.perf_counter()
+        if status.output_underflow:
+            self.underruns += 1
+        self._track_clock(frames)
+        if self._mix_voices(outdata, frames):
+            if self.gain != 1.0:
+                outdata *= self.gain
+            np.clip(outdata, -1.0, 1.0, out=outdata)
+        self._record_callback(start)
+
+    def _mix_voices(self, outdata, frames):
+        self._handle_commands()
+        outdata.fill(0)
+        block_start = self.mix_frame
+        self.mix_frame += frames
+        self._mix_clock = (self.mix_frame, time.perf_counter())
+        if not self.voices:
+            return False
+        # Voices the lane starts mid-block are appended to the list and mixed in this same pass
+        for voice in self.voices:
+            if voice.finished:
+                if voice is self._lane:
+                    self._next_in_lane(block_start)
+                continue
+            offset = 0
+            if voice.started_frame is None:
+                offset = self._start_offset(voice, block_start, frames)
+                if offset is None:
+                    continue
+            end = frames
+            stopping = voice.stop_frame is not None and voice.stop_frame - block_start < frames
+            if stopping:
+                end = max(offset, voice.stop_frame - block_start)
+            chunk = voice.read(end - offset)
+            outdata[offset:offset + len(chunk)] += chunk
+            if stopping:
+                voice.finished = True
+                voice.close()
+            if voice.finished and voice is self._lane:
+                self._next_in_lane(block_start + offset + len(chunk))
+        self.voices = [v for v in self.voices if not v.finished]
+        return True
+
+    def _start_offset(self, voice, block_start, frames):
+        """Offset into this block where voice starts, or None if it is due in a later block."""
+        offset = 0
+        if voice.start_frame is not None:
+            offset = voice.start_frame - block_start
+            if offset >= frames:
+                return None
+            self.scheduled_starts += 1
+            if offset < 0:
+                self.late_starts += 1
+                offset = 0
+            self.schedule_errors.append(block_start + offset - voice.start_frame)
+        voice.started_frame = block_start + offset
+        return offset
+
+    def _track_clock(self, frames):
+        now = time.perf_counter()
+        if self._clock_start is None:
+            self._clock_start = (now, self.frames_played)
+        elif self._clock_last is None and now - self._clock_start[0] >= CLOCK_SETTLE_SECONDS:
+            # Start measuring afresh once the initial buffer fill is over
+            self._clock_start = (now, self.frames_played)
+            self._clock_last = self._clock_start
+        elif self._clock_last is not None:
+            self._clock_last = (now, self.frames_played)
+        self.frames_played += frames
+
+    def clock_ratio(self, min_seconds=0.0):
+        """Measured rate of the device clock over its nominal rate, or None until measured for min_seconds.
+
+        Frames consumed are timed against perf_counter, so comparing two
+        engines' ratios gives their drift against each other.
+        """
+        start, last = self._clock_start, self._clock_last
+        if last is None or last[0] - start[0] < max(min_seconds, 1e-3):
+            return None
+        return (last[1] - start[1]) / (last[0] - start[0]) / self.samplerate
+
+    def _record_callback(self, start):
+        elapsed = time.perf_counter() - start
+        self.callbacks += 1
+        self.callback_time_total += elapsed
+        if elapsed > self.callback_time_max:
+            self.callback_time_max = elapsed
+        if metrics.enabled:
+            self.callback_times.observe(elapsed)
+
+    def output_latency(self):
+        latency = self.stream.latency
+        # Duplex streams report an (input, output) pair
+        return latency[1] if isinstance(latency, tuple) else latency
+
+    def stats(self):
+        block_time = self.blocksize / self.samplerate
+        avg = self.callback_time_total / self.callbacks if self.callbacks else 0.0
+        return {
+            'mode': 'loopback',
+            'device': self.device_name,
+            'samplerate': self.samplerate,
+            'active_voices': len(self.voices),
+            'voices_stolen': self.voices_stolen,
+            'gain': self.gain,
+            'underruns': self.underruns,
+            'callbacks': self.callbacks,
+            'callback_time_avg_ms': avg * 1000,
+            'callback_time_max_ms': self.callback_time_max * 1000,
+            'load': avg / block_time if block_time else 0.0,
+            'output_latency_ms': self.output_latency() * 1000 if self.stream is not None else None,
+            'queued': len(self.queue),
+            **self.trigger_latency_stats(),
+            **self.schedule_stats(),
+        }
+
+    def schedule_stats(self):
+        """How late scheduled voices started after their start_frame, in ms; bounded by one block."""
+        if not self.schedule_errors:
+            return {}
+        errors = sorted(self.schedule_errors)
+        return {
+            'scheduled_starts': self.scheduled_starts,
+            'late_starts': self.late_starts,
+            'schedule_late_p95_ms': errors[int(0.95 * (len(errors) - 1))] / self.samplerate * 1000,
+            'schedule_late_max_ms': errors[-1] / self.samplerate * 1000,
+        }
+
+    def trigger_latency_stats(self):
+        """Trigger-to-first-sample latency: time to reach the callback plus the output latency."""
+        if not self.trigger_latencies or self.stream is None:
+            return {}
+        latencies = sorted(self.trigger_latencies)
+        output = self.output_latency()
+        return {
+            'triggers': len(latencies),
+            'trigger_latency_avg_ms': (sum(latencies) / len(latencies) + output) * 1000,
+            'trigger_latency_p95_ms': (latencies[int(0.95 * (len(latencies) - 1))] + output) * 1000,
+            'trigger_latency_max_ms': (latencies[-1] + output) * 1000,
+        }
@@ -0,0 +1,184 @@
+import os
+import threading
+import logging
+import numpy as np
+import soundfile as sf
+from audio_cache import match_channels
+from resampler import StreamingResampler, DEFAULT_QUALITY
+from audio_engine import Voice
+
+logger = logging.getLogger(__name__)
+
+READ_BLOCK_FRAMES = 8192
+BUFFER_SECONDS = 2.0
+FIRST_BLOCK_TIMEOUT = 1.0
+
+
+class RingBuffer:
+    """Single-producer/single-consumer frame ring buffer.
+
+    The reader thread only advances ``write_pos`` and the audio callback only
+    advances ``read_pos``, so neither side needs a lock.
+    """
+
+    def __init__(self, frames, channels):
+        self.data = np.zeros((frames, channels), dtype=np.float32)
+        self.size = frames
+        self.read_pos = 0
+        self.write_pos = 0
+
+    def available(self):
+        return self.write_pos - self.read_pos
+
+    def free(self):
+        return self.size - self.available()
+
+    def write(self, block):
+        start = self.write_pos % self.size
+        first = min(len(block), self.size - start)
+        self.data[start:start + first] = block[:first]
+        self.data[:len(block) - first] = block[first:]
+        self.write_pos += len(block)
+
+    def read(self, frames):
+        frames = min(frames, self.available())
+        start = self.read_pos % self.size
+        first = min(frames, self.size - start)
+        if first == frames:
+            chunk = self.data[start:start + frames].copy()
+        else:
+            chunk = np.concatenate((self.data[start:], self.data[:frames - first]))
+        self.read_pos += frames
+        return chunk
+
+
+class StreamReader:
+    """Decodes a file once on a reader thread and feeds every output playing it.
+
+    Each output reads its own StreamVoice, with its own ring buffer, so a
+    clip streamed to the main output and its monitors is opened and decoded
+    once. Outputs sharing a sample rate and channel count share one
+    resampler; an output in the file's own format is not resampled at all.
+    The reader keeps pace with the first output still playing; an output
+    that falls a whole buffer behind it drops blocks rather than holding up
+    the others. Memory use is bounded by the ring buffers, and playback can
+    start as soon as the first block is decoded, however long the file is.
+    """
+
+    def __init__(self, path, quality=DEFAULT_QUALITY, gain=1.0, start=0.0, end=None, speed=1.0, loop=False):
+        self.path = path
+        # Trim points in seconds of the file, and a tape-style speed change
+        self.start_time = start
+        self.end_time = end
+        self.speed = speed
+        self.loop = loop
+        self.gain = np.float32(gain)
+        self.quality = quality
+        self.voices = []
+        self.eof = False
+        self._space = threading.Event()
+        self._ready = threading.Event()
+        self._thread = threading.Thread(target=self._reader, name=f'stream-{os.path.basename(path)}', daemon=True)
+
+    def add_output(self, samplerate, channels, voice_id):
+        """A voice playing the stream at samplerate and channels; add every output before start."""
+        voice = StreamVoice(self, samplerate, channels, voice_id)
+        self.voices.append(voice)
+        return voice
+
+    def start(self):
+        self._thread.start()
+        self._ready.wait(FIRST_BLOCK_TIMEOUT)
+
+    def _reader(self):
+        try:
+            with sf.SoundFile(self.path) as f:
+                # Reading the file as if it were recorded at a higher rate plays it faster
+                source_rate = int(round(f.samplerate * self.speed))
+                # (samplerate, channels) -> (resampler or None, voices in that format)
+                formats = {}
+                for voice in self.voices:
+                    formats.setdefault((voice.samplerate, voice.channels), []).append(voice)
+                groups = [(StreamingResampler(source_rate, samplerate, channels, self.quality)
+                           if samplerate != source_rate else None, channels, voices)
+                          for (samplerate, channels), voices in formats.items()]
+                first = min(int(self.start_time * f.samplerate), f.frames)
+                frames = -1 if self.end_time is None else max(0, int(self.end_time * f.samplerate) - first)
+                while True:
+                    f.seek(first)
+                    for block in f.blocks(READ_BLOCK_FRAMES, frames=frames, dtype='float32', always_2d=True):
+                        if self.gain != 1.0:
+                            block = block * self.gain
+                        if not self._fan_out([(channels, voices, match_channels(block, channels)
+                                               if resampler is None else
+                                               resampler.process(match_channels(block, channels)))
+                                              for resampler, channels, voices in groups]):
+                            return
+                    # A loop goes back to the start point through the same resamplers, so there is no seam
+                    if not self.loop or f.tell() == first:
+                        break
+                self._fan_out([(channels, voices, resampler.flush())
+                               for resampler, channels, voices in groups if resampler is not None])
+        except Exception as e:
+            logger.error(f"Streaming error for {self.path}: {e}")
+        finally:
+            self.eof = True
+            self._ready.set()
+
+    def _fan_out(self, blocks):
+        """Push each output's block; False once every output has been closed."""
+        leader = next((voice for voice in self.voices if not voice.closed), None)
+        if leader is None:
+            return False
+        for channels, voices, block in blocks:
+            for voice in voices:
+                if voice is leader:
+                    self._push(voice, block)
+                elif not voice.closed:
+                    kept = min(len(block), voice.ring.free())
+                    voice.ring.write(block[:kept])
+                    voice.dropped += len(block) - kept
+        self._ready.set()
+        return True
+
+    def _push(self, voice, block):
+        while len(block) and not voice.closed:
+            self._space.clear()
+            free = voice.ring.free()
+            if free == 0:
+                self._space.wait(0.1)
+                continue
+            voice.ring.write(block[:free])
+            block = block[free:]
+
+
+class StreamVoice(Voice):
+    """One output's view of a StreamReader, read by that output's audio callback."""
+
+    def __init__(self, reader, samplerate, channels, voice_id):
+        self.reader = reader
+        self.samplerate = samplerate
+        self.channels = channels
+        self.voice_id = voice_id
+        self.ring = RingBuffer(int(BUFFER_SECONDS * samplerate), channels)
+        self.trigger_time = None
+        self.play_record = None
+        self.finished = False
+        self.closed = False
+        self.underruns = 0
+        # Frames the reader could not buffer because this output had fallen behind
+        self.dropped = 0
+
+    def read(self, frames):
+        chunk = self.ring.read(frames)
+        self.reader._space.set()
+        if len(chunk) < frames:
+            if self.reader.eof and self.ring.available() == 0:
+                self.finished = True
+            else:
+                self.underruns += 1
+        return chunk
+
+    def close(self):
+        self.closed = True
+        self.reader._space.set()
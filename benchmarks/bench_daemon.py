@@ -0,0 +1,134 @@
+"""Load-test soundboard_daemon: many clients firing play requests over the Unix socket.
+
+The daemon runs in-process on a fake output stream clocked in real time,
+with a throwaway database holding one board of short clips.
+Usage: python benchmarks/bench_daemon.py [--clients 8] [--rate 500] [--seconds 5]
+"""
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+import tempfile
+import threading
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from fakes import install_fake_sounddevice, RealtimeClock
+install_fake_sounddevice()
+
+import numpy as np
+import soundfile as sf
+from soundboard_db import SoundboardDB
+from soundboard_core import SoundboardCore
+from soundboard_daemon import SoundboardDaemon
+
+
+def make_board(tmp, clips):
+    db = SoundboardDB(os.path.join(tmp, 'bench.db'))
+    buttons = []
+    for i in range(clips):
+        path = os.path.join(tmp, f'clip{i}.wav')
+        sf.write(path, np.full((2400, 2), 0.01, dtype=np.float32), 44100)
+        buttons.append({'label': f'Clip {i}', 'audio_path': path, 'row': i // 4, 'col': i % 4})
+    config_id = db.save_config('bench', buttons, (clips + 3) // 4, 4)
+    db.set_last_used_config(config_id)
+    return db
+
+
+def run_daemon(daemon, ready, stop):
+    async def serve():
+        await daemon.start()
+        ready.set()
+        while not stop.is_set():
+            await asyncio.sleep(0.05)
+        await daemon.close()
+    asyncio.run(serve())
+
+
+async def client(socket_path, index, rate, seconds, clips, latencies):
+    reader, writer = await asyncio.open_unix_connection(socket_path)
+    sent = {}
+
+    async def receive():
+        while len(latencies[index]) < expected:
+            line = await reader.readline()
+            if not line:
+                return
+            response = json.loads(line)
+            latencies[index].append((time.perf_counter() - sent.pop(response['id']), response['ok']))
+
+    expected = int(rate * seconds)
+    receiver = asyncio.ensure_future(receive())
+    start = time.perf_counter()
+    for n in range(expected):
+        # Paced sends: every client fires at rate per second
+        delay = start + n / rate - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        sent[n] = time.perf_counter()
+        writer.write(json.dumps({'id': n, 'cmd': 'play', 'label': f'Clip {(index + n) % clips}'}).encode() + b'\n')
+    await writer.drain()
+    await asyncio.wait_for(receiver, timeout=10)
+    writer.close()
+
+
+async def stats(socket_path):
+    reader, writer = await asyncio.open_unix_connection(socket_path)
+    writer.write(b'{"cmd": "stats"}\n')
+    response = json.loads(await reader.readline())
+    writer.close()
+    return response
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--clients', type=int, default=8)
+    parser.add_argument('--rate', type=float, default=500, help="Total play requests per second")
+    parser.add_argument('--seconds', type=float, default=5)
+    parser.add_argument('--clips', type=int, default=16)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        core = SoundboardCore(make_board(tmp, args.clips))
+        core.load_last_used_config()
+        clock = RealtimeClock(core.get_engine().stream).start()
+        socket_path = os.path.join(tmp, 'daemon.sock')
+        daemon = SoundboardDaemon(core, socket_path)
+        ready, stop = threading.Event(), threading.Event()
+        server = threading.Thread(target=run_daemon, args=(daemon, ready, stop))
+        server.start()
+        ready.wait()
+
+        latencies = [[] for _ in range(args.clients)]
+
+        async def load():
+            await asyncio.gather(*(client(socket_path, i, args.rate / args.clients, args.seconds, args.clips, latencies)
+                                   for i in range(args.clients)))
+            return await stats(socket_path)
+
+        started = time.perf_counter()
+        result = asyncio.run(load())
+        elapsed = time.perf_counter() - started
+        stop.set()
+        server.join()
+        clock.stop()
+        core.close()
+
+    samples = sorted(latency for per_client in latencies for latency, ok in per_client)
+    failures = sum(1 for per_client in latencies for _, ok in per_client if not ok)
+    engine = result['engine'] or {}
+    print(f"{len(samples)} requests from {args.clients} clients in {elapsed:.1f} s "
+          f"({len(samples) / elapsed:.0f}/s), {failures} failed")
+    for name, q in (('p50', 0.5), ('p95', 0.95), ('p99', 0.99), ('max', 1.0)):
+        print(f"  request {name}: {samples[int(q * (len(samples) - 1))] * 1000:.2f} ms")
+    for key in ('trigger_latency_avg_ms', 'trigger_latency_p95_ms', 'trigger_latency_max_ms',
+                'callback_time_max_ms', 'voices_stolen', 'underruns'):
+        if key in engine:
+            print(f"  {key}: {engine[key]:.2f}" if isinstance(engine[key], float) else f"  {key}: {engine[key]}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,93 @@
+"""Benchmark SoundboardDB saves/loads with large boards and many configs.
+
+Usage: python benchmarks/bench_db.py [--configs 200] [--buttons 2000]
+"""
+import os
+import sys
+import time
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from soundboard_db import SoundboardDB
+
+
+class LegacySoundboardDB(SoundboardDB):
+    # Write paths as they were before WAL, executemany and the settings cache
+
+    def set_setting(self, key, value):
+        cur = self.conn.cursor()
+        cur.execute('INSERT OR REPLACE INTO settings (key, value) VALUES (?, ?)', (key, str(value)))
+        self.conn.commit()
+
+    def set_last_used_config(self, config_id):
+        cur = self.conn.cursor()
+        cur.execute('UPDATE configurations SET last_used=0')
+        cur.execute('UPDATE configurations SET last_used=1 WHERE id=?', (config_id,))
+        self.conn.commit()
+
+    def save_config(self, name, buttons, rows, cols):
+        cur = self.conn.cursor()
+        cur.execute('INSERT OR IGNORE INTO configurations (name) VALUES (?)', (name,))
+        cur.execute('SELECT id FROM configurations WHERE name=?', (name,))
+        config_id = cur.fetchone()[0]
+        cur.execute('DELETE FROM buttons WHERE config_id=?', (config_id,))
+        for btn in buttons:
+            cur.execute('INSERT INTO buttons (config_id, label, audio_path, row, col) VALUES (?, ?, ?, ?, ?)',
+                        (config_id, btn['label'], btn['audio_path'], btn['row'], btn['col']))
+        self.conn.commit()
+        return config_id
+
+
+def make_buttons(count, cols=20):
+    return [
+        {'label': f"Clip {i}", 'audio_path': f"/library/clips/clip_{i:05d}.ogg", 'row': i // cols, 'col': i % cols}
+        for i in range(count)
+    ]
+
+
+def run(db_class, configs, buttons, settings):
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        db = db_class(os.path.join(tmp, 'bench.db'))
+        board = make_buttons(buttons)
+        start = time.perf_counter()
+        ids = [db.save_config(f"Config {i}", board, buttons // 20 + 1, 20) for i in range(configs)]
+        results['save_config'] = (time.perf_counter() - start) / configs
+
+        start = time.perf_counter()
+        for config_id in ids:
+            db.get_config_buttons(config_id)
+        results['get_config_buttons'] = (time.perf_counter() - start) / configs
+
+        start = time.perf_counter()
+        for config_id in ids:
+            db.set_last_used_config(config_id)
+        results['set_last_used_config'] = (time.perf_counter() - start) / configs
+
+        start = time.perf_counter()
+        for i in range(settings):
+            db.set_setting('audio_device', i % 8)
+        db.flush()
+        results['set_setting'] = (time.perf_counter() - start) / settings
+        db.conn.close()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--configs', type=int, default=200)
+    parser.add_argument('--buttons', type=int, default=2000)
+    parser.add_argument('--settings', type=int, default=500)
+    args = parser.parse_args()
+
+    legacy = run(LegacySoundboardDB, args.configs, args.buttons, args.settings)
+    current = run(SoundboardDB, args.configs, args.buttons, args.settings)
+    print(f"{args.configs} configs x {args.buttons} buttons")
+    print(f"{'operation':<24}{'legacy (ms)':>14}{'current (ms)':>14}{'speedup':>10}")
+    for op in current:
+        print(f"{op:<24}{legacy[op] * 1000:>14.3f}{current[op] * 1000:>14.3f}{legacy[op] / current[op]:>10.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,95 @@
+"""Measure config switch time (SoundBoard.init_ui) against board size.
+
+Runs Qt offscreen with a fake sounddevice backend and a throwaway database.
+Boards above main.VIRTUAL_GRID_THRESHOLD go through the virtualized grid.
+Usage: python benchmarks/bench_grid.py [--sizes 9,50,200,500,1000,10000] [--repeat 5]
+"""
+import os
+import sys
+import time
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+
+from fakes import install_fake_sounddevice, FakePactl
+install_fake_sounddevice()
+
+import main
+import soundboard_core
+from soundboard_db import SoundboardDB
+from pipewire_graph import pipewire_graph
+from PyQt6.QtWidgets import QApplication
+
+
+# Rebuilding thousands of widgets takes minutes; skip the legacy path above this
+LEGACY_MAX_SIZE = 2000
+
+
+def legacy_init_ui(board, buttons):
+    # init_ui as it was before incremental rebuilds: destroy and recreate everything
+    for (btn, _, _) in board.buttons:
+        board.layout.removeWidget(btn)
+        btn.deleteLater()
+    board.buttons.clear()
+    for label, audio_path, row, col in (button[:4] for button in buttons):
+        btn = main.SoundButton(label, board, audio_path)
+        board.layout.addWidget(btn, row, col)
+        board.buttons.append((btn, row, col))
+    board.layout.invalidate()
+    board.layout.activate()
+    board.updateGeometry()
+    board.adjustSize()
+
+
+def make_board(size, variant, cols=16):
+    return [(f"{variant} {i}", f"/library/{variant}/{i}.ogg", i // cols, i % cols, None, None)
+            for i in range(size)]
+
+
+def time_switches(app, board, init, size, repeat):
+    boards = [make_board(size, 'A'), make_board(size, 'B')]
+    init(boards[1])
+    app.processEvents()
+    best = float('inf')
+    for i in range(repeat):
+        start = time.perf_counter()
+        init(boards[i % 2])
+        app.processEvents()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main_():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', default='9,50,200,500,1000,10000')
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    app = QApplication(sys.argv)
+    pipewire_graph.run = FakePactl()
+    with tempfile.TemporaryDirectory() as tmp:
+        soundboard_core.SoundboardDB = lambda: SoundboardDB(os.path.join(tmp, 'bench.db'))
+        print(f"{'buttons':>8}{'legacy (ms)':>14}{'current (ms)':>14}")
+        for size in (int(s) for s in args.sizes.split(',')):
+            results = {}
+            for legacy in (True, False):
+                if legacy and size > LEGACY_MAX_SIZE:
+                    continue
+                board = main.SoundBoard()
+                board.preload_clips = lambda: None
+                board.rows, board.cols = size // 16 + 1, 16
+                board.show()
+                init = (lambda b: legacy_init_ui(board, b)) if legacy else board.init_ui
+                results[legacy] = time_switches(app, board, init, size, args.repeat)
+                board.close()
+                board.deleteLater()
+                app.processEvents()
+            legacy_ms = results.get(True, float('nan')) * 1000
+            print(f"{size:>8}{legacy_ms:>14.1f}{results[False] * 1000:>14.1f}")
+
+
+if __name__ == '__main__':
+    main_()
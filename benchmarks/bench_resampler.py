@@ -0,0 +1,78 @@
+"""Compare the polyphase resampler against the old per-channel np.interp path.
+
+Usage: python benchmarks/bench_resampler.py [--seconds 30] [--channels 2]
+"""
+import os
+import sys
+import time
+import argparse
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from resampler import resample, StreamingResampler, QUALITY_SETTINGS
+
+RATE_PAIRS = [(44100, 48000), (48000, 44100), (22050, 48000)]
+
+
+def legacy_interp(data, src_rate, dst_rate):
+    # The resampling play_sound used before the resampler module existed
+    duration = data.shape[0] / src_rate
+    new_length = int(duration * dst_rate)
+    return np.stack([
+        np.interp(np.linspace(0, len(data), new_length, endpoint=False), np.arange(len(data)), data[:, ch])
+        for ch in range(data.shape[1])
+    ], axis=-1).astype(np.float32)
+
+
+def spurious_db(src_rate, dst_rate, method):
+    # Energy outside the test tone after resampling, relative to the tone
+    freq = 0.43 * min(src_rate, dst_rate)
+    t = np.arange(src_rate) / src_rate
+    tone = np.sin(2 * np.pi * freq * t).astype(np.float32)[:, np.newaxis]
+    out = method(tone)[:, 0]
+    out = out[len(out) // 8:-len(out) // 8]
+    spectrum = np.abs(np.fft.rfft(out * np.hanning(len(out)))) ** 2
+    peak = int(round(freq * len(out) / dst_rate))
+    signal = spectrum[max(0, peak - 8):peak + 9].sum()
+    noise = spectrum.sum() - signal
+    return 10 * np.log10(noise / signal)
+
+
+def timed(fn, repeat=3):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--seconds', type=float, default=30.0)
+    parser.add_argument('--channels', type=int, default=2)
+    parser.add_argument('--block', type=int, default=8192, help='Input block size for streaming mode')
+    args = parser.parse_args()
+
+    print(f"{'method':<16}{'rates':<16}{'time (ms)':>12}{'x realtime':>12}{'spurious dB':>14}")
+    for src_rate, dst_rate in RATE_PAIRS:
+        data = (np.random.default_rng(0).standard_normal((int(args.seconds * src_rate), args.channels)) * 0.1).astype(np.float32)
+        methods = [('np.interp', lambda d: legacy_interp(d, src_rate, dst_rate))]
+        for quality in QUALITY_SETTINGS:
+            methods.append((quality, lambda d, q=quality: resample(d, src_rate, dst_rate, q)))
+
+        def streaming(d, q='medium'):
+            r = StreamingResampler(src_rate, dst_rate, d.shape[1], q)
+            parts = [r.process(d[i:i + args.block]) for i in range(0, len(d), args.block)]
+            parts.append(r.flush())
+            return np.concatenate(parts)
+        methods.append(('medium/stream', streaming))
+
+        for name, method in methods:
+            elapsed = timed(lambda: method(data))
+            print(f"{name:<16}{f'{src_rate}->{dst_rate}':<16}{elapsed * 1000:>12.1f}{args.seconds / elapsed:>12.0f}"
+                  f"{spurious_db(src_rate, dst_rate, method):>14.1f}")
+
+
+if __name__ == '__main__':
+    main()
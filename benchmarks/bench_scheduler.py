@@ -0,0 +1,83 @@
+"""Measure how evenly clips land on the output timeline relative to their triggers.
+
+The audio engine runs on a fake output stream clocked in real time and a
+cached clip is started at random moments, the way GUI clicks or hotkeys
+arrive. For each play the offset of its first sample on the timeline from
+the trigger is recorded. The mean is arbitrary (it depends on where the
+timeline's origin is taken); what matters is the spread: with scheduling
+it only reflects the callback thread's timing, while starting every clip
+with the next block spreads it over a whole block.
+Usage: python benchmarks/bench_scheduler.py [--events 200] [--blocksize 512]
+"""
+import os
+import sys
+import time
+import random
+import argparse
+import tempfile
+import statistics
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from fakes import install_fake_sounddevice, FAKE_DEVICES, RealtimeClock
+install_fake_sounddevice()
+
+import numpy as np
+import soundfile as sf
+import playback
+from audio_engine import AudioEngine
+
+
+def measure(clip, events, blocksize, scheduled):
+    engine = AudioEngine(0, dict(FAKE_DEVICES[0], index=0), blocksize=blocksize)
+    engine.start()
+    voices = []
+    play_voice = engine.play_voice
+    engine.play_voice = lambda voice: voices.append(voice) or play_voice(voice)
+    if not scheduled:
+        original, playback.start_frame = playback.start_frame, lambda engine, when: None
+    clock = RealtimeClock(engine.stream).start()
+    time.sleep(0.2)
+    # The timeline's origin in perf_counter time, taken from the engine's own clock
+    frame, at = engine._mix_clock
+    origin = at - frame / engine.samplerate
+    triggers = []
+    try:
+        for _ in range(events):
+            time.sleep(random.uniform(0.005, 0.03))
+            triggers.append(time.perf_counter())
+            playback.start_clip(engine, clip, triggers[-1])
+        time.sleep(0.2)
+    finally:
+        clock.stop()
+        if not scheduled:
+            playback.start_frame = original
+    offsets = [(origin + v.started_frame / engine.samplerate - t) * 1000
+               for v, t in zip(voices, triggers) if v.started_frame is not None]
+    engine.close()
+    return offsets, engine.schedule_stats()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--events', type=int, default=200)
+    parser.add_argument('--blocksize', type=int, default=512)
+    args = parser.parse_args()
+    with tempfile.TemporaryDirectory() as root:
+        clip = os.path.join(root, 'click.wav')
+        sf.write(clip, np.full((480, 2), 0.1, dtype=np.float32), 48000)
+        print(f"{'start':<12} {'offset mean (ms)':>16} {'p5-p95 (ms)':>12} {'stdev (ms)':>11}")
+        for name, scheduled in (('next block', False), ('scheduled', True)):
+            offsets, stats = measure(clip, args.events, args.blocksize, scheduled)
+            percentiles = statistics.quantiles(offsets, n=20)
+            print(f"{name:<12} {statistics.mean(offsets):>16.3f} {percentiles[-1] - percentiles[0]:>12.3f} "
+                  f"{statistics.stdev(offsets):>11.3f}")
+            if scheduled:
+                print(f"late starts: {stats.get('late_starts', 0)} of {stats.get('scheduled_starts', 0)}, "
+                      f"max {stats.get('schedule_late_max_ms', 0.0):.3f} ms "
+                      f"(one block is {args.blocksize / 48000 * 1000:.3f} ms)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,92 @@
+"""Measure trigger-to-first-sample latency of hotkey / MIDI triggers.
+
+The audio engine runs on a fake output stream clocked in real time. Events
+come from a virtual evdev keyboard (needs python-evdev and /dev/uinput), a
+virtual MIDI port (needs python-rtmidi) or, with --source direct, straight
+into the dispatcher.
+Usage: python benchmarks/bench_triggers.py [--source direct|evdev|midi] [--events 200]
+"""
+import os
+import sys
+import time
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from fakes import install_fake_sounddevice, FAKE_DEVICES, RealtimeClock
+install_fake_sounddevice()
+
+import numpy as np
+import soundfile as sf
+import triggers
+from triggers import TriggerDispatcher, midi_code
+from audio_engine import AudioEngine
+
+
+def send_direct(dispatcher, count, interval):
+    for _ in range(count):
+        dispatcher.handle('key', 'KEY_F13')
+        time.sleep(interval)
+
+
+def send_evdev(dispatcher, count, interval):
+    from evdev import UInput, ecodes
+    keyboard = UInput({ecodes.EV_KEY: [ecodes.KEY_F13]}, name='pySoundBoard-bench')
+    time.sleep(0.5)  # let the device node appear
+    source = triggers.EvdevSource(dispatcher, [triggers.evdev.InputDevice(keyboard.device.path)])
+    source.start()
+    for _ in range(count):
+        keyboard.write(ecodes.EV_KEY, ecodes.KEY_F13, 1)
+        keyboard.syn()
+        keyboard.write(ecodes.EV_KEY, ecodes.KEY_F13, 0)
+        keyboard.syn()
+        time.sleep(interval)
+    source.stop()
+    keyboard.close()
+
+
+def send_midi(dispatcher, count, interval):
+    import rtmidi
+    midi_out = rtmidi.MidiOut()
+    midi_out.open_virtual_port('pySoundBoard-bench')
+    source = triggers.MidiSource(dispatcher, 'pySoundBoard-bench')
+    source.start()
+    for _ in range(count):
+        midi_out.send_message([0x90, 60, 100])
+        midi_out.send_message([0x80, 60, 0])
+        time.sleep(interval)
+    source.stop()
+    midi_out.close_port()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--source', choices=('direct', 'evdev', 'midi'), default='direct')
+    parser.add_argument('--events', type=int, default=200)
+    parser.add_argument('--interval', type=float, default=0.02)
+    parser.add_argument('--blocksize', type=int, default=256)
+    args = parser.parse_args()
+
+    engine = AudioEngine(0, dict(FAKE_DEVICES[0], index=0), args.blocksize)
+    engine.start()
+    with tempfile.TemporaryDirectory() as tmp:
+        clip = os.path.join(tmp, 'click.wav')
+        sf.write(clip, np.full((480, 2), 0.1, dtype=np.float32), engine.samplerate)
+        dispatcher = TriggerDispatcher(lambda: engine)
+        dispatcher.set_bindings({('key', 'KEY_F13'): (clip, None, None, None), ('midi', midi_code(0, 60)): (clip, None, None, None)})
+        clock = RealtimeClock(engine.stream).start()
+        send = {'direct': send_direct, 'evdev': send_evdev, 'midi': send_midi}[args.source]
+        send(dispatcher, args.events, args.interval)
+        time.sleep(0.1)
+        clock.stop()
+    stats = engine.trigger_latency_stats()
+    print(f"source: {args.source}, blocksize {args.blocksize} @ {engine.samplerate} Hz, "
+          f"{dispatcher.dispatched} dispatched, {dispatcher.errors} errors")
+    for key, value in stats.items():
+        print(f"  {key}: {value:.2f}" if isinstance(value, float) else f"  {key}: {value}")
+
+
+if __name__ == '__main__':
+    main()
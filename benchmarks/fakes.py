@@ -0,0 +1,135 @@
+"""Stand-ins for sounddevice and pactl so benchmarks never touch real audio hardware."""
+import sys
+import time
+import types
+import threading
+import numpy as np
+
+FAKE_DEVICES = [
+    {'name': 'SoundboardSink', 'max_output_channels': 2, 'max_input_channels': 0, 'default_samplerate': 48000.0},
+    {'name': 'SoundboardMix', 'max_output_channels': 2, 'max_input_channels': 0, 'default_samplerate': 48000.0},
+    {'name': 'Built-in Audio Analog Stereo', 'max_output_channels': 2, 'max_input_channels': 2, 'default_samplerate': 44100.0},
+    {'name': 'USB Microphone', 'max_output_channels': 0, 'max_input_channels': 1, 'default_samplerate': 48000.0},
+]
+
+
+class FakeCallbackFlags:
+    output_underflow = False
+    input_overflow = False
+
+
+class FakeOutputStream:
+    """Never opens a device; ``pump`` runs the callback as the audio thread would."""
+
+    def __init__(self, samplerate=None, device=None, channels=None, dtype='float32', blocksize=512, callback=None, **kwargs):
+        self.samplerate = samplerate
+        self.device = device
+        self.channels = channels
+        self.blocksize = blocksize or 512
+        self.callback = callback
+        self.latency = 0.01
+        self.active = False
+
+    def start(self):
+        self.active = True
+
+    def stop(self):
+        self.active = False
+
+    def close(self):
+        self.active = False
+
+    def pump(self, blocks=1):
+        out = np.zeros((self.blocksize, self.channels), dtype=np.float32)
+        for _ in range(blocks):
+            self.callback(out, self.blocksize, None, FakeCallbackFlags())
+        return out
+
+
+class RealtimeClock:
+    """Pumps a fake stream on a thread at the pace a real device would call it."""
+
+    def __init__(self, stream):
+        self.stream = stream
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def _run(self):
+        period = self.stream.blocksize / self.stream.samplerate
+        deadline = time.perf_counter()
+        while not self._stop.is_set():
+            self.stream.pump()
+            deadline += period
+            time.sleep(max(0.0, deadline - time.perf_counter()))
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+
+class FakeDuplexStream(FakeOutputStream):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.latency = (0.01, 0.01)
+
+    def pump(self, blocks=1):
+        input_channels, output_channels = self.channels
+        indata = np.zeros((self.blocksize, input_channels), dtype=np.float32)
+        out = np.zeros((self.blocksize, output_channels), dtype=np.float32)
+        for _ in range(blocks):
+            self.callback(indata, out, self.blocksize, None, FakeCallbackFlags())
+        return out
+
+
+def _query_devices(device=None, kind=None):
+    devices = [dict(dev, index=i) for i, dev in enumerate(FAKE_DEVICES)]
+    if device is None and kind is None:
+        return devices
+    if device is None:
+        return devices[0] if kind == 'output' else devices[3]
+    return devices[device]
+
+
+def install_fake_sounddevice():
+    """Register a fake ``sounddevice`` module; must run before the app modules are imported."""
+    sd = types.ModuleType('sounddevice')
+    sd.PortAudioError = type('PortAudioError', (Exception,), {})
+    sd.CallbackFlags = FakeCallbackFlags
+    sd.query_devices = _query_devices
+    sd.OutputStream = FakeOutputStream
+    sd.Stream = FakeDuplexStream
+    sd._initialize = lambda: None
+    sd._terminate = lambda: None
+    sys.modules['sounddevice'] = sd
+    return sd
+
+
+class FakePactl:
+    """Minimal in-memory model of `pactl` module handling for PipeWireGraph."""
+
+    def __init__(self, modules=None, default_source='alsa_input.usb-mic'):
+        self.modules = dict(modules or {})
+        self.default_source = default_source
+        self.next_id = 536870912
+        self.calls = []
+
+    def __call__(self, args):
+        self.calls.append(list(args))
+        if args[:3] == ['list', 'short', 'modules']:
+            return ''.join(f"{module_id}\t{name}\t{argument}\t\n" for module_id, (name, argument) in self.modules.items())
+        if args[0] == 'get-default-source':
+            return self.default_source + '\n'
+        if args[0] == 'load-module':
+            self.next_id += 1
+            self.modules[self.next_id] = (args[1], ' '.join(args[2:]))
+            return f"{self.next_id}\n"
+        if args[0] == 'unload-module':
+            self.modules.pop(int(args[1]), None)
+            return ''
+        if args[0] == 'subscribe':
+            return ''
+        raise ValueError(f"Unsupported pactl call: {args}")
@@ -0,0 +1,406 @@
+"""Run the audio and persistence hot-path benchmarks and write comparable JSON.
+
+Everything runs against the fake sounddevice backend and a fake pactl, with
+WAV/OGG/MP3 fixtures generated into a temporary directory, so results depend
+only on the code and the machine. Save a run per commit and compare them:
+    python benchmarks/suite.py --output before.json
+    python benchmarks/suite.py --output after.json --compare before.json
+Usage: python benchmarks/suite.py [--filter play] [--repeat 7] [--output results.json] [--compare baseline.json]
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import tempfile
+import statistics
+import subprocess
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+
+from fakes import install_fake_sounddevice, FakePactl, FAKE_DEVICES
+install_fake_sounddevice()
+
+import numpy as np
+import soundfile as sf
+from audio_cache import audio_cache
+from audio_engine import AudioEngine, BufferVoice
+from monitor_output import MonitorEngine
+from dsp import FadeVoice, render
+from dsp_params import DspParams
+from play_mode import PlayMode
+from playback import start_clip
+from soundboard_db import SoundboardDB
+from pipewire_graph import PipeWireGraph
+from bench_db import make_buttons
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# 44.1 kHz clips played on the fake 48 kHz device, so every cold play resamples
+FIXTURE_RATE = 44100
+FIXTURE_SECONDS = 3.0
+FIXTURE_FORMATS = {
+    'wav': ('WAV', 'PCM_16'),
+    'ogg': ('OGG', 'VORBIS'),
+    'mp3': ('MP3', 'MPEG_LAYER_III'),
+}
+MIX_BLOCKS = 100
+# Relative change in best-of-repeat time treated as a real difference when comparing runs
+DEFAULT_THRESHOLD = 0.10
+
+BENCHMARKS = []
+
+
+def benchmark(name, number=1):
+    """Register fn(ctx) -> run; run() is timed `number` times per repeat."""
+    def register(fn):
+        BENCHMARKS.append((name, fn, number))
+        return fn
+    return register
+
+
+class Context:
+    """Generated fixtures and a started engine on the fake output device."""
+
+    def __init__(self, root):
+        self.root = root
+        self.clips = {}
+        t = np.arange(int(FIXTURE_RATE * FIXTURE_SECONDS)) / FIXTURE_RATE
+        tone = (0.25 * np.sin(2 * np.pi * 440 * t)).astype(np.float32)
+        stereo = np.column_stack([tone, tone[::-1]])
+        for ext, (fmt, subtype) in FIXTURE_FORMATS.items():
+            path = os.path.join(root, f'clip.{ext}')
+            try:
+                sf.write(path, stereo, FIXTURE_RATE, format=fmt, subtype=subtype)
+            except (sf.LibsndfileError, ValueError, TypeError) as e:
+                print(f"Skipping {ext} fixtures, libsndfile cannot write them: {e}", file=sys.stderr)
+                continue
+            self.clips[ext] = path
+        self.engine = AudioEngine(0, dict(FAKE_DEVICES[0], index=0))
+        self.engine.start()
+        self._app = None
+
+    def qt_app(self):
+        if self._app is None:
+            from PyQt6.QtWidgets import QApplication
+            self._app = QApplication.instance() or QApplication(sys.argv)
+        return self._app
+
+    def close(self):
+        self.engine.close()
+
+
+def _play(ctx, ext, cold):
+    path = ctx.clips.get(ext)
+    if path is None:
+        return None
+    engine = ctx.engine
+
+    def run():
+        if cold:
+            audio_cache.clear()
+        start_clip(engine, path)
+        engine.stream.pump()
+    return run
+
+
+# The decode + resample work behind SoundButton.play_sound, minus the Qt click handling
+for _ext in FIXTURE_FORMATS:
+    benchmark(f'play_cold_{_ext}')(lambda ctx, ext=_ext: _play(ctx, ext, cold=True))
+benchmark('play_cached_wav', number=100)(lambda ctx: _play(ctx, 'wav', cold=False))
+
+
+def _mix(ctx, voices):
+    engine = AudioEngine(0, dict(FAKE_DEVICES[0], index=0))
+    engine.start()
+    # Long enough that no voice finishes during the timed blocks
+    data = np.full((engine.blocksize * MIX_BLOCKS * 20, engine.channels), 0.01, dtype=np.float32)
+    for _ in range(voices):
+        engine.play_voice(BufferVoice(data, engine.next_voice_id()))
+    engine.stream.pump()
+
+    def run():
+        engine.stream.pump(MIX_BLOCKS)
+    return run
+
+
+for _voices in (1, 8, 32, 64):
+    benchmark(f'mix_{_voices}_voices_{MIX_BLOCKS}_blocks')(lambda ctx, voices=_voices: _mix(ctx, voices))
+
+
+@benchmark('db_save_config_2000')
+def bench_db_save(ctx):
+    db = SoundboardDB(os.path.join(ctx.root, 'save.db'))
+    board = make_buttons(2000)
+    return lambda: db.save_config('bench', board, 101, 20)
+
+
+@benchmark('db_get_config_buttons_2000', number=10)
+def bench_db_load(ctx):
+    db = SoundboardDB(os.path.join(ctx.root, 'load.db'))
+    config_id = db.save_config('bench', make_buttons(2000), 101, 20)
+    return lambda: db.get_config_buttons(config_id)
+
+
+@benchmark('play_cached_wav_monitor', number=100)
+def bench_play_monitor(ctx):
+    # Same clip on the main output and a 44.1 kHz headphone monitor: both formats cached
+    engine = AudioEngine(0, dict(FAKE_DEVICES[0], index=0))
+    engine.monitors = [MonitorEngine(2, dict(FAKE_DEVICES[2], index=2), engine)]
+    engine.start()
+    engine.monitors[0].start()
+    path = ctx.clips['wav']
+
+    def run():
+        start_clip(engine, path)
+        engine.stream.pump()
+        engine.monitors[0].stream.pump()
+    return run
+
+
+@benchmark(f'mix_8_voices_drift_{MIX_BLOCKS}_blocks')
+def bench_mix_drift(ctx):
+    # Monitor voices read through the interpolating drift correction
+    reference = AudioEngine(0, dict(FAKE_DEVICES[0], index=0))
+    engine = MonitorEngine(1, dict(FAKE_DEVICES[1], index=1), reference)
+    engine.start()
+    engine.drift_step = 1.00005
+    data = np.full((engine.blocksize * MIX_BLOCKS * 20, engine.channels), 0.01, dtype=np.float32)
+    for _ in range(8):
+        engine.play_voice(BufferVoice(data, engine.next_voice_id()))
+    engine.stream.pump()
+
+    def run():
+        engine.stream.pump(MIX_BLOCKS)
+    return run
+
+
+@benchmark(f'mix_8_voices_loops_{MIX_BLOCKS}_blocks')
+def bench_mix_loops(ctx):
+    # Loops shorter than two blocks, so most blocks wrap at least one voice
+    engine = AudioEngine(0, dict(FAKE_DEVICES[0], index=0))
+    engine.start()
+    data = np.full((int(engine.blocksize * 1.7), engine.channels), 0.01, dtype=np.float32)
+    for _ in range(8):
+        engine.play_voice(BufferVoice(data, engine.next_voice_id(), loop=True))
+    engine.stream.pump()
+
+    def run():
+        engine.stream.pump(MIX_BLOCKS)
+    return run
+
+
+@benchmark(f'queue_{MIX_BLOCKS}_clips_gapless')
+def bench_queue(ctx):
+    # A clip per block, each started mid-block by the one before it ending
+    engine = AudioEngine(0, dict(FAKE_DEVICES[0], index=0))
+    engine.start()
+    data = np.full((engine.blocksize - 100, engine.channels), 0.01, dtype=np.float32)
+    mode = PlayMode(queue=True)
+
+    def run():
+        for _ in range(MIX_BLOCKS):
+            voice = BufferVoice(data, engine.next_voice_id())
+            voice.mode = mode
+            engine.play_voice(voice)
+        engine.stream.pump(MIX_BLOCKS + 1)
+    return run
+
+
+# Trimmed, pitched and faded: the render is cached, the fades run per block
+DSP_BENCH = DspParams(trim_start=0.5, fade_in=0.5, fade_out=0.5, gain_db=-3.0, pitch=3.0)
+
+
+@benchmark('play_cached_wav_dsp', number=100)
+def bench_play_dsp(ctx):
+    engine = ctx.engine
+    path = ctx.clips['wav']
+
+    def run():
+        start_clip(engine, path, dsp=DSP_BENCH)
+        engine.stream.pump()
+    return run
+
+
+@benchmark('dsp_render_pitch_3s')
+def bench_dsp_pitch(ctx):
+    data, fs = audio_cache.load(ctx.clips['wav'], ctx.engine.samplerate, ctx.engine.channels)
+    return lambda: render(data, fs, DspParams(pitch=3.0), audio_cache.quality)
+
+
+@benchmark('dsp_render_speed_3s')
+def bench_dsp_speed(ctx):
+    data, fs = audio_cache.load(ctx.clips['wav'], ctx.engine.samplerate, ctx.engine.channels)
+    return lambda: render(data, fs, DspParams(speed=1.25), audio_cache.quality)
+
+
+@benchmark(f'mix_8_voices_fades_{MIX_BLOCKS}_blocks')
+def bench_mix_fades(ctx):
+    # Every timed block is inside a fade-in, the costly case for FadeVoice
+    engine = AudioEngine(0, dict(FAKE_DEVICES[0], index=0))
+    engine.start()
+    data = np.full((engine.blocksize * MIX_BLOCKS * 20, engine.channels), 0.01, dtype=np.float32)
+    fades = DspParams(fade_in=len(data) / engine.samplerate, gain_db=-3.0)
+    for _ in range(8):
+        engine.play_voice(FadeVoice(BufferVoice(data, engine.next_voice_id()), engine.samplerate, fades, len(data)))
+    engine.stream.pump()
+
+    def run():
+        engine.stream.pump(MIX_BLOCKS)
+    return run
+
+
+def _init_ui(ctx, size):
+    try:
+        app = ctx.qt_app()
+        import main
+        import soundboard_core
+        from pipewire_graph import pipewire_graph
+    except ImportError as e:
+        print(f"Skipping init_ui benchmarks: {e}", file=sys.stderr)
+        return None
+    pipewire_graph.run = FakePactl()
+    db_path = os.path.join(ctx.root, f'ui{size}.db')
+    soundboard_core.SoundboardDB = lambda: SoundboardDB(db_path)
+    board = main.SoundBoard()
+    board.preload_clips = lambda: None
+    board.rows, board.cols = size // 16 + 1, 16
+    board.show()
+    boards = [[(f"{variant} {i}", f"/library/{variant}/{i}.ogg", i // 16, i % 16, None, None) for i in range(size)]
+              for variant in 'AB']
+    switches = iter(range(1 << 30))
+
+    def run():
+        board.init_ui(boards[next(switches) % 2])
+        app.processEvents()
+    return run
+
+
+for _size in (50, 500, 2000):
+    benchmark(f'init_ui_{_size}')(lambda ctx, size=_size: _init_ui(ctx, size))
+
+
+@benchmark('pipewire_setup_fresh', number=20)
+def bench_pipewire_fresh(ctx):
+    return lambda: PipeWireGraph(runner=FakePactl()).ensure()
+
+
+@benchmark('pipewire_setup_existing', number=20)
+def bench_pipewire_existing(ctx):
+    pactl = FakePactl()
+    PipeWireGraph(runner=pactl).ensure()
+    return lambda: PipeWireGraph(runner=pactl).ensure()
+
+
+def measure(run, number, repeat):
+    run()  # warm-up: imports, first allocations, lazily built kernels
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            run()
+        times.append((time.perf_counter() - start) / number)
+    return {
+        'min': min(times),
+        'median': statistics.median(times),
+        'mean': statistics.mean(times),
+        'stdev': statistics.stdev(times) if len(times) > 1 else 0.0,
+        'number': number,
+        'repeat': repeat,
+    }
+
+
+def environment():
+    try:
+        commit = subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=REPO, capture_output=True, text=True).stdout.strip()
+        dirty = bool(subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'], cwd=REPO,
+                                    capture_output=True, text=True).stdout.strip())
+    except OSError:
+        commit, dirty = None, None
+    return {
+        'commit': commit or None,
+        'dirty': dirty,
+        'time': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'libsndfile': sf.__libsndfile_version__,
+        'machine': platform.machine(),
+        'system': platform.platform(),
+        'cpus': os.cpu_count(),
+    }
+
+
+def compare(results, baseline, threshold):
+    """Print best-time ratios against a baseline run; returns the names that got slower.
+
+    The minimum over repeats is compared because background load only ever
+    adds time, so it is the steadiest number on a shared machine.
+    """
+    slower = []
+    print(f"\n{'benchmark':<32}{'baseline (ms)':>15}{'current (ms)':>15}{'ratio':>8}")
+    for name, result in results.items():
+        base = baseline['results'].get(name)
+        if base is None:
+            print(f"{name:<32}{'-':>15}{result['min'] * 1000:>15.3f}{'new':>8}")
+            continue
+        ratio = result['min'] / base['min'] if base['min'] else float('inf')
+        flag = ''
+        if ratio > 1 + threshold:
+            flag = '  slower'
+            slower.append(name)
+        elif ratio < 1 - threshold:
+            flag = '  faster'
+        print(f"{name:<32}{base['min'] * 1000:>15.3f}{result['min'] * 1000:>15.3f}{ratio:>8.2f}{flag}")
+    return slower
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--filter', default='', help="Only run benchmarks whose name contains this")
+    parser.add_argument('--repeat', type=int, default=7)
+    parser.add_argument('--output', help="Write the results as JSON to this file")
+    parser.add_argument('--compare', help="A previous --output file to compare against")
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help="Relative change in best time reported as slower/faster")
+    parser.add_argument('--fail-on-regression', action='store_true',
+                        help="Exit with status 1 if anything is slower than the baseline")
+    parser.add_argument('--list', action='store_true')
+    args = parser.parse_args()
+
+    selected = [(name, fn, number) for name, fn, number in BENCHMARKS if args.filter in name]
+    if args.list:
+        print("\n".join(name for name, _, _ in selected))
+        return 0
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        ctx = Context(tmp)
+        print(f"{'benchmark':<32}{'median (ms)':>13}{'min (ms)':>11}{'stdev':>9}")
+        for name, fn, number in selected:
+            run = fn(ctx)
+            if run is None:
+                continue
+            result = measure(run, number, args.repeat)
+            results[name] = result
+            print(f"{name:<32}{result['median'] * 1000:>13.3f}{result['min'] * 1000:>11.3f}"
+                  f"{result['stdev'] / result['median'] * 100 if result['median'] else 0:>8.1f}%")
+        ctx.close()
+
+    report = {'version': 1, 'environment': environment(), 'results': results}
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        if baseline.get('environment', {}).get('machine') != report['environment']['machine']:
+            print("Warning: baseline was recorded on a different machine type", file=sys.stderr)
+        slower = compare(results, baseline, args.threshold)
+        if slower and args.fail_on_regression:
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
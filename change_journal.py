@@ -0,0 +1,72 @@
+from collections import namedtuple
+
+# before/after are (label, audio_path, dsp, mode) tuples, or None for an empty cell
+Change = namedtuple('Change', ['cell', 'before', 'after'])
+
+
+class ChangeJournal:
+    """Records edits to the board so unsaved-change checks are O(1).
+
+    Changes form a linear history with a cursor, which is all undo/redo need.
+    The cursor position at the last save is remembered; the board is dirty
+    whenever the cursor is anywhere else.
+    """
+
+    def __init__(self):
+        self.changes = []
+        self.position = 0
+        self.saved_position = 0
+
+    def reset(self, saved=True):
+        self.changes = []
+        self.position = 0
+        # saved=False means the board already differs from the database
+        self.saved_position = 0 if saved else -1
+
+    @property
+    def revision(self):
+        return self.position
+
+    def record(self, cell, before, after):
+        if before == after:
+            return
+        if self.saved_position > self.position:
+            # The saved state was only reachable through the redo history we are dropping
+            self.saved_position = -1
+        del self.changes[self.position:]
+        self.changes.append(Change(cell, before, after))
+        self.position += 1
+
+    def is_dirty(self):
+        return self.position != self.saved_position
+
+    def mark_saved(self):
+        self.saved_position = self.position
+
+    def changed_cells(self):
+        """Cells that differ from the last save, or None if a full save is needed."""
+        if self.saved_position < 0:
+            return None
+        low, high = sorted((self.position, self.saved_position))
+        return {change.cell for change in self.changes[low:high]}
+
+    def can_undo(self):
+        return self.position > 0
+
+    def can_redo(self):
+        return self.position < len(self.changes)
+
+    def undo(self):
+        """Step back; returns (cell, state to restore) or None."""
+        if not self.can_undo():
+            return None
+        self.position -= 1
+        change = self.changes[self.position]
+        return change.cell, change.before
+
+    def redo(self):
+        if not self.can_redo():
+            return None
+        change = self.changes[self.position]
+        self.position += 1
+        return change.cell, change.after
@@ -0,0 +1,172 @@
+import os
+import re
+import time
+import threading
+import subprocess
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Cards come and go together with their sinks and sources, which are the events that name a device
+HOTPLUG_EVENT = re.compile(r"Event '(new|remove)' on (sink|source) #(\d+)")
+PACTL_DEVICE = re.compile(r"(Sink|Source) #(\d+)")
+# pactl subscribe exits when the sound server restarts; wait this long before subscribing again
+WATCH_RESTART_SECONDS = 5.0
+
+
+class DeviceRegistry:
+    """Cached view of the PortAudio device list.
+
+    Devices are enumerated once and looked up by index or name from dicts, so
+    the playback path never calls sd.query_devices(). The list is only rebuilt
+    by an explicit ``refresh``; hot-plug events reported by ``pactl subscribe``
+    only mark it stale and notify listeners, which decide when to rescan.
+    Listeners are called with the event ('new' or 'remove') and the device's
+    description, or None if it is not known.
+    """
+
+    def __init__(self):
+        self.devices = []
+        self.default_output = None
+        self.default_input = None
+        self.stale = True
+        self._by_index = {}
+        self._by_name = {}
+        self._listeners = []
+        self._watcher = None
+        self._lock = threading.Lock()
+
+    def refresh(self, rescan=False):
+        # Imported here rather than at module load: importing sounddevice
+        # initialises PortAudio, which probes every audio device
+        import sounddevice as sd
+        if rescan:
+            # PortAudio only enumerates devices on initialisation, so a real
+            # rescan means re-initialising it. Any open stream is invalidated.
+            sd._terminate()
+            sd._initialize()
+        devices = []
+        for idx, dev in enumerate(sd.query_devices()):
+            devices.append({
+                'index': dev.get('index', idx),
+                'name': dev['name'],
+                'max_output_channels': dev['max_output_channels'],
+                'max_input_channels': dev['max_input_channels'],
+                'default_samplerate': dev['default_samplerate'],
+            })
+        default_names = {}
+        for kind in ('output', 'input'):
+            try:
+                default_names[kind] = sd.query_devices(kind=kind)['name']
+            except Exception:
+                default_names[kind] = None
+        with self._lock:
+            self.devices = devices
+            self._by_index = {dev['index']: dev for dev in devices}
+            self._by_name = {}
+            for dev in devices:
+                self._by_name.setdefault(dev['name'], dev)
+            self.default_output = self._by_name.get(default_names['output'])
+            self.default_input = self._by_name.get(default_names['input'])
+            self.stale = False
+        logger.debug(f"Device registry refreshed: {len(devices)} devices")
+
+    def _ensure_loaded(self):
+        if not self.devices:
+            self.refresh()
+
+    def get(self, index):
+        """Return the cached info dict for a device index, or the default output for None."""
+        self._ensure_loaded()
+        if index is None:
+            if self.default_output is None:
+                raise KeyError("No default output device")
+            return self.default_output
+        return self._by_index[index]
+
+    def find(self, name):
+        self._ensure_loaded()
+        return self._by_name.get(name)
+
+    def find_matching(self, text, kind=None):
+        self._ensure_loaded()
+        text = text.lower()
+        for dev in self.devices:
+            if kind and dev[f'max_{kind}_channels'] == 0:
+                continue
+            if text in dev['name'].lower():
+                return dev
+        return None
+
+    def output_devices(self):
+        self._ensure_loaded()
+        return [dev for dev in self.devices if dev['max_output_channels'] > 0]
+
+    def add_listener(self, callback):
+        self._listeners.append(callback)
+
+    def watch_hotplug(self):
+        if self._watcher is not None:
+            return
+        self._watcher = threading.Thread(target=self._watch, name='device-hotplug', daemon=True)
+        self._watcher.start()
+
+    def _watch(self):
+        devices = None
+        while True:
+            try:
+                proc = subprocess.Popen(["pactl", "subscribe"], stdout=subprocess.PIPE, text=True)
+            except Exception as e:
+                logger.warning(f"Device hot-plug watching unavailable: {e}")
+                return
+            current = self._pulse_devices()
+            if devices is not None:
+                # Whatever changed while pactl was not running
+                for name in set(devices.values()) - set(current.values()):
+                    self._notify('remove', name)
+                if set(current.values()) - set(devices.values()):
+                    self._notify('new', None)
+            devices = current
+            for line in proc.stdout:
+                match = HOTPLUG_EVENT.search(line)
+                if not match:
+                    continue
+                logger.debug(f"Hot-plug event: {line.strip()}")
+                event, kind, index = match.group(1), match.group(2), int(match.group(3))
+                if event == 'remove':
+                    self._notify(event, devices.pop((kind, index), None))
+                else:
+                    devices = self._pulse_devices()
+                    self._notify(event, devices.get((kind, index)))
+            proc.wait()
+            logger.warning(f"pactl subscribe exited with status {proc.returncode}; "
+                           f"watching again in {WATCH_RESTART_SECONDS:g} s")
+            time.sleep(WATCH_RESTART_SECONDS)
+
+    def _notify(self, event, name):
+        self.stale = True
+        for callback in self._listeners:
+            callback(event, name)
+
+    def _pulse_devices(self):
+        """Descriptions of the sound server's sinks and sources by (kind, index)."""
+        devices = {}
+        for kind in ('sink', 'source'):
+            try:
+                # The headings are translated unless the locale is C
+                output = subprocess.run(["pactl", "list", f"{kind}s"], capture_output=True, text=True, timeout=5,
+                                        env=dict(os.environ, LC_ALL='C')).stdout
+            except Exception as e:
+                logger.debug(f"Could not list {kind}s: {e}")
+                continue
+            index = None
+            for line in output.splitlines():
+                match = PACTL_DEVICE.match(line)
+                if match:
+                    index = int(match.group(2))
+                elif index is not None and line.strip().startswith('Description:'):
+                    devices[(kind, index)] = line.split(':', 1)[1].strip()
+        return devices
+
+
+device_registry = DeviceRegistry()
@@ -0,0 +1,114 @@
+from PyQt6.QtWidgets import (
+    QDialog, QVBoxLayout, QHBoxLayout, QPlainTextEdit, QPushButton, QCheckBox, QFileDialog, QMessageBox
+)
+from PyQt6.QtGui import QFontDatabase
+from PyQt6.QtCore import QTimer
+from metrics import metrics
+
+REFRESH_MS = 1000
+SHOWN_PLAYS = 10
+
+
+def format_value(value):
+    if isinstance(value, float):
+        return f"{value:.3f}"
+    return str(value)
+
+
+def format_snapshot(snapshot):
+    """Plain-text summary of a metrics snapshot for the diagnostics panel."""
+    lines = [f"Metrics {'enabled' if snapshot['enabled'] else 'disabled'}, "
+             f"collecting for {snapshot['uptime_s']:.0f} s", ""]
+    if snapshot['spans']:
+        lines.append(f"{'span':<16}{'count':>8}{'avg ms':>10}{'p95 ms':>10}{'max ms':>10}")
+        for name, span in sorted(snapshot['spans'].items()):
+            lines.append(f"{name:<16}{span['count']:>8}{span['avg_ms']:>10.2f}{span['p95_ms']:>10.2f}{span['max_ms']:>10.2f}")
+        lines.append("")
+    for name, value in sorted(snapshot['counters'].items()):
+        lines.append(f"{name}: {value}")
+    for group, values in snapshot.items():
+        if group in ('enabled', 'uptime_s', 'spans', 'counters', 'recent_plays'):
+            continue
+        lines.append("")
+        lines.append(f"[{group}]")
+        for key, value in values.items():
+            if isinstance(value, dict):
+                value = ", ".join(f"{k} {format_value(v)}" for k, v in value.items())
+            lines.append(f"  {key}: {format_value(value)}")
+    if snapshot['recent_plays']:
+        lines.append("")
+        lines.append("Recent plays (ms):")
+        for play in reversed(snapshot['recent_plays'][-SHOWN_PLAYS:]):
+            spans = ", ".join(f"{name} {ms:.2f}" for name, ms in play['spans'].items())
+            first_buffer = play['first_buffer_ms']
+            first_buffer = f"{first_buffer:.2f}" if first_buffer is not None else "-"
+            lines.append(f"  {play['path']}: first buffer {first_buffer}; {spans}")
+    return "\n".join(lines)
+
+
+class DiagnosticsPanel(QDialog):
+    """Live view of the playback metrics, with JSON and Prometheus export."""
+
+    def __init__(self, core, parent=None):
+        super().__init__(parent)
+        self.core = core
+        self.setWindowTitle("Diagnostics")
+        self.resize(640, 520)
+        layout = QVBoxLayout(self)
+        self.enabled_box = QCheckBox("Collect metrics")
+        self.enabled_box.setChecked(metrics.enabled)
+        self.enabled_box.toggled.connect(self.toggle_enabled)
+        layout.addWidget(self.enabled_box)
+        self.text = QPlainTextEdit()
+        self.text.setReadOnly(True)
+        self.text.setFont(QFontDatabase.systemFont(QFontDatabase.SystemFont.FixedFont))
+        layout.addWidget(self.text)
+        buttons = QHBoxLayout()
+        for label, slot in (("Export JSON...", self.export_json), ("Export Prometheus...", self.export_prometheus),
+                            ("Reset", self.reset), ("Close", self.close)):
+            button = QPushButton(label)
+            button.clicked.connect(slot)
+            buttons.addWidget(button)
+        layout.addLayout(buttons)
+        self.timer = QTimer(self)
+        self.timer.setInterval(REFRESH_MS)
+        self.timer.timeout.connect(self.refresh)
+
+    def refresh(self):
+        scroll = self.text.verticalScrollBar().value()
+        self.text.setPlainText(format_snapshot(metrics.snapshot()))
+        self.text.verticalScrollBar().setValue(scroll)
+
+    def toggle_enabled(self, enabled):
+        self.core.set_metrics_enabled(enabled)
+        self.refresh()
+
+    def reset(self):
+        metrics.reset()
+        self.refresh()
+
+    def export_json(self):
+        self._export("Export Metrics as JSON", "pysoundboard-metrics.json", "JSON Files (*.json)", metrics.to_json)
+
+    def export_prometheus(self):
+        self._export("Export Metrics as Prometheus Text", "pysoundboard-metrics.prom", "Prometheus Text (*.prom *.txt)",
+                     metrics.to_prometheus)
+
+    def _export(self, title, default_name, file_filter, render):
+        path, _ = QFileDialog.getSaveFileName(self, title, default_name, file_filter)
+        if not path:
+            return
+        try:
+            with open(path, 'w') as f:
+                f.write(render())
+        except OSError as e:
+            QMessageBox.critical(self, "Export Error", f"Could not write metrics.\nError: {e}")
+
+    def showEvent(self, event):
+        self.refresh()
+        self.timer.start()
+        super().showEvent(event)
+
+    def hideEvent(self, event):
+        self.timer.stop()
+        super().hideEvent(event)
@@ -0,0 +1,151 @@
+import math
+import logging
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+from resampler import resample, DEFAULT_QUALITY
+from metrics import metrics
+from audio_engine import Voice
+
+logger = logging.getLogger(__name__)
+
+# Phase vocoder frame and hop for pitch shifting; 75% overlap
+PV_FRAME = 2048
+PV_HOP = PV_FRAME // 4
+# Synthesis frames per pass, which bounds the spectra held in memory
+PV_CHUNK = 256
+# Speeds are applied as a resampling ratio from an integer rate, so they are rounded to this
+SPEED_STEP = 0.01
+
+
+def trim(data, samplerate, start, end):
+    first = max(0, int(round(start * samplerate)))
+    last = len(data) if end is None else max(first, min(len(data), int(round(end * samplerate))))
+    return data[first:last]
+
+
+def change_speed(data, samplerate, speed, quality=DEFAULT_QUALITY):
+    """Play faster or slower like a tape: length and pitch both change."""
+    source_rate = int(round(samplerate * round(speed / SPEED_STEP) * SPEED_STEP))
+    if source_rate == samplerate or not len(data):
+        return data
+    return resample(data, source_rate, samplerate, quality)
+
+
+def time_stretch(data, rate):
+    """Phase vocoder: rate > 1 shortens the audio, without changing its pitch.
+
+    Output frames are synthesised PV_CHUNK at a time, carrying the phase
+    across chunks, so memory stays bounded for long clips.
+    """
+    frames, channels = data.shape
+    window = np.hanning(PV_FRAME + 1)[:-1].astype(np.float32)
+    # A whole frame of silence after the end keeps the last frames, and clips
+    # shorter than one frame, covered by analysis windows; cut back to length below
+    padded = np.pad(data, ((PV_FRAME // 2, PV_FRAME), (0, 0)))
+    # (spectra, channels, PV_FRAME) views into padded, one every hop
+    windows = sliding_window_view(padded, PV_FRAME, axis=0)[::PV_HOP]
+    steps = np.arange(0, len(windows) - 1, rate)
+    expected = 2 * np.pi * PV_HOP * np.arange(PV_FRAME // 2 + 1) / PV_FRAME
+    out = np.zeros((len(steps) + 3, PV_HOP, channels), dtype=np.float32)
+    phase = None
+    for first in range(0, len(steps), PV_CHUNK):
+        index = steps[first:first + PV_CHUNK].astype(np.intp)
+        offset = index[0]
+        spectra = np.fft.rfft(windows[offset:index[-1] + 2] * window, axis=-1)
+        local = index - offset
+        alpha = (steps[first:first + PV_CHUNK] - index)[:, np.newaxis, np.newaxis]
+        magnitude = (1 - alpha) * np.abs(spectra[local]) + alpha * np.abs(spectra[local + 1])
+        # Each bin rotates by its expected amount plus the measured deviation, wrapped to +-pi
+        delta = np.angle(spectra[local + 1]) - np.angle(spectra[local]) - expected
+        delta -= 2 * np.pi * np.round(delta / (2 * np.pi))
+        advance = expected + delta
+        if phase is None:
+            phase = np.angle(spectra[0])
+        phases = phase + np.cumsum(np.concatenate((np.zeros_like(advance[:1]), advance[:-1])), axis=0)
+        phase = phases[-1] + advance[-1]
+        grains = np.fft.irfft(magnitude * np.exp(1j * phases), n=PV_FRAME, axis=-1).astype(np.float32) * window
+        # Overlap-add: a grain spans four hops, so add its quarters one hop apart
+        count = len(grains)
+        quarters = grains.reshape(count, channels, 4, PV_HOP).transpose(2, 0, 3, 1)
+        for k in range(4):
+            out[first + k:first + k + count] += quarters[k]
+    # A squared Hann window at 75% overlap sums to 1.5
+    out = out.reshape(-1, channels)[PV_FRAME // 2:] / np.float32(1.5)
+    return out[:int(round(frames / rate))]
+
+
+def pitch_shift(data, samplerate, semitones, quality=DEFAULT_QUALITY):
+    """Shift the pitch while keeping the length: stretch, then resample back."""
+    if not semitones or not len(data):
+        return data
+    factor = 2 ** (semitones / 12)
+    stretched = time_stretch(data, 1 / factor)
+    shifted = resample(stretched, int(round(samplerate * factor)), samplerate, quality)
+    # Rounding in the stretch and the resampling rate can leave it a frame or two off
+    if len(shifted) >= len(data):
+        return shifted[:len(data)]
+    return np.pad(shifted, ((0, len(data) - len(shifted)), (0, 0)))
+
+
+def render(data, samplerate, params, quality=DEFAULT_QUALITY):
+    """Apply the trim, pitch and speed of params to a (frames, channels) array."""
+    with metrics.span('dsp_render'):
+        data = trim(data, samplerate, params.trim_start, params.trim_end)
+        data = pitch_shift(np.asarray(data, dtype=np.float32), samplerate, params.pitch, quality)
+        data = change_speed(data, samplerate, params.speed, quality)
+        data = np.ascontiguousarray(data, dtype=np.float32)
+    data.setflags(write=False)
+    return data
+
+
+class FadeVoice(Voice):
+    """Applies gain and linear fade in/out to another voice, block by block.
+
+    total is the voice's length in frames, needed to place the fade-out;
+    blocks away from both fades are only scaled by the gain.
+    """
+
+    def __init__(self, voice, samplerate, params, total=None):
+        self.voice = voice
+        self.voice_id = voice.voice_id
+        self.trigger_time = None
+        self.play_record = None
+        self.gain = np.float32(params.gain)
+        self.fade_in = int(params.fade_in * samplerate)
+        self.fade_out = int(params.fade_out * samplerate) if total is not None else 0
+        self.total = total
+        self.position = 0
+        self.finished = False
+        self._ramp = np.arange(0, dtype=np.float32)
+
+    def read(self, frames):
+        chunk = self.voice.read(frames)
+        self.finished = self.voice.finished
+        first = self.position
+        self.position += len(chunk)
+        in_fade_in = first < self.fade_in
+        in_fade_out = self.fade_out and self.position > self.total - self.fade_out
+        if not in_fade_in and not in_fade_out:
+            return chunk * self.gain if self.gain != 1.0 else chunk
+        if len(self._ramp) < len(chunk):
+            self._ramp = np.arange(len(chunk), dtype=np.float32)
+        ramp = self._ramp[:len(chunk)]
+        if in_fade_in:
+            envelope = ramp + np.float32(first)
+            envelope *= np.float32(self.gain / self.fade_in)
+            np.minimum(envelope, self.gain, out=envelope)
+        else:
+            envelope = np.full(len(chunk), self.gain, dtype=np.float32)
+        if in_fade_out:
+            envelope *= np.clip((self.total - first - ramp) * np.float32(1 / self.fade_out), 0.0, 1.0)
+        return chunk * envelope[:, np.newaxis]
+
+    def close(self):
+        self.voice.close()
+
+
+def output_frames(duration, samplerate, params):
+    """Length in frames of a clip of duration seconds after trimming and speed change."""
+    end = duration if params.trim_end is None else min(duration, params.trim_end)
+    seconds = max(0.0, end - params.trim_start) / max(params.speed, SPEED_STEP)
+    return int(math.floor(seconds * samplerate))
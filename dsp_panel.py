@@ -0,0 +1,124 @@
+import os
+import logging
+from PyQt6.QtWidgets import (
+    QDialog, QVBoxLayout, QHBoxLayout, QFormLayout, QDoubleSpinBox, QSpinBox, QComboBox, QCheckBox, QLabel,
+    QPushButton, QGroupBox
+)
+from dsp_params import DspParams, DEFAULT_DSP, dsp_or_none
+from play_mode import PlayMode, DEFAULT_PLAY_MODE, RETRIGGER_MODES, play_mode_or_none
+
+logger = logging.getLogger(__name__)
+
+# (field, label, minimum, maximum, step, decimals, suffix)
+FIELDS = (
+    ('trim_start', "Start at", 0.0, 3600.0, 0.1, 2, " s"),
+    ('trim_end', "Stop at", 0.0, 3600.0, 0.1, 2, " s"),
+    ('fade_in', "Fade in", 0.0, 60.0, 0.1, 2, " s"),
+    ('fade_out', "Fade out", 0.0, 60.0, 0.1, 2, " s"),
+    ('gain_db', "Gain", -60.0, 24.0, 1.0, 1, " dB"),
+    ('speed', "Speed", 0.25, 4.0, 0.05, 2, "x"),
+    ('pitch', "Pitch", -24.0, 24.0, 1.0, 1, " semitones"),
+)
+RETRIGGER_LABELS = {
+    'overlap': "Play again over it",
+    'restart': "Restart",
+    'ignore': "Ignore the press",
+    'toggle': "Stop it",
+}
+MAX_CHOKE_GROUP = 16
+
+
+class DspPanel(QDialog):
+    """Edit a button's trim points, fades, gain, speed and pitch, and how it plays.
+
+    preview is called with the current DspParams to audition them before
+    accepting; params() and mode() return the results, or None for the
+    defaults.
+    """
+
+    def __init__(self, audio_path, dsp, mode, preview, parent=None):
+        super().__init__(parent)
+        self.preview = preview
+        self.setWindowTitle(f"Edit Sound - {os.path.basename(audio_path)}")
+        layout = QVBoxLayout(self)
+        form = QFormLayout()
+        self.boxes = {}
+        for field, label, minimum, maximum, step, decimals, suffix in FIELDS:
+            box = QDoubleSpinBox()
+            box.setRange(minimum, maximum)
+            box.setSingleStep(step)
+            box.setDecimals(decimals)
+            box.setSuffix(suffix)
+            form.addRow(label, box)
+            self.boxes[field] = box
+        # No stop point is shown as "End" at the bottom of the range
+        self.boxes['trim_end'].setSpecialValueText("End")
+        from audio_cache import audio_cache
+        try:
+            duration = audio_cache.duration(audio_path)
+            self.boxes['trim_start'].setMaximum(duration)
+            self.boxes['trim_end'].setMaximum(duration)
+            layout.addWidget(QLabel(f"Length: {duration:.2f} s"))
+        except Exception as e:
+            logger.warning(f"Could not read the length of {audio_path}: {e}")
+        self.boxes['speed'].setToolTip("Plays faster or slower like a tape, so the pitch changes too")
+        self.boxes['pitch'].setToolTip("Changes the pitch without changing the length")
+        layout.addLayout(form)
+        layout.addWidget(self._mode_box())
+        self.set_params(dsp or DEFAULT_DSP)
+        self.set_mode(mode or DEFAULT_PLAY_MODE)
+        buttons = QHBoxLayout()
+        for label, slot in (("Preview", self.play_preview), ("Reset", self.reset),
+                            ("Cancel", self.reject), ("OK", self.accept)):
+            button = QPushButton(label)
+            button.clicked.connect(slot)
+            buttons.addWidget(button)
+        button.setDefault(True)
+        layout.addLayout(buttons)
+
+    def _mode_box(self):
+        box = QGroupBox("Playback")
+        form = QFormLayout(box)
+        self.retrigger = QComboBox()
+        for mode in RETRIGGER_MODES:
+            self.retrigger.addItem(RETRIGGER_LABELS[mode], mode)
+        form.addRow("When pressed while playing", self.retrigger)
+        self.choke_group = QSpinBox()
+        self.choke_group.setRange(0, MAX_CHOKE_GROUP)
+        self.choke_group.setSpecialValueText("None")
+        self.choke_group.setToolTip("Starting this sound cuts off every other sound in the same group")
+        form.addRow("Choke group", self.choke_group)
+        self.loop = QCheckBox("Loop until stopped")
+        form.addRow(self.loop)
+        self.queue = QCheckBox("Queue after the sounds already queued")
+        self.queue.setToolTip("Queued sounds play one after another with no gap")
+        form.addRow(self.queue)
+        return box
+
+    def reset(self):
+        self.set_params(DEFAULT_DSP)
+        self.set_mode(DEFAULT_PLAY_MODE)
+
+    def set_mode(self, mode):
+        self.retrigger.setCurrentIndex(RETRIGGER_MODES.index(mode.retrigger))
+        self.choke_group.setValue(mode.choke_group)
+        self.loop.setChecked(mode.loop)
+        self.queue.setChecked(mode.queue)
+
+    def mode(self):
+        return play_mode_or_none(PlayMode(self.retrigger.currentData(), self.choke_group.value(),
+                                          self.loop.isChecked(), self.queue.isChecked()))
+
+    def set_params(self, params):
+        for field, box in self.boxes.items():
+            value = getattr(params, field)
+            box.setValue(box.minimum() if value is None else value)
+
+    def params(self):
+        values = {field: box.value() for field, box in self.boxes.items()}
+        if values['trim_end'] == self.boxes['trim_end'].minimum():
+            values['trim_end'] = None
+        return dsp_or_none(DspParams(**values))
+
+    def play_preview(self):
+        self.preview(self.params())
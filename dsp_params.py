@@ -0,0 +1,42 @@
+from collections import namedtuple
+
+DSP_FIELDS = ('trim_start', 'trim_end', 'fade_in', 'fade_out', 'gain_db', 'speed', 'pitch')
+
+
+class DspParams(namedtuple('DspParams', DSP_FIELDS, defaults=(0.0, None, 0.0, 0.0, 0.0, 1.0, 0.0))):
+    """Per-button processing: trim points and fades in seconds, gain in dB, speed as a
+    playback rate (changes pitch too) and pitch in semitones (keeps the length).
+
+    Trim, speed and pitch change the audio itself and are rendered once into
+    the audio cache; gain and fades are applied block by block as the voice
+    plays, so changing them costs nothing.
+    """
+    __slots__ = ()
+
+    @property
+    def gain(self):
+        return 10 ** (self.gain_db / 20)
+
+    def structure(self):
+        return (self.trim_start, self.trim_end, self.speed, self.pitch)
+
+    def needs_render(self):
+        return self.structure() != DEFAULT_DSP.structure()
+
+    def has_fades(self):
+        return self.fade_in > 0 or self.fade_out > 0
+
+
+DEFAULT_DSP = DspParams()
+
+
+def dsp_or_none(values):
+    """DspParams from stored values, or None when they change nothing."""
+    if values is None:
+        return None
+    if isinstance(values, dict):
+        values = DspParams(**values)
+    # Most buttons have no processing; comparing the plain tuple first keeps board loads cheap
+    if tuple(values) == DEFAULT_DSP:
+        return None
+    return DspParams(*values)
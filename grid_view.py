@@ -0,0 +1,228 @@
+import math
+from PyQt6.QtWidgets import (
+    QWidget, QVBoxLayout, QTabBar, QTableView, QAbstractItemView, QHeaderView,
+    QStyledItemDelegate, QStyleOptionButton, QStyle, QApplication
+)
+from PyQt6.QtGui import QColor, QPalette
+from PyQt6.QtCore import Qt, QAbstractTableModel, QModelIndex, QSize, pyqtSignal
+
+TILE_WIDTH = 120
+TILE_HEIGHT = 36
+DEFAULT_PAGE_ROWS = 20
+# Largest area the view asks for before it starts scrolling
+MAX_VISIBLE_COLS = 10
+MAX_VISIBLE_ROWS = 12
+MISSING_COLOR = QColor('#c0392b')
+
+
+class OccupancyIndex:
+    """Tracks which grid cells hold a button and finds the first free one.
+
+    Cells are scanned in row-major order from a hint that only moves backwards
+    when a cell before it is freed, so repeated lookups are amortised O(1)
+    instead of a scan over every layout item.
+    """
+
+    def __init__(self, cols, cells=()):
+        self.cols = cols
+        self.occupied = set(cells)
+        self._hint = 0
+
+    def add(self, cell):
+        self.occupied.add(cell)
+
+    def discard(self, cell):
+        self.occupied.discard(cell)
+        linear = cell[0] * self.cols + cell[1]
+        if linear < self._hint:
+            self._hint = linear
+
+    def first_free(self, rows):
+        """Return the first free (row, col) within rows, or None if the grid is full."""
+        linear = self._hint
+        while linear < rows * self.cols:
+            cell = divmod(linear, self.cols)
+            if cell not in self.occupied:
+                self._hint = linear
+                return cell
+            linear += 1
+        self._hint = linear
+        return None
+
+
+class ButtonGridModel(QAbstractTableModel):
+    """Board cells for one page of the grid; only the page's rows are exposed to the view."""
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.cells = {}
+        self.rows = 0
+        self.cols = 0
+        self.page = 0
+        self.page_rows = DEFAULT_PAGE_ROWS
+        # Audio paths that no longer exist on disk, painted in red
+        self.missing = set()
+
+    def load(self, cells, rows, cols):
+        self.beginResetModel()
+        self.cells = cells
+        self.rows = rows
+        self.cols = cols
+        self.page = min(self.page, max(0, self.page_count() - 1))
+        self.endResetModel()
+
+    def page_count(self):
+        return max(1, math.ceil(self.rows / self.page_rows))
+
+    def set_page(self, page):
+        self.beginResetModel()
+        self.page = page
+        self.endResetModel()
+
+    def page_cells(self):
+        first = self.page * self.page_rows
+        return {cell: state for cell, state in self.cells.items() if first <= cell[0] < first + self.page_rows}
+
+    def cell_at(self, index):
+        return (self.page * self.page_rows + index.row(), index.column())
+
+    def set_cell(self, cell, state):
+        if state is None:
+            self.cells.pop(cell, None)
+        else:
+            self.cells[cell] = state
+        if cell[0] >= self.rows:
+            self.set_rows(cell[0] + 1)
+        row = cell[0] - self.page * self.page_rows
+        if 0 <= row < self.page_rows:
+            index = self.index(row, cell[1])
+            self.dataChanged.emit(index, index)
+
+    def set_missing(self, paths):
+        self.missing = set(paths)
+        if self.rowCount() and self.cols:
+            self.dataChanged.emit(self.index(0, 0), self.index(self.rowCount() - 1, self.cols - 1))
+
+    def set_rows(self, rows):
+        self.beginResetModel()
+        self.rows = rows
+        self.endResetModel()
+
+    def rowCount(self, parent=QModelIndex()):
+        if parent.isValid():
+            return 0
+        return max(0, min(self.page_rows, self.rows - self.page * self.page_rows))
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else self.cols
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        state = self.cells.get(self.cell_at(index))
+        if state is None:
+            return None
+        if role == Qt.ItemDataRole.DisplayRole:
+            return state[0]
+        if role == Qt.ItemDataRole.ToolTipRole and state[1] in self.missing:
+            return f"File not found: {state[1]}"
+        if role in (Qt.ItemDataRole.ToolTipRole, Qt.ItemDataRole.UserRole):
+            return state[1]
+        if role == Qt.ItemDataRole.ForegroundRole and state[1] in self.missing:
+            return MISSING_COLOR
+        return None
+
+
+class TileDelegate(QStyledItemDelegate):
+    """Paints each occupied cell as a push button without creating a widget for it."""
+
+    def paint(self, painter, option, index):
+        label = index.data(Qt.ItemDataRole.DisplayRole)
+        if label is None:
+            return
+        button = QStyleOptionButton()
+        button.rect = option.rect.adjusted(2, 2, -2, -2)
+        button.text = label
+        color = index.data(Qt.ItemDataRole.ForegroundRole)
+        if color is not None:
+            button.palette = QPalette(option.palette)
+            button.palette.setColor(QPalette.ColorRole.ButtonText, color)
+        button.state = QStyle.StateFlag.State_Enabled | QStyle.StateFlag.State_Raised
+        if option.state & QStyle.StateFlag.State_MouseOver:
+            button.state |= QStyle.StateFlag.State_MouseOver
+        style = option.widget.style() if option.widget else QApplication.style()
+        style.drawControl(QStyle.ControlElement.CE_PushButton, button, painter, option.widget)
+
+    def sizeHint(self, option, index):
+        return QSize(TILE_WIDTH, TILE_HEIGHT)
+
+
+class PagedGridView(QWidget):
+    """Virtualized button grid: a table view that paints only the visible tiles, split into pages."""
+
+    cell_clicked = pyqtSignal(int, int)
+    cell_menu_requested = pyqtSignal(int, int, object)
+    page_changed = pyqtSignal(int)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.model = ButtonGridModel(self)
+        self.tabs = QTabBar(self)
+        self.tabs.currentChanged.connect(self._on_tab_changed)
+        self.view = QTableView(self)
+        self.view.setModel(self.model)
+        self.view.setItemDelegate(TileDelegate(self.view))
+        self.view.setShowGrid(False)
+        self.view.setMouseTracking(True)
+        self.view.setSelectionMode(QAbstractItemView.SelectionMode.NoSelection)
+        self.view.setEditTriggers(QAbstractItemView.EditTrigger.NoEditTriggers)
+        self.view.setFocusPolicy(Qt.FocusPolicy.NoFocus)
+        for header, size in ((self.view.horizontalHeader(), TILE_WIDTH), (self.view.verticalHeader(), TILE_HEIGHT)):
+            header.hide()
+            header.setSectionResizeMode(QHeaderView.ResizeMode.Fixed)
+            header.setDefaultSectionSize(size)
+        self.view.clicked.connect(self._on_clicked)
+        self.view.setContextMenuPolicy(Qt.ContextMenuPolicy.CustomContextMenu)
+        self.view.customContextMenuRequested.connect(self._on_menu)
+        layout = QVBoxLayout(self)
+        layout.setContentsMargins(0, 0, 0, 0)
+        layout.addWidget(self.tabs)
+        layout.addWidget(self.view)
+
+    def load(self, cells, rows, cols, page_rows=DEFAULT_PAGE_ROWS):
+        self.model.page_rows = page_rows
+        self.model.load(cells, rows, cols)
+        self.update_tabs()
+        frame = 2 * self.view.frameWidth() + self.view.verticalScrollBar().sizeHint().width()
+        self.view.setMinimumSize(min(cols, MAX_VISIBLE_COLS) * TILE_WIDTH + frame,
+                                 min(page_rows, MAX_VISIBLE_ROWS) * TILE_HEIGHT + frame)
+
+    def update_tabs(self):
+        self.tabs.blockSignals(True)
+        while self.tabs.count() > self.model.page_count():
+            self.tabs.removeTab(self.tabs.count() - 1)
+        while self.tabs.count() < self.model.page_count():
+            self.tabs.addTab(f"Page {self.tabs.count() + 1}")
+        self.tabs.setCurrentIndex(self.model.page)
+        self.tabs.setVisible(self.tabs.count() > 1)
+        self.tabs.blockSignals(False)
+
+    def set_cell(self, cell, state):
+        pages = self.model.page_count()
+        self.model.set_cell(cell, state)
+        if self.model.page_count() != pages:
+            self.update_tabs()
+
+    def _on_tab_changed(self, page):
+        self.model.set_page(page)
+        self.page_changed.emit(page)
+
+    def _on_clicked(self, index):
+        cell = self.model.cell_at(index)
+        if cell in self.model.cells:
+            self.cell_clicked.emit(*cell)
+
+    def _on_menu(self, pos):
+        index = self.view.indexAt(pos)
+        if index.isValid():
+            cell = self.model.cell_at(index)
+            if cell in self.model.cells:
+                self.cell_menu_requested.emit(cell[0], cell[1], self.view.viewport().mapToGlobal(pos))
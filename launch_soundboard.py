@@ -1,32 +1,30 @@
-import subprocess
+import time
+# Taken before anything heavy is imported, so the startup timings include imports
+LAUNCHED = time.perf_counter()
+
 import sys
 import logging
-from main import ensure_pipewire_virtual_source, cleanup_pipewire_virtual_source
+from startup import StartupTimer
 
 logging.basicConfig(
-    filename='launcher.log',
+    filename='app.log',
     filemode='a',
     format='%(asctime)s %(levelname)s: %(message)s',
-    level=logging.DEBUG
+    level=logging.INFO
 )
 logger = logging.getLogger(__name__)
 
 def main():
-    logger.info("Setting up PipeWire virtual devices...")
-    try:
-        ensure_pipewire_virtual_source()
-    except Exception as e:
-        logger.error(f"Error setting up PipeWire devices: {e}")
+    # One process: the window comes up from the database first and PipeWire
+    # is set up in the background, so nothing is imported or probed twice
+    startup = StartupTimer(LAUNCHED)
+    import main as app
+    startup.mark('imports')
     try:
-        logger.info("Launching soundboard app subprocess...")
-        proc = subprocess.Popen([sys.executable, 'main.py'])
-        proc.wait()
+        return app.run(startup=startup)
     finally:
         logger.info("Cleaning up PipeWire virtual devices...")
-        try:
-            cleanup_pipewire_virtual_source()
-        except Exception as e:
-            logger.error(f"Error cleaning up PipeWire devices: {e}")
+        app.cleanup_pipewire_virtual_source()
 
 if __name__ == "__main__":
-    main()
+    sys.exit(main())
@@ -0,0 +1,330 @@
+import os
+import sys
+import time
+import queue
+import errno
+import select
+import struct
+import ctypes
+import ctypes.util
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from soundboard_db import SoundboardDB
+
+logger = logging.getLogger(__name__)
+
+AUDIO_EXTENSIONS = ('.wav', '.mp3', '.ogg', '.flac')
+SCAN_WORKERS = 4
+SAVE_BATCH = 500
+# Changes reported by inotify are collected for this long and applied together
+WATCH_DEBOUNCE = 0.5
+
+# From <sys/inotify.h>
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_ISDIR = 0x40000000
+WATCH_MASK = IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE | IN_DELETE_SELF | IN_ONLYDIR
+EVENT_HEADER = struct.Struct('iIII')
+
+
+def is_audio_file(path):
+    return path.lower().endswith(AUDIO_EXTENSIONS)
+
+
+def probe(path, st):
+    """Library row for path; format is None if libsndfile cannot open it."""
+    entry = {
+        'path': path,
+        'name': os.path.splitext(os.path.basename(path))[0],
+        'format': None,
+        'duration': None,
+        'samplerate': None,
+        'channels': None,
+        'size': st.st_size,
+        'mtime': st.st_mtime,
+    }
+    import soundfile as sf  # deferred so that the window can create the indexer before soundfile is loaded
+    try:
+        info = sf.info(path)
+    except Exception as e:
+        logger.debug(f"Not indexing {path}: {e}")
+        return entry
+    entry.update(format=info.format, duration=info.duration, samplerate=info.samplerate, channels=info.channels)
+    return entry
+
+
+def _list_dir(path):
+    files, subdirs = [], []
+    try:
+        with os.scandir(path) as entries:
+            for entry in entries:
+                try:
+                    if entry.is_dir(follow_symlinks=False):
+                        subdirs.append(entry.path)
+                    elif entry.is_file() and is_audio_file(entry.name):
+                        files.append((entry.path, entry.stat()))
+                except OSError:
+                    continue
+    except OSError as e:
+        logger.warning(f"Cannot list {path}: {e}")
+    return files, subdirs
+
+
+class InotifyWatcher:
+    """Recursive directory watcher on the raw inotify syscalls, via ctypes.
+
+    on_event(path, mask) runs on the watcher thread for every event. Each
+    directory needs its own watch; new directories are added by the caller
+    once it has scanned them.
+    """
+
+    def __init__(self, on_event):
+        libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        self._add_watch = libc.inotify_add_watch
+        self._add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+        self.fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self.on_event = on_event
+        self.watches = {}
+        self.limit_reached = False
+        self._stop_read, self._stop_write = os.pipe()
+        self._thread = threading.Thread(target=self._run, name='library-watch', daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def add(self, path):
+        if self.limit_reached:
+            return
+        wd = self._add_watch(self.fd, os.fsencode(path), WATCH_MASK)
+        if wd < 0:
+            err = ctypes.get_errno()
+            if err == errno.ENOSPC:
+                self.limit_reached = True
+                logger.warning(f"inotify watch limit reached at {len(self.watches)} folders; raise "
+                               f"fs.inotify.max_user_watches, changes below {path} are picked up on the next scan")
+            elif err != errno.ENOENT:
+                logger.warning(f"Cannot watch {path}: {os.strerror(err)}")
+            return
+        self.watches[wd] = path
+
+    def _run(self):
+        while True:
+            ready, _, _ = select.select([self.fd, self._stop_read], [], [])
+            if self._stop_read in ready:
+                return
+            try:
+                data = os.read(self.fd, 64 * 1024)
+            except BlockingIOError:
+                continue
+            offset = 0
+            while offset < len(data):
+                wd, mask, _, length = EVENT_HEADER.unpack_from(data, offset)
+                name = data[offset + EVENT_HEADER.size:offset + EVENT_HEADER.size + length].rstrip(b'\0')
+                offset += EVENT_HEADER.size + length
+                if mask & IN_IGNORED:
+                    self.watches.pop(wd, None)
+                    continue
+                directory = self.watches.get(wd)
+                if directory is None and not mask & IN_Q_OVERFLOW:
+                    continue
+                path = os.path.join(directory, os.fsdecode(name)) if directory and name else directory
+                try:
+                    self.on_event(path, mask)
+                except Exception as e:
+                    logger.error(f"Library watch event for {path} failed: {e}")
+
+    def close(self):
+        os.write(self._stop_write, b'x')
+        if self._thread.is_alive():
+            self._thread.join()
+        for fd in (self.fd, self._stop_read, self._stop_write):
+            os.close(fd)
+
+
+class LibraryIndexer:
+    """Keeps the library tables in the database in step with the configured folders.
+
+    Folders are walked with a pool of threads that list directories and
+    probe new or changed files; unchanged files (same mtime and size) are
+    never reopened. After the first scan inotify reports changes, which are
+    applied in small batches instead of rescanning. All database writes
+    happen on the indexer's own thread and connection; on_change(changed,
+    removed) is called from it with the affected paths.
+    """
+
+    def __init__(self, db_path, on_change=None, workers=SCAN_WORKERS):
+        self.db_path = db_path
+        self.on_change = on_change
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='library-scan')
+        self.tasks = queue.SimpleQueue()
+        self.folders = []
+        self.watcher = None
+        self.scanning = False
+        self.last_scan_time = None
+        self._thread = None
+
+    def start(self, folders):
+        if self._thread is not None:
+            return
+        self.folders = list(folders)
+        if sys.platform.startswith('linux'):
+            try:
+                self.watcher = InotifyWatcher(self._on_watch_event)
+                self.watcher.start()
+            except OSError as e:
+                logger.warning(f"Library folders are not watched, inotify is unavailable: {e}")
+        self._thread = threading.Thread(target=self._run, name='library', daemon=True)
+        self._thread.start()
+        self.rescan()
+
+    def rescan(self):
+        for folder in self.folders:
+            self.tasks.put(('scan', folder))
+
+    def add_folder(self, folder):
+        if folder not in self.folders:
+            self.folders.append(folder)
+            self.tasks.put(('scan', folder))
+
+    def remove_folder(self, folder):
+        if folder in self.folders:
+            self.folders.remove(folder)
+        self.tasks.put(('remove', folder))
+
+    def check_missing(self, paths, callback):
+        """Call callback(set of missing paths) from a background thread.
+
+        Runs apart from the scan queue so a long scan never delays it.
+        """
+        paths = list(paths)
+        threading.Thread(target=lambda: callback({path for path in paths if path and not os.path.exists(path)}),
+                         name='library-missing', daemon=True).start()
+
+    def stop(self):
+        if self._thread is not None:
+            self.tasks.put(None)
+            self._thread.join()
+            self._thread = None
+        if self.watcher is not None:
+            self.watcher.close()
+            self.watcher = None
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+    def stats(self):
+        return {
+            'folders': len(self.folders),
+            'watched_dirs': len(self.watcher.watches) if self.watcher else 0,
+            'scanning': self.scanning,
+            'last_scan_ms': self.last_scan_time * 1000 if self.last_scan_time is not None else None,
+        }
+
+    def _on_watch_event(self, path, mask):
+        if path and not any(path == folder or path.startswith(folder.rstrip(os.sep) + os.sep) for folder in self.folders):
+            return  # still watched below a folder that was removed
+        if mask & IN_Q_OVERFLOW:
+            logger.warning("inotify queue overflowed, rescanning the library")
+            self.rescan()
+        elif mask & IN_ISDIR or mask & IN_DELETE_SELF:
+            # A folder appeared, vanished or moved: rescanning just that subtree adds or drops its files
+            self.tasks.put(('scan', path))
+        elif is_audio_file(path):
+            self.tasks.put(('changed', path))
+
+    def _run(self):
+        db = SoundboardDB(self.db_path)
+        pending = set()
+        while True:
+            try:
+                task = self.tasks.get(timeout=WATCH_DEBOUNCE if pending else None)
+            except queue.Empty:
+                self._apply_changes(db, pending)
+                pending = set()
+                continue
+            if task is None:
+                break
+            kind, arg = task
+            try:
+                if kind == 'scan':
+                    self._scan(db, arg)
+                elif kind == 'changed':
+                    pending.add(arg)
+                elif kind == 'remove':
+                    db.remove_library_folder(arg)
+                    self._notify((), ())
+            except Exception as e:
+                logger.error(f"Library task {kind} {arg!r} failed: {e}")
+        db.close()
+
+    def _walk(self, root):
+        """Yield (path, stat) for audio files below root, listing directories in parallel."""
+        futures = {self.executor.submit(_list_dir, root)}
+        if self.watcher is not None:
+            self.watcher.add(root)
+        while futures:
+            done, futures = wait(futures, return_when=FIRST_COMPLETED)
+            for future in done:
+                files, subdirs = future.result()
+                yield from files
+                for subdir in subdirs:
+                    if self.watcher is not None:
+                        self.watcher.add(subdir)
+                    futures.add(self.executor.submit(_list_dir, subdir))
+
+    def _scan(self, db, root):
+        start = time.perf_counter()
+        self.scanning = True
+        try:
+            known = db.get_library_files(root)
+            seen = set()
+            stale = []
+            for path, st in self._walk(root) if os.path.isdir(root) else ():
+                seen.add(path)
+                if known.get(path) != (st.st_mtime, st.st_size):
+                    stale.append((path, st))
+            removed = [path for path in known if path not in seen]
+            if removed:
+                db.delete_library_files(removed)
+            changed = []
+            for i in range(0, len(stale), SAVE_BATCH):
+                batch = stale[i:i + SAVE_BATCH]
+                db.save_library_files(list(self.executor.map(lambda item: probe(*item), batch)))
+                changed.extend(path for path, _ in batch)
+        finally:
+            self.scanning = False
+        self.last_scan_time = time.perf_counter() - start
+        logger.info(f"Scanned {root} in {self.last_scan_time:.2f} s: {len(seen)} files, "
+                    f"{len(changed)} new or changed, {len(removed)} removed")
+        if changed or removed:
+            self._notify(changed, removed)
+
+    def _apply_changes(self, db, paths):
+        changed, removed, entries = [], [], []
+        for path in paths:
+            try:
+                st = os.stat(path)
+            except OSError:
+                removed.append(path)
+                continue
+            entries.append(probe(path, st))
+            changed.append(path)
+        if entries:
+            db.save_library_files(entries)
+        if removed:
+            db.delete_library_files(removed)
+        logger.debug(f"Library updated: {len(changed)} changed, {len(removed)} removed")
+        self._notify(changed, removed)
+
+    def _notify(self, changed, removed):
+        if self.on_change is not None:
+            self.on_change(list(changed), list(removed))
@@ -0,0 +1,127 @@
+import os
+from PyQt6.QtWidgets import (
+    QDialog, QWidget, QVBoxLayout, QHBoxLayout, QLineEdit, QTableWidget, QTableWidgetItem, QListWidget,
+    QPushButton, QLabel, QFileDialog, QAbstractItemView, QHeaderView, QSplitter
+)
+from PyQt6.QtCore import Qt
+
+RESULT_LIMIT = 200
+COLUMNS = ("Name", "Duration", "Rate", "Ch", "Format", "Folder")
+
+
+def format_duration(seconds):
+    if seconds is None:
+        return ""
+    minutes, seconds = divmod(seconds, 60)
+    return f"{int(minutes)}:{seconds:04.1f}"
+
+
+class LibraryPanel(QDialog):
+    """Search the indexed sound folders and manage which folders are indexed.
+
+    In pick mode the dialog is used to assign a sound: double-click or
+    Assign accepts it and selected_path() returns the chosen file.
+    """
+
+    def __init__(self, db, indexer, parent=None, pick=False):
+        super().__init__(parent)
+        self.db = db
+        self.indexer = indexer
+        self.setWindowTitle("Choose a Sound" if pick else "Sound Library")
+        self.resize(820, 520)
+        layout = QVBoxLayout(self)
+        self.search = QLineEdit()
+        self.search.setPlaceholderText("Search by name or folder")
+        self.search.setClearButtonEnabled(True)
+        self.search.textChanged.connect(self.refresh)
+        layout.addWidget(self.search)
+        splitter = QSplitter(Qt.Orientation.Horizontal)
+        self.results = QTableWidget(0, len(COLUMNS))
+        self.results.setHorizontalHeaderLabels(COLUMNS)
+        self.results.setSelectionBehavior(QAbstractItemView.SelectionBehavior.SelectRows)
+        self.results.setSelectionMode(QAbstractItemView.SelectionMode.SingleSelection)
+        self.results.setEditTriggers(QAbstractItemView.EditTrigger.NoEditTriggers)
+        self.results.verticalHeader().hide()
+        self.results.horizontalHeader().setSectionResizeMode(0, QHeaderView.ResizeMode.Stretch)
+        splitter.addWidget(self.results)
+        folder_box = QVBoxLayout()
+        self.folders = QListWidget()
+        folder_box.addWidget(QLabel("Folders"))
+        folder_box.addWidget(self.folders)
+        for label, slot in (("Add Folder...", self.add_folder), ("Remove Folder", self.remove_folder),
+                            ("Rescan", self.rescan)):
+            button = QPushButton(label)
+            button.clicked.connect(slot)
+            folder_box.addWidget(button)
+        folders = QWidget()
+        folders.setLayout(folder_box)
+        splitter.addWidget(folders)
+        splitter.setStretchFactor(0, 3)
+        splitter.setStretchFactor(1, 1)
+        layout.addWidget(splitter)
+        bottom = QHBoxLayout()
+        self.status = QLabel()
+        bottom.addWidget(self.status, 1)
+        if pick:
+            assign = QPushButton("Assign")
+            assign.setDefault(True)
+            assign.clicked.connect(self.accept_selection)
+            bottom.addWidget(assign)
+            self.results.doubleClicked.connect(self.accept_selection)
+        close = QPushButton("Cancel" if pick else "Close")
+        close.clicked.connect(self.reject)
+        bottom.addWidget(close)
+        layout.addLayout(bottom)
+        self.load_folders()
+        self.refresh()
+
+    def load_folders(self):
+        self.folders.clear()
+        self.folders.addItems(self.db.get_library_folders())
+
+    def refresh(self):
+        """Rerun the search; also called when the indexer reports changes."""
+        entries = self.db.search_library(self.search.text(), RESULT_LIMIT)
+        self.results.setUpdatesEnabled(False)
+        self.results.setRowCount(len(entries))
+        for row, entry in enumerate(entries):
+            values = (entry['name'], format_duration(entry['duration']), str(entry['samplerate'] or ""),
+                      str(entry['channels'] or ""), entry['format'] or "", os.path.dirname(entry['path']))
+            for col, value in enumerate(values):
+                item = QTableWidgetItem(value)
+                item.setData(Qt.ItemDataRole.UserRole, entry['path'])
+                item.setToolTip(entry['path'])
+                self.results.setItem(row, col, item)
+        self.results.setUpdatesEnabled(True)
+        total = self.db.library_file_count()
+        shown = f"first {len(entries)}" if len(entries) == RESULT_LIMIT else str(len(entries))
+        self.status.setText(f"{shown} of {total} sounds" + (" (scanning...)" if self.indexer.scanning else ""))
+
+    def add_folder(self):
+        folder = QFileDialog.getExistingDirectory(self, "Add Sound Folder")
+        if not folder:
+            return
+        self.db.add_library_folder(folder)
+        self.indexer.add_folder(folder)
+        self.load_folders()
+
+    def remove_folder(self):
+        item = self.folders.currentItem()
+        if item is None:
+            return
+        self.indexer.remove_folder(item.text())
+        self.db.remove_library_folder(item.text())
+        self.load_folders()
+        self.refresh()
+
+    def rescan(self):
+        self.indexer.rescan()
+        self.refresh()
+
+    def selected_path(self):
+        item = self.results.item(self.results.currentRow(), 0)
+        return item.data(Qt.ItemDataRole.UserRole) if item is not None else None
+
+    def accept_selection(self):
+        if self.selected_path():
+            self.accept()
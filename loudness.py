@@ -0,0 +1,262 @@
+"""Integrated loudness (EBU R128 / ITU-R BS.1770) and true peak analysis.
+
+Run as a script to analyse a whole library up front:
+    python loudness.py ~/Sounds [--workers 4]
+"""
+import os
+import sys
+import math
+import time
+import logging
+import argparse
+import threading
+from functools import lru_cache
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+import numpy as np
+import soundfile as sf
+from resampler import StreamingResampler
+from library import AUDIO_EXTENSIONS
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TARGET_LUFS = -16.0
+TRUE_PEAK_CEILING = -1.0
+# Gain applied to a clip is limited to this range so near-silent files are not blown up
+MAX_GAIN_DB = 12.0
+MIN_GAIN_DB = -24.0
+SEGMENT_SECONDS = 0.1
+BLOCK_SEGMENTS = 4  # 400 ms gating blocks with 75% overlap
+READ_SEGMENTS = 50
+ABSOLUTE_GATE = -70.0
+RELATIVE_GATE = -10.0
+SAVE_BATCH = 64
+
+# BS.1770 K-weighting: a high shelf followed by a high-pass, given as analogue
+# prototypes so the filters can be derived for any sample rate.
+SHELF_GAIN_DB = 3.999843853973347
+SHELF_Q = 0.7071752369554196
+SHELF_FREQ = 1681.974450955533
+HIGHPASS_Q = 0.5003270373238773
+HIGHPASS_FREQ = 38.13547087602444
+
+
+def _biquad_response(b, a, w):
+    z = np.exp(-1j * w)
+    return (b[0] + b[1] * z + b[2] * z * z) / (a[0] + a[1] * z + a[2] * z * z)
+
+
+@lru_cache(maxsize=16)
+def k_weighting_power(samplerate, frames):
+    """Per-bin weights that turn |rfft|^2 of a segment into its K-weighted mean square."""
+    w = 2 * np.pi * np.fft.rfftfreq(frames)
+    K = np.tan(np.pi * SHELF_FREQ / samplerate)
+    Vh = 10 ** (SHELF_GAIN_DB / 20)
+    Vb = Vh ** 0.4996667741545416
+    shelf_b = (Vh + Vb * K / SHELF_Q + K * K, 2 * (K * K - Vh), Vh - Vb * K / SHELF_Q + K * K)
+    shelf_a = (1 + K / SHELF_Q + K * K, 2 * (K * K - 1), 1 - K / SHELF_Q + K * K)
+    K = np.tan(np.pi * HIGHPASS_FREQ / samplerate)
+    highpass_b = (1.0, -2.0, 1.0)
+    a0 = 1 + K / HIGHPASS_Q + K * K
+    highpass_a = (1.0, 2 * (K * K - 1) / a0, (1 - K / HIGHPASS_Q + K * K) / a0)
+    response = _biquad_response(shelf_b, shelf_a, w) * _biquad_response(highpass_b, highpass_a, w)
+    # Parseval: one-sided spectrum, so every bin but DC (and Nyquist) counts twice
+    weights = 2 * np.abs(response) ** 2 / (frames * frames)
+    weights[0] /= 2
+    if frames % 2 == 0:
+        weights[-1] /= 2
+    return weights.astype(np.float32)
+
+
+def segment_powers(segments, samplerate):
+    """K-weighted mean square of each segment; segments has shape (n, frames, channels)."""
+    spectrum = np.fft.rfft(segments, axis=1)
+    power = spectrum.real ** 2 + spectrum.imag ** 2
+    return np.einsum('nfc,f->nc', power, k_weighting_power(samplerate, segments.shape[1]))
+
+
+def _loudness(power):
+    return -0.691 + 10 * np.log10(np.maximum(power, 1e-20))
+
+
+def integrated_loudness(powers):
+    """Gated integrated loudness in LUFS from 100 ms segment powers (n, channels), or None if silent."""
+    if len(powers) == 0:
+        return None
+    if len(powers) < BLOCK_SEGMENTS:
+        blocks = powers.mean(axis=0, keepdims=True)
+    else:
+        windows = np.lib.stride_tricks.sliding_window_view(powers, BLOCK_SEGMENTS, axis=0)
+        blocks = windows.mean(axis=-1)
+    block_power = blocks.sum(axis=1)
+    gated = block_power[_loudness(block_power) > ABSOLUTE_GATE]
+    if len(gated) == 0:
+        return None
+    threshold = _loudness(gated.mean()) + RELATIVE_GATE
+    gated = gated[_loudness(gated) > threshold]
+    return float(_loudness(gated.mean()))
+
+
+def analyze_file(path):
+    """Return {'loudness', 'true_peak', 'duration'} for an audio file.
+
+    The file is read in chunks; loudness is measured per 100 ms segment in the
+    frequency domain and true peak on a 4x oversampled signal. Loudness and
+    true peak are None for silent files.
+    """
+    powers = []
+    peak = 0.0
+    frames_read = 0
+    with sf.SoundFile(path) as f:
+        samplerate, channels = f.samplerate, f.channels
+        segment = max(1, int(round(samplerate * SEGMENT_SECONDS)))
+        oversample = 4 if samplerate < 96000 else 2
+        upsampler = StreamingResampler(samplerate, samplerate * oversample, channels)
+        pending = np.zeros((0, channels), dtype=np.float32)
+        for block in f.blocks(blocksize=segment * READ_SEGMENTS, dtype='float32', always_2d=True):
+            frames_read += len(block)
+            upsampled = upsampler.process(block)
+            if len(upsampled):
+                peak = max(peak, float(np.abs(upsampled).max()))
+            pending = np.concatenate((pending, block)) if len(pending) else block
+            whole = len(pending) // segment
+            if whole:
+                powers.append(segment_powers(pending[:whole * segment].reshape(whole, segment, channels), samplerate))
+                pending = pending[whole * segment:]
+        tail = upsampler.flush()
+        if len(tail):
+            peak = max(peak, float(np.abs(tail).max()))
+    powers = np.concatenate(powers) if powers else np.zeros((0, channels), dtype=np.float32)
+    if len(pending) and len(powers) < BLOCK_SEGMENTS:
+        # Clips shorter than one gating block still need a measurement
+        padded = np.zeros((1, segment, channels), dtype=np.float32)
+        padded[0, :len(pending)] = pending
+        partial = segment_powers(padded, samplerate) * (segment / len(pending))
+        powers = np.concatenate((powers, partial))
+    return {
+        'loudness': integrated_loudness(powers),
+        'true_peak': 20 * math.log10(peak) if peak > 0 else None,
+        'duration': frames_read / samplerate,
+    }
+
+
+def clip_gain(analysis, target=DEFAULT_TARGET_LUFS):
+    """Linear gain that brings a clip to target LUFS without its true peak exceeding the ceiling."""
+    if not analysis or analysis.get('loudness') is None:
+        return 1.0
+    gain_db = target - analysis['loudness']
+    if analysis.get('true_peak') is not None:
+        gain_db = min(gain_db, TRUE_PEAK_CEILING - analysis['true_peak'])
+    gain_db = min(MAX_GAIN_DB, max(MIN_GAIN_DB, gain_db))
+    return 10 ** (gain_db / 20)
+
+
+class LoudnessAnalyzer:
+    """Analyses clips on a background thread, once per file version.
+
+    ``known`` maps paths to stored analyses, each with the mtime of the file it
+    was taken from; clips whose mtime still matches are skipped. Fresh results
+    are passed to ``callback(path, analysis)`` on the worker thread. As with
+    the preloader, ``cancel`` drops everything still queued.
+    """
+
+    def __init__(self, callback, known=None, max_workers=1):
+        self.callback = callback
+        self.known = dict(known or {})
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='loudness')
+        self._generation = 0
+        self._futures = []
+        self._lock = threading.Lock()
+
+    def analyze(self, paths):
+        with self._lock:
+            generation = self._generation
+            for path in dict.fromkeys(p for p in paths if p):
+                self._futures.append(self.executor.submit(self._analyze, generation, path))
+
+    def _analyze(self, generation, path):
+        if generation != self._generation:
+            return
+        try:
+            mtime = os.path.getmtime(path)
+        except OSError:
+            return
+        known = self.known.get(path)
+        if known is not None and known['mtime'] == mtime:
+            return
+        try:
+            start = time.perf_counter()
+            analysis = analyze_file(path)
+        except Exception as e:
+            logger.warning(f"Could not analyse {path}: {e}")
+            return
+        analysis['mtime'] = mtime
+        self.known[path] = analysis
+        logger.debug(f"Analysed {path} in {(time.perf_counter() - start) * 1000:.0f} ms: {analysis}")
+        self.callback(path, analysis)
+
+    def cancel(self):
+        with self._lock:
+            self._generation += 1
+            for future in self._futures:
+                future.cancel()
+            self._futures.clear()
+
+    def shutdown(self):
+        self.cancel()
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+
+def _analyze_path(path):
+    try:
+        return path, os.path.getmtime(path), analyze_file(path), None
+    except Exception as e:
+        return path, None, None, str(e)
+
+
+def find_audio_files(roots):
+    for root in roots:
+        if os.path.isfile(root):
+            yield os.path.abspath(root)
+            continue
+        for dirpath, _, filenames in os.walk(root):
+            for name in sorted(filenames):
+                if name.lower().endswith(AUDIO_EXTENSIONS):
+                    yield os.path.abspath(os.path.join(dirpath, name))
+
+
+def main(argv=None):
+    from soundboard_db import SoundboardDB
+    parser = argparse.ArgumentParser(description="Analyse loudness and true peak of audio files into the soundboard database.")
+    parser.add_argument('paths', nargs='+', help="Audio files or directories to scan")
+    parser.add_argument('--workers', type=int, default=os.cpu_count())
+    parser.add_argument('--force', action='store_true', help="Re-analyse files that are already up to date")
+    args = parser.parse_args(argv)
+
+    db = SoundboardDB()
+    known = db.get_clip_analyses()
+    paths = [p for p in find_audio_files(args.paths)
+             if args.force or p not in known or known[p]['mtime'] != os.path.getmtime(p)]
+    print(f"Analysing {len(paths)} files with {args.workers} workers")
+    start = time.perf_counter()
+    done = 0
+    batch = {}
+    with ProcessPoolExecutor(max_workers=args.workers) as pool:
+        for path, mtime, analysis, error in pool.map(_analyze_path, paths, chunksize=4):
+            if error:
+                print(f"  failed: {path}: {error}", file=sys.stderr)
+                continue
+            analysis['mtime'] = mtime
+            batch[path] = analysis
+            done += 1
+            loudness = 'silent' if analysis['loudness'] is None else f"{analysis['loudness']:.1f} LUFS"
+            print(f"  {loudness:>12}  {path}")
+            if len(batch) >= SAVE_BATCH:
+                db.save_clip_analyses(batch)
+                batch = {}
+    db.save_clip_analyses(batch)
+    db.close()
+    print(f"Analysed {done} files in {time.perf_counter() - start:.1f} s")
+
+
+if __name__ == '__main__':
+    main()
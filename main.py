@@ -1,18 +1,29 @@
+import os
 import sys
-import subprocess
 import logging
-from soundboard_db import SoundboardDB
-import numpy as np
-import soundfile as sf
+import threading
+from soundboard_core import SoundboardCore
+from change_journal import ChangeJournal
+from triggers import TriggerDispatcher
+from metrics import metrics
+from diagnostics_panel import DiagnosticsPanel
+from startup import StartupTimer
+from library import LibraryIndexer
+from library_panel import LibraryPanel
+from monitor_panel import MonitorPanel
+from dsp_panel import DspPanel
+from dsp_params import dsp_or_none
+from play_mode import play_mode_or_none
 from PyQt6.QtWidgets import (
     QApplication, QWidget, QGridLayout, QPushButton, QFileDialog, QInputDialog,
     QMainWindow, QMenuBar, QMenu, QMessageBox, QVBoxLayout, QComboBox
 )
 from PyQt6.QtGui import QAction
 from PyQt6.QtGui import QIcon
-from PyQt6.QtCore import Qt, QTimer
-import sounddevice as sd
-from sounddevice import PortAudioError
+from PyQt6.QtCore import Qt, QTimer, pyqtSignal
+from device_registry import device_registry
+from pipewire_graph import pipewire_graph
+from grid_view import PagedGridView, OccupancyIndex, DEFAULT_PAGE_ROWS
 
 # Set up logging to file
 logging.basicConfig(
@@ -23,6 +34,11 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Hidden buttons kept for reuse when switching between boards of different sizes
+BUTTON_POOL_SIZE = 256
+# Boards with more buttons than this are shown in the virtualized, paged grid
+VIRTUAL_GRID_THRESHOLD = 400
+
 class DeviceComboBox(QComboBox):
     def __init__(self, parent=None, populate_callback=None):
         super().__init__(parent)
@@ -34,80 +50,32 @@ class DeviceComboBox(QComboBox):
         super().showPopup()
 
 
-def ensure_pipewire_virtual_source():
+def ensure_pipewire_virtual_source(native_mix=False):
     logger.debug("Starting PipeWire virtual source setup...")
     try:
-        sinks = subprocess.check_output(["pactl", "list", "short", "sinks"]).decode()
-        logger.debug(f"Sinks: {sinks}")
-        sources = subprocess.check_output(["pactl", "list", "short", "sources"]).decode()
-        logger.debug(f"Sources: {sources}")
-        modules = subprocess.check_output(["pactl", "list", "short", "modules"]).decode()
-        logger.debug(f"Modules: {modules}")
-        # Create null sink for soundboard
-        if "SoundboardSink" not in sinks:
-            logger.debug("Creating SoundboardSink...")
-            subprocess.run([
-                "pactl", "load-module", "module-null-sink",
-                "sink_name=SoundboardSink",
-                "sink_properties=device.description=SoundboardSink"
-            ], check=True)
-        # Get default mic
-        mic_source = subprocess.check_output(["pactl", "get-default-source"]).decode().strip()
-        logger.debug(f"Default mic source: {mic_source}")
-        # Create null sink for mix
-        if "SoundboardMix" not in sinks:
-            logger.debug("Creating SoundboardMix...")
-            subprocess.run([
-                "pactl", "load-module", "module-null-sink",
-                "sink_name=SoundboardMix",
-                "sink_properties=device.description=SoundboardMix"
-            ], check=True)
-        # Loopback soundboard to mix
-        if "module-loopback" not in modules or "SoundboardSink.monitor" not in modules or "SoundboardMix" not in modules:
-            logger.debug("Loopback SoundboardSink.monitor to SoundboardMix...")
-            subprocess.run([
-                "pactl", "load-module", "module-loopback",
-                "source=SoundboardSink.monitor",
-                "sink=SoundboardMix"
-            ], check=True)
-        # Loopback mic to mix
-        if "module-loopback" not in modules or mic_source not in modules or "SoundboardMix" not in modules:
-            logger.debug(f"Loopback {mic_source} to SoundboardMix...")
-            subprocess.run([
-                "pactl", "load-module", "module-loopback",
-                f"source={mic_source}",
-                f"sink=SoundboardMix"
-            ], check=True)
-        # Remap mix monitor as source
-        if "SoundboardMixSource" not in sources:
-            logger.debug("Remapping SoundboardMix.monitor as SoundboardMixSource...")
-            subprocess.run([
-                "pactl", "load-module", "module-remap-source",
-                "master=SoundboardMix.monitor",
-                "source_name=SoundboardMixSource",
-                "source_properties=device.description=SoundboardMixSource"
-            ], check=True)
+        with metrics.span('pipewire_setup'):
+            if native_mix:
+                pipewire_graph.set_native_mix(True)
+            else:
+                pipewire_graph.ensure()
         logger.debug("PipeWire virtual source setup complete.")
     except Exception as e:
         logger.warning(f"Could not set up PipeWire virtual source: {e}")
 
 def cleanup_pipewire_virtual_source():
     try:
-        modules = subprocess.check_output(["pactl", "list", "short", "modules"]).decode()
-        for line in modules.splitlines():
-            if ("module-null-sink" in line and ("SoundboardSink" in line or "SoundboardMix" in line)) or \
-               ("module-remap-source" in line and ("SoundboardSource" in line or "SoundboardMixSource" in line)) or \
-               ("module-loopback" in line):
-                module_id = line.split()[0]
-                subprocess.run(["pactl", "unload-module", module_id], check=True)
+        pipewire_graph.cleanup()
     except Exception as e:
         logger.warning(f"Could not clean up PipeWire virtual source: {e}")
 
 class SoundButton(QPushButton):
-    def __init__(self, label, board, audio_path=None):
+    def __init__(self, label, board, audio_path=None, dsp=None, mode=None):
         super().__init__(label, board.central)
         self.audio_path = audio_path
+        self.dsp = dsp
+        self.mode = mode
         self.board = board
+        self.voice_ids = []
         self.clicked.connect(self.play_sound)
         self.setContextMenuPolicy(Qt.ContextMenuPolicy.CustomContextMenu)
         self.customContextMenuRequested.connect(self.open_menu)
@@ -115,94 +83,61 @@ class SoundButton(QPushButton):
     def to_dict(self):
         return {
             'label': self.text(),
-            'audio_path': self.audio_path
+            'audio_path': self.audio_path,
+            'dsp': self.dsp._asdict() if self.dsp else None,
+            'mode': self.mode._asdict() if self.mode else None
         }
 
     @staticmethod
     def from_dict(data, board, row, col):
-        return SoundButton(data['label'], board, data.get('audio_path'))
+        return SoundButton(data['label'], board, data.get('audio_path'), dsp_or_none(data.get('dsp')),
+                           play_mode_or_none(data.get('mode')))
 
     def play_sound(self):
         if self.audio_path:
-            data, fs = sf.read(self.audio_path, dtype='float32')
-            device_idx = self.board.output_device
-            try:
-                # Log device info before playback
-                try:
-                    device_info = sd.query_devices(device_idx, 'output')
-                    logger.debug(f"Attempting playback on device idx {device_idx}: {device_info['name']} (max output channels: {device_info['max_output_channels']})")
-                except Exception as info_err:
-                    logger.error(f"Error querying device info for idx {device_idx}: {info_err}")
-                    raise
-                device_rate = int(device_info['default_samplerate'])
-                if fs != device_rate:
-                    duration = data.shape[0] / fs
-                    new_length = int(duration * device_rate)
-                    if data.ndim == 1:
-                        data = np.interp(np.linspace(0, len(data), new_length, endpoint=False), np.arange(len(data)), data)
-                    else:
-                        data = np.stack([
-                            np.interp(np.linspace(0, len(data), new_length, endpoint=False), np.arange(len(data)), data[:, ch])
-                            for ch in range(data.shape[1])
-                        ], axis=-1)
-                    fs = device_rate
-                # Ensure data is float32 before playback
-                data = np.asarray(data, dtype=np.float32)
-                with sd.OutputStream(samplerate=fs, device=device_idx, channels=data.shape[1] if data.ndim > 1 else 1) as stream:
-                    stream.write(data)
-            except PortAudioError as e:
-                logger.error(f"Playback error: {e}")
-                QMessageBox.critical(self, "Playback Error", f"Could not play sound.\nError: {e}\nTry converting your audio file to a standard sample rate like 48000 Hz or check your PipeWire device settings.")
-            except Exception as e:
-                logger.error(f"Playback error: {e}")
-                QMessageBox.critical(self, "Playback Error", f"Could not play sound.\nError: {e}")
+            self.board.play_clip(self.audio_path, self, self.dsp, self.mode, self.board.cell_of(self),
+                                 started=lambda voice_id: self.voice_ids.append(voice_id))
         else:
             logger.info("No audio file assigned to this button.")
             QMessageBox.information(self, "No Sound", "No audio file assigned to this button.")
 
+    def stop_sound(self):
+        self.board.cancel_pending_plays(self)
+        if self.board.engine is not None:
+            for voice_id in self.voice_ids:
+                self.board.engine.stop(voice_id)
+        self.voice_ids = []
+
     def open_menu(self, pos):
-        menu = QMenu(self)
-        assign_action = QAction("Assign Sound & Label", self)
-        remove_action = QAction("Remove Button", self)
-        menu.addAction(assign_action)
-        menu.addAction(remove_action)
-        action = menu.exec(self.mapToGlobal(pos))
-        if action == assign_action:
-            file, _ = QFileDialog.getOpenFileName(self, "Select Audio File", "", "Audio Files (*.wav *.mp3 *.ogg)")
-            if file:
-                self.audio_path = file
-                text, ok = QInputDialog.getText(self, "Button Label", "Enter new label:", text=self.text())
-                if ok and text:
-                    self.setText(text)
-        elif action == remove_action:
-            self.board.remove_button(self)
+        self.board.open_cell_menu(self.board.cell_of(self), self.mapToGlobal(pos))
+
+    def set_missing(self, missing):
+        self.setStyleSheet("color: #c0392b;" if missing else "")
+        self.setToolTip(f"File not found: {self.audio_path}" if missing else "")
 
 class SoundBoard(QMainWindow):
+    devices_changed = pyqtSignal(str, object)
+    audio_ready = pyqtSignal()
+    clip_analyzed = pyqtSignal(str, object)
+    trigger_learned = pyqtSignal(str, str)
+    library_changed = pyqtSignal(object, object)
+    missing_checked = pyqtSignal(object)
+
     def check_unsaved_changes(self):
         if not self.current_config_id:
             return False
-        # Get current config from DB
-        db_btns = self.db.get_config_buttons(self.current_config_id)
-        db_layout = {
-            (row, col): (label, audio_path)
-            for (label, audio_path, row, col) in db_btns
-        }
-        # Get current UI config
-        ui_layout = {
-            (row, col): (btn.text(), btn.audio_path)
-            for (btn, row, col) in self.buttons
-        }
-        # Compare
-        if db_layout != ui_layout:
+        if self.journal.is_dirty():
             reply = QMessageBox.question(self, "Save Config?", "Do you want to save your current configuration?", QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No | QMessageBox.StandardButton.Cancel)
             if reply == QMessageBox.StandardButton.Cancel:
                 return
             if reply == QMessageBox.StandardButton.Yes:
                 self.save_config_dialog()
-    def __init__(self):
+    def __init__(self, startup=None):
         logger.debug("Initializing SoundBoard app...")
         super().__init__()
-        ensure_pipewire_virtual_source()  # Ensure virtual sink/source is set up before device dropdown
+        # PipeWire and PortAudio setup run after the first paint, see start_audio
+        self.startup = startup or StartupTimer()
+        self.audio_ready_event = threading.Event()
         logger.debug("Creating main window and layout...")
         self.setWindowTitle("pySoundBoard")
         self.setWindowIcon(QIcon("pySoundBoard.png"))
@@ -210,7 +145,17 @@ class SoundBoard(QMainWindow):
         self.setCentralWidget(self.central)
         self.main_layout = QVBoxLayout()
         self.central.setLayout(self.main_layout)
-        self.db = SoundboardDB()
+        self.core = SoundboardCore()
+        self.db = self.core.db
+        # Settings are cached in memory by the DB; write them out periodically
+        self.settings_flush_timer = QTimer(self)
+        self.settings_flush_timer.timeout.connect(self.db.flush)
+        self.settings_flush_timer.start(5000)
+        metrics.register('startup', self.startup.stats)
+        self.use_sample_store = self.db.get_setting('sample_store') == '1'
+        # Created with the rest of the audio stack, see on_audio_ready
+        self.analyzer = None
+        self.clip_analyzed.connect(self.on_clip_analyzed)
         logger.debug("Creating output device dropdown...")
         self.output_device_dropdown = self.create_device_dropdown(device_type='output')
         self.output_device_dropdown.setToolTip("Only change this if you know what you are doing")
@@ -219,9 +164,48 @@ class SoundBoard(QMainWindow):
         self.layout = QGridLayout()
         self.main_layout.addLayout(self.layout)
         self.buttons = []
-        logger.debug("Querying available devices:")
-        for idx, dev in enumerate(sd.query_devices()):
-            logger.debug(f"  [{idx}] {dev['name']} (max output channels: {dev['max_output_channels']}, max input channels: {dev['max_input_channels']})")
+        self.button_pool = []
+        # Large boards are painted by a model/view grid instead of one widget per button
+        self.virtual_grid_threshold = int(self.db.get_setting('virtual_grid_threshold') or VIRTUAL_GRID_THRESHOLD)
+        self.grid_page_rows = int(self.db.get_setting('grid_page_rows') or DEFAULT_PAGE_ROWS)
+        self.virtual_grid = False
+        self.grid_view = PagedGridView(self.central)
+        self.grid_view.hide()
+        self.grid_view.cell_clicked.connect(lambda row, col: self.play_cell((row, col)))
+        self.grid_view.cell_menu_requested.connect(lambda row, col, pos: self.open_cell_menu((row, col), pos))
+        self.grid_view.page_changed.connect(lambda page: self.preload_clips())
+        self.main_layout.addWidget(self.grid_view)
+        self.cell_voices = {}
+        # Presses made before the output device is chosen, played from on_audio_ready
+        self.pending_plays = []
+        self.occupancy = OccupancyIndex(3)
+        # Hotkeys and MIDI notes play clips from their own threads, straight on the engine
+        self.trigger_bindings = {}
+        self.learning_cell = None
+        self.learn_box = None
+        self.triggers = TriggerDispatcher(lambda: self.engine)
+        self.trigger_learned.connect(self.on_trigger_learned)
+        self.journal = ChangeJournal()
+        self.diagnostics_panel = None
+        # The indexer scans library folders and checks board files on its own thread
+        self.library = LibraryIndexer(self.db.path, self.library_changed.emit)
+        self.library_panel = None
+        self.missing_paths = set()
+        self.report_missing = False
+        self.library_changed.connect(self.on_library_changed)
+        self.missing_checked.connect(self.on_missing_checked)
+        # Hot-plug events arrive on the watcher thread; the signal queues them
+        # onto the GUI thread and the timer coalesces bursts into one rescan.
+        self.device_refresh_timer = QTimer(self)
+        self.device_refresh_timer.setSingleShot(True)
+        self.device_refresh_timer.setInterval(500)
+        self.device_refresh_timer.timeout.connect(self.refresh_devices)
+        # A rescan cuts every sound, so one for a device nothing uses waits until the board is quiet
+        self.idle_rescan_timer = QTimer(self)
+        self.idle_rescan_timer.setInterval(1000)
+        self.idle_rescan_timer.timeout.connect(self.rescan_when_idle)
+        self.devices_changed.connect(self.on_devices_changed)
+        self.audio_ready.connect(self.on_audio_ready)
         self.rows = 3
         self.cols = 3
         self.current_config_id = None
@@ -230,45 +214,440 @@ class SoundBoard(QMainWindow):
         self.init_menu()
         logger.debug("Loading last used config...")
         self.load_last_used_config()
+        self.startup.mark('window')
         logger.debug("SoundBoard app initialization complete.")
 
+    def start_audio(self):
+        """Set up PipeWire and the audio devices in the background; on_audio_ready finishes on the GUI thread."""
+        threading.Thread(target=self._prepare_audio, name='audio-setup', daemon=True).start()
+
+    def _prepare_audio(self):
+        ensure_pipewire_virtual_source(self.native_mix)
+        try:
+            # Loads numpy and soundfile, which the window itself does not need
+            self.core.setup_audio()
+            device_registry.refresh()
+            # Default to the soundboard's virtual sink so the mic mix picks it up
+            self.core.select_default_output()
+        except Exception as e:
+            logger.error(f"Could not set up audio: {e}")
+        self.audio_ready_event.set()
+        self.audio_ready.emit()
+
+    def on_audio_ready(self):
+        self.startup.mark('audio_setup')
+        logger.debug("Available devices:")
+        for dev in device_registry.devices:
+            logger.debug(f"  [{dev['index']}] {dev['name']} (max output channels: {dev['max_output_channels']}, max input channels: {dev['max_input_channels']})")
+        self.populate_device_dropdown(self.output_device_dropdown)
+        device_registry.add_listener(self.devices_changed.emit)
+        device_registry.watch_hotplug()
+        self.preload_clips()
+        from loudness import LoudnessAnalyzer
+        self.analyzer = LoudnessAnalyzer(self.clip_analyzed.emit, self.core.analyses)
+        self.analyze_board()
+        self.start_native_mix()
+        if self.db.get_setting('triggers') == '1':
+            self.start_triggers()
+        self.library.start(self.db.get_library_folders())
+        pending, self.pending_plays = self.pending_plays, []
+        for args in pending:
+            self.play_clip(*args)
+        self.startup.mark('interactive')
+
+    @property
+    def engine(self):
+        return self.core.engine
+
+    @property
+    def output_device(self):
+        return self.core.output_device
+
+    @output_device.setter
+    def output_device(self, device):
+        self.core.output_device = device
+
+    @property
+    def native_mix(self):
+        return self.core.native_mix
+
+    @property
+    def normalize_loudness(self):
+        return self.core.normalize_loudness
+
     def create_device_dropdown(self, device_type='output'):
-        device_box = DeviceComboBox(populate_callback=self.populate_device_dropdown)
-        self.populate_device_dropdown(device_box)
-        # Default to SoundboardSink if available
-        sink_index = None
-        for i in range(device_box.count()):
-            if 'SoundboardSink' in device_box.itemText(i):
-                sink_index = i
-                break
-        if sink_index is not None:
-            device_box.setCurrentIndex(sink_index)
-            self.output_device = self.output_device_indices[sink_index]
-            logger.debug(f"Defaulting output device to SoundboardSink (idx {self.output_device})")
+        # Filled in once the devices have been enumerated, see on_audio_ready
+        device_box = DeviceComboBox(populate_callback=self.on_device_dropdown_opened)
+        self.output_device_names = []
+        self.output_device_indices = []
         device_box.currentIndexChanged.connect(self.on_output_device_selected)
         return device_box
 
     def populate_device_dropdown(self, device_box):
-        import sys
-        import re
+        # Rebuilding the items must not look like a user selection
+        device_box.blockSignals(True)
         device_box.clear()
         names = []
         indices = []
-        for idx, dev in enumerate(sd.query_devices()):
-            if dev['max_output_channels'] > 0:
-                label = f"{dev['name']} (idx {idx})"
-                device_box.addItem(label)
-                names.append(dev['name'])
-                indices.append(idx)
-                logger.debug(f"Device {idx}: {dev['name']} (max output channels: {dev['max_output_channels']})")
+        for dev in device_registry.output_devices():
+            device_box.addItem(f"{dev['name']} (idx {dev['index']})")
+            names.append(dev['name'])
+            indices.append(dev['index'])
         self.output_device_names = names
         self.output_device_indices = indices
+        if self.output_device in indices:
+            device_box.setCurrentIndex(indices.index(self.output_device))
+        device_box.blockSignals(False)
+
+    def on_device_dropdown_opened(self, device_box):
+        # Devices plugged in since the last rescan only show up after one
+        if device_registry.stale and self.audio_ready_event.is_set():
+            self.refresh_devices()
+        else:
+            self.populate_device_dropdown(device_box)
+
+    def on_devices_changed(self, event, name):
+        if event == 'remove' and self.device_in_use(name):
+            logger.debug(f"Device in use removed: {name}")
+            self.device_refresh_timer.start()
+        elif not self.idle_rescan_timer.isActive():
+            self.idle_rescan_timer.start()
+
+    def device_in_use(self, name):
+        if not name:
+            # Nothing to tell which device went, so assume the worst
+            return True
+        name = name.lower()
+        return any(name in used.lower() or used.lower() in name for used in self.core.device_names())
+
+    def rescan_when_idle(self):
+        if self.core.is_idle():
+            self.refresh_devices()
+
+    def refresh_devices(self):
+        logger.debug("Rescanning audio devices...")
+        self.device_refresh_timer.stop()
+        self.idle_rescan_timer.stop()
+        current_name = None
+        if self.output_device is not None and self.output_device in self.output_device_indices:
+            current_name = self.output_device_names[self.output_device_indices.index(self.output_device)]
+        # A rescan re-initialises PortAudio, which invalidates any open stream
+        self.close_engine()
+        device_registry.refresh(rescan=True)
+        dev = device_registry.find(current_name) if current_name else None
+        self.output_device = dev['index'] if dev else None
+        self.populate_device_dropdown(self.output_device_dropdown)
+        self.preload_clips()
+        # Closing the engine also stopped the mic mix
+        self.start_native_mix()
 
     def on_output_device_selected(self, idx):
         if 0 <= idx < len(self.output_device_indices):
             self.output_device = self.output_device_indices[idx]
             logger.debug(f"User selected output device: {self.output_device_names[idx]} (idx {self.output_device})")
-            self.db.set_setting('audio_device', self.output_device)
+            self.core.set_output_device(self.output_device)
+            self.preload_clips()
+
+    def get_engine(self):
+        return self.core.get_engine()
+
+    def close_engine(self):
+        self.core.close_engine()
+
+    def toggle_native_mix(self, enabled):
+        try:
+            self.core.set_native_mix(enabled)
+        except Exception as e:
+            logger.warning(f"Could not switch PipeWire topology: {e}")
+        self.start_native_mix()
+        self.preload_clips()
+
+    def start_native_mix(self):
+        # The mic has to flow even when no sound is playing, so start right away
+        if not self.native_mix:
+            return
+        try:
+            self.get_engine()
+        except Exception as e:
+            logger.error(f"Could not start native mic mixing: {e}")
+            QMessageBox.critical(self, "Native Mixing Error", f"Could not open the microphone mix stream.\nError: {e}")
+
+    def show_engine_stats(self):
+        if self.engine is None:
+            QMessageBox.information(self, "Audio Engine", "The audio engine is not running.")
+            return
+        sections = [self.engine.stats()] + [monitor.stats() for monitor in self.engine.monitors if monitor.stream is not None]
+        text = "\n\n".join("\n".join(f"{key}: {value:.3f}" if isinstance(value, float) else f"{key}: {value}"
+                                      for key, value in stats.items()) for stats in sections)
+        QMessageBox.information(self, "Audio Engine", text)
+
+    def show_diagnostics(self):
+        if self.diagnostics_panel is None:
+            self.diagnostics_panel = DiagnosticsPanel(self.core, self)
+        self.diagnostics_panel.show()
+        self.diagnostics_panel.raise_()
+
+    def show_monitor_outputs(self):
+        MonitorPanel(self.core, self).exec()
+        # Monitors with another sample rate or channel count need their own cached copies
+        self.preload_clips()
+
+    def show_library(self):
+        if self.library_panel is None:
+            self.library_panel = LibraryPanel(self.db, self.library, self)
+        self.library_panel.show()
+        self.library_panel.raise_()
+
+    def on_library_changed(self, changed, removed):
+        if self.library_panel is not None and self.library_panel.isVisible():
+            self.library_panel.refresh()
+        board_paths = {state[1] for state in self.board_cells().values()}
+        if board_paths.intersection(changed) or board_paths.intersection(removed):
+            self.check_missing_files()
+
+    def check_missing_files(self):
+        self.library.check_missing({state[1] for state in self.board_cells().values()}, self.missing_checked.emit)
+
+    def on_missing_checked(self, missing):
+        # A check started before the board changed may finish after a newer one
+        missing = missing.intersection(state[1] for state in self.board_cells().values())
+        self.missing_paths = missing
+        for (btn, row, col) in self.buttons:
+            btn.set_missing(btn.audio_path in missing)
+        self.grid_view.model.set_missing(missing)
+        if missing:
+            logger.warning(f"{len(missing)} sound files on this board are missing: {sorted(missing)}")
+            self.statusBar().showMessage(f"{len(missing)} sound files on this board are missing (shown in red)")
+        else:
+            self.statusBar().clearMessage()
+        if self.report_missing:
+            self.report_missing = False
+            self.show_missing_files()
+
+    def check_missing_files_dialog(self):
+        self.report_missing = True
+        self.check_missing_files()
+
+    def show_missing_files(self):
+        if not self.missing_paths:
+            QMessageBox.information(self, "Missing Files", "Every sound file on this board was found.")
+            return
+        QMessageBox.warning(self, "Missing Files", f"{len(self.missing_paths)} sound files on this board are missing:\n"
+                            + "\n".join(sorted(self.missing_paths)))
+
+    def cancel_pending_plays(self, parent):
+        """Forget presses on parent that are still waiting for the audio setup."""
+        self.pending_plays = [args for args in self.pending_plays if args[1] is not parent]
+
+    def play_clip(self, audio_path, parent=None, dsp=None, mode=None, key=None, started=None):
+        """Start audio_path on the engine and pass its voice id to started; returns the voice id, or None.
+
+        Presses made while the audio setup is still running are queued and
+        played once it is done, instead of blocking the window.
+        """
+        if not self.audio_ready_event.is_set():
+            self.pending_plays.append((audio_path, parent, dsp, mode, key, started))
+            return None
+        parent = parent or self
+        from sounddevice import PortAudioError
+        try:
+            voice_id = self.core.play(audio_path, dsp=dsp, mode=mode, key=key)
+        except PortAudioError as e:
+            logger.error(f"Playback error: {e}")
+            QMessageBox.critical(parent, "Playback Error", f"Could not play sound.\nError: {e}\nTry converting your audio file to a standard sample rate like 48000 Hz or check your PipeWire device settings.")
+            return None
+        except Exception as e:
+            logger.error(f"Playback error: {e}")
+            QMessageBox.critical(parent, "Playback Error", f"Could not play sound.\nError: {e}")
+            return None
+        if started is not None:
+            started(voice_id)
+        return voice_id
+
+    def play_cell(self, cell):
+        state = self.cell_state(cell)
+        if state is None:
+            return
+        if not state[1]:
+            QMessageBox.information(self, "No Sound", "No audio file assigned to this button.")
+            return
+        self.play_clip(state[1], dsp=state[2], mode=state[3], key=cell,
+                       started=lambda voice_id: self.cell_voices.setdefault(cell, []).append(voice_id))
+
+    def stop_cell(self, cell):
+        btn = self.button_at(cell)
+        if btn is not None:
+            btn.stop_sound()
+            return
+        voice_ids = self.cell_voices.pop(cell, [])
+        if self.engine is not None:
+            for voice_id in voice_ids:
+                self.engine.stop(voice_id)
+
+    def open_cell_menu(self, cell, global_pos):
+        state = self.cell_state(cell)
+        if state is None:
+            return
+        menu = QMenu(self)
+        assign_action = QAction("Assign Sound & Label", self)
+        library_action = QAction("Assign from Library...", self)
+        edit_action = QAction("Edit Sound...", self)
+        edit_action.setEnabled(bool(state[1]))
+        stop_action = QAction("Stop", self)
+        remove_action = QAction("Remove Button", self)
+        bind_action = QAction("Bind Hotkey / MIDI Note...", self)
+        unbind_action = QAction("Clear Hotkeys / MIDI Notes", self)
+        unbind_action.setEnabled(cell in self.trigger_bindings.values())
+        menu.addAction(stop_action)
+        menu.addAction(assign_action)
+        menu.addAction(library_action)
+        menu.addAction(edit_action)
+        menu.addAction(remove_action)
+        menu.addSeparator()
+        menu.addAction(bind_action)
+        menu.addAction(unbind_action)
+        action = menu.exec(global_pos)
+        if action == assign_action:
+            file, _ = QFileDialog.getOpenFileName(self, "Select Audio File", "", "Audio Files (*.wav *.mp3 *.ogg)")
+            if file:
+                self.assign_sound(cell, state, file)
+        elif action == library_action:
+            picker = LibraryPanel(self.db, self.library, self, pick=True)
+            if picker.exec() and picker.selected_path():
+                self.assign_sound(cell, state, picker.selected_path())
+        elif action == edit_action:
+            self.edit_sound(cell, state)
+        elif action == stop_action:
+            self.stop_cell(cell)
+        elif action == remove_action:
+            self.remove_cell(cell)
+        elif action == bind_action:
+            self.learn_trigger(cell)
+        elif action == unbind_action:
+            self.db.delete_triggers(self.current_config_id, *cell)
+            self.load_triggers()
+
+    def assign_sound(self, cell, state, file):
+        from audio_cache import audio_cache
+        file = self.store_clip(file)
+        audio_cache.invalidate(state[1])
+        label = state[0]
+        text, ok = QInputDialog.getText(self, "Button Label", "Enter new label:", text=label)
+        if ok and text:
+            label = text
+        self.set_cell(cell, (label, file) + state[2:])
+        self.journal.record(cell, state, (label, file) + state[2:])
+        if file in self.missing_paths:
+            self.check_missing_files()
+
+    def edit_sound(self, cell, state):
+        panel = DspPanel(state[1], state[2], state[3], lambda dsp: self.play_clip(state[1], self, dsp), self)
+        if panel.exec():
+            new = (state[0], state[1], panel.params(), panel.mode())
+            if new != state:
+                self.set_cell(cell, new)
+                self.journal.record(cell, state, new)
+
+    def on_clip_analyzed(self, path, analysis):
+        self.core.record_analysis(path, analysis)
+
+    def toggle_normalize_loudness(self, enabled):
+        self.core.set_normalize_loudness(enabled)
+        self.preload_clips()
+
+    def store_clip(self, path):
+        """Path to assign to a button: the sample store copy when the store is enabled."""
+        if not self.use_sample_store:
+            return path
+        from sample_store import sample_store
+        try:
+            return sample_store.add(path)
+        except OSError as e:
+            logger.error(f"Could not add {path} to the sample store: {e}")
+            QMessageBox.warning(self, "Sample Store", f"Could not copy the file into the sample store, using it in place.\nError: {e}")
+            return path
+
+    def toggle_sample_store(self, enabled):
+        self.use_sample_store = enabled
+        self.db.set_setting('sample_store', '1' if enabled else '0')
+
+    def copy_board_to_store(self):
+        from sample_store import sample_store
+        copied = 0
+        for cell, (label, path, dsp, mode) in list(self.board_cells().items()):
+            if not path or sample_store.is_managed(path) or not os.path.exists(path):
+                continue
+            try:
+                stored = sample_store.add(path)
+            except OSError as e:
+                logger.error(f"Could not add {path} to the sample store: {e}")
+                continue
+            self.set_cell(cell, (label, stored, dsp, mode))
+            self.journal.record(cell, (label, path, dsp, mode), (label, stored, dsp, mode))
+            copied += 1
+        QMessageBox.information(self, "Sample Store", f"Copied {copied} clips into the sample store.")
+
+    def start_triggers(self):
+        # The engine must exist for triggers that arrive before the first click
+        self.preload_clips()
+        started = self.triggers.start(
+            keyboard=self.db.get_setting('trigger_keyboard') != '0',
+            midi=self.db.get_setting('trigger_midi') != '0',
+            midi_port=self.db.get_setting('midi_port')
+        )
+        if not started:
+            QMessageBox.warning(self, "Global Triggers", "No hotkey or MIDI input could be opened.\n"
+                                "Install python-evdev (and join the 'input' group) or python-rtmidi.")
+        return started
+
+    def toggle_triggers(self, enabled):
+        self.db.set_setting('triggers', '1' if enabled else '0')
+        if enabled:
+            self.start_triggers()
+        else:
+            self.triggers.stop()
+
+    def load_triggers(self):
+        rows = self.db.get_triggers(self.current_config_id) if self.current_config_id else []
+        self.trigger_bindings = {(kind, code): (row, col) for (kind, code, row, col) in rows}
+        self.update_trigger_map()
+
+    def update_trigger_map(self):
+        cells = self.board_cells()
+        self.triggers.set_bindings({
+            key: (cells[cell][1], cells[cell][2], cells[cell][3], cell)
+            for key, cell in self.trigger_bindings.items() if cell in cells and cells[cell][1]
+        })
+
+    def learn_trigger(self, cell):
+        if not self.current_config_id:
+            QMessageBox.information(self, "Bind Trigger", "Save this configuration before binding hotkeys.")
+            return
+        if not self.triggers.sources:
+            QMessageBox.information(self, "Bind Trigger", "Enable Menu → Global Triggers first.")
+            return
+        self.learning_cell = cell
+        self.triggers.learn(self.trigger_learned.emit)
+        self.learn_box = QMessageBox(QMessageBox.Icon.Information, "Bind Trigger",
+                                     "Press a key or play a MIDI note...", QMessageBox.StandardButton.Cancel, self)
+        self.learn_box.rejected.connect(lambda: self.triggers.learn(None))
+        self.learn_box.open()
+
+    def on_trigger_learned(self, kind, code):
+        if self.learn_box is not None:
+            self.learn_box.done(0)
+            self.learn_box = None
+        if self.learning_cell is None or not self.current_config_id:
+            return
+        row, col = self.learning_cell
+        self.learning_cell = None
+        self.db.set_trigger(self.current_config_id, kind, code, row, col)
+        self.load_triggers()
+        logger.info(f"Bound {kind} {code} to cell {row},{col}")
+
+    def stop_all_sounds(self):
+        if self.engine is not None:
+            self.engine.stop_all()
 
     def init_menu(self):
         menubar = self.menuBar()
@@ -291,10 +670,69 @@ class SoundBoard(QMainWindow):
         export_action.triggered.connect(self.export_config_json)
         import_action = QAction("Import Config from JSON", self)
         import_action.triggered.connect(self.import_config_json)
+        undo_action = QAction("Undo", self)
+        undo_action.setShortcut("Ctrl+Z")
+        undo_action.triggered.connect(self.undo)
+        redo_action = QAction("Redo", self)
+        redo_action.setShortcut("Ctrl+Shift+Z")
+        redo_action.triggered.connect(self.redo)
+        refresh_devices_action = QAction("Refresh Devices", self)
+        refresh_devices_action.triggered.connect(self.refresh_devices)
+        native_mix_action = QAction("Native Mic Mixing", self)
+        native_mix_action.setCheckable(True)
+        native_mix_action.setChecked(self.native_mix)
+        native_mix_action.setToolTip("Mix the microphone in pySoundBoard instead of PipeWire loopbacks")
+        native_mix_action.toggled.connect(self.toggle_native_mix)
+        normalize_action = QAction("Normalize Loudness", self)
+        normalize_action.setCheckable(True)
+        normalize_action.setChecked(self.normalize_loudness)
+        normalize_action.setToolTip("Play every clip at the same loudness (loudness_target setting, in LUFS)")
+        normalize_action.toggled.connect(self.toggle_normalize_loudness)
+        sample_store_action = QAction("Managed Sample Store", self)
+        sample_store_action.setCheckable(True)
+        sample_store_action.setChecked(self.use_sample_store)
+        sample_store_action.setToolTip("Copy newly assigned sounds into the sample store so boards keep working when files move")
+        sample_store_action.toggled.connect(self.toggle_sample_store)
+        copy_to_store_action = QAction("Copy Board into Sample Store", self)
+        copy_to_store_action.triggered.connect(self.copy_board_to_store)
+        triggers_action = QAction("Global Triggers", self)
+        triggers_action.setCheckable(True)
+        triggers_action.setChecked(self.db.get_setting('triggers') == '1')
+        triggers_action.setToolTip("Play buttons from global hotkeys and MIDI notes")
+        triggers_action.toggled.connect(self.toggle_triggers)
+        monitor_action = QAction("Monitor Outputs...", self)
+        monitor_action.setToolTip("Also play sounds on other devices, such as headphones, without PipeWire loopbacks")
+        monitor_action.triggered.connect(self.show_monitor_outputs)
+        engine_stats_action = QAction("Audio Engine Stats", self)
+        engine_stats_action.triggered.connect(self.show_engine_stats)
+        diagnostics_action = QAction("Diagnostics", self)
+        diagnostics_action.triggered.connect(self.show_diagnostics)
+        library_menu_action = QAction("Sound Library...", self)
+        library_menu_action.triggered.connect(self.show_library)
+        missing_action = QAction("Check Missing Files", self)
+        missing_action.setToolTip("List the sound files on this board that no longer exist")
+        missing_action.triggered.connect(self.check_missing_files_dialog)
+        stop_all_action = QAction("Stop All Sounds", self)
+        stop_all_action.setShortcut("Esc")
+        stop_all_action.triggered.connect(self.stop_all_sounds)
+        board_menu.addAction(undo_action)
+        board_menu.addAction(redo_action)
         board_menu.addAction(save_action)
         board_menu.addAction(load_action)
         board_menu.addAction(export_action)
         board_menu.addAction(import_action)
+        board_menu.addAction(library_menu_action)
+        board_menu.addAction(missing_action)
+        board_menu.addAction(refresh_devices_action)
+        board_menu.addAction(native_mix_action)
+        board_menu.addAction(monitor_action)
+        board_menu.addAction(normalize_action)
+        board_menu.addAction(sample_store_action)
+        board_menu.addAction(copy_to_store_action)
+        board_menu.addAction(triggers_action)
+        board_menu.addAction(engine_stats_action)
+        board_menu.addAction(diagnostics_action)
+        board_menu.addAction(stop_all_action)
 
 
     def new_config_dialog(self):
@@ -311,13 +749,16 @@ class SoundBoard(QMainWindow):
         if not self.current_config_id:
             QMessageBox.information(self, "No Config", "No configuration loaded.")
             return
+        from sample_store import sample_store
         btns = self.db.get_config_buttons(self.current_config_id)
         layout_data = {
             'rows': self.rows,
             'cols': self.cols,
             'buttons': [
-                {'row': row, 'col': col, 'label': label, 'audio_path': audio_path}
-                for (label, audio_path, row, col) in btns
+                {'row': row, 'col': col, 'label': label, 'audio_path': audio_path,
+                 'sample_hash': sample_store.hash_of(audio_path), 'dsp': dsp._asdict() if dsp else None,
+                 'mode': mode._asdict() if mode else None}
+                for (label, audio_path, row, col, dsp, mode) in btns
             ]
         }
         path, _ = QFileDialog.getSaveFileName(self, "Export Config", "soundboard.json", "JSON Files (*.json)")
@@ -334,69 +775,214 @@ class SoundBoard(QMainWindow):
         with open(path, 'r') as f:
             layout_data = json.load(f)
         btns = layout_data.get('buttons', [])
+        from sample_store import sample_store
+        for b in btns:
+            # Clips from another machine can still be found in the store by content
+            if b.get('sample_hash') and not (b.get('audio_path') and os.path.exists(b['audio_path'])):
+                b['audio_path'] = sample_store.path_for(b['sample_hash']) or b.get('audio_path')
         self.rows = layout_data.get('rows', 3)
         self.cols = layout_data.get('cols', 3)
         # Ask for config name
         text, ok = QInputDialog.getText(self, "Import Config", "Enter name for imported configuration:")
         if ok and text:
             btn_dicts = [
-                {'label': b['label'], 'audio_path': b.get('audio_path'), 'row': b['row'], 'col': b['col']}
+                {'label': b['label'], 'audio_path': b.get('audio_path'), 'row': b['row'], 'col': b['col'],
+                 'dsp': dsp_or_none(b.get('dsp')), 'mode': play_mode_or_none(b.get('mode'))}
                 for b in btns
             ]
             config_id = self.db.save_config(text, btn_dicts, self.rows, self.cols)
             self.db.set_last_used_config(config_id)
             self.current_config_id = config_id
             self.current_config_name = text
-            self.init_ui([(b['label'], b.get('audio_path'), b['row'], b['col']) for b in btns])
+            self.init_ui([(b['label'], b['audio_path'], b['row'], b['col'], b['dsp'], b['mode']) for b in btn_dicts])
 
     def init_ui(self, buttons=None):
-        # Remove existing buttons
-        for (btn, _, _) in self.buttons:
-            self.layout.removeWidget(btn)
-            btn.deleteLater()
-        self.buttons.clear()
-        # Add buttons from config or default
         if buttons:
-            for btn_data in buttons:
-                btn = SoundButton(btn_data[0], self, btn_data[1])
-                self.layout.addWidget(btn, btn_data[2], btn_data[3])
-                self.buttons.append((btn, btn_data[2], btn_data[3]))
+            target = {(row, col): (label, audio_path, dsp, mode) for (label, audio_path, row, col, dsp, mode) in buttons}
+        else:
+            target = {
+                (i, j): (f"Button {i*self.cols+j+1}", None, None, None)
+                for i in range(self.rows) for j in range(self.cols)
+            }
+        self.occupancy = OccupancyIndex(self.cols, target)
+        self.cell_voices = {}
+        virtual = len(target) > self.virtual_grid_threshold
+        # Reuse the widgets already in place and only touch cells that differ;
+        # painting is suspended so the whole rebuild costs one layout pass.
+        self.setUpdatesEnabled(False)
+        try:
+            current = {(row, col): btn for (btn, row, col) in self.buttons}
+            for cell, btn in current.items():
+                if virtual or cell not in target:
+                    self.release_button(btn)
+            self.buttons = []
+            if virtual:
+                rows = max(self.rows, max(row for (row, col) in target) + 1)
+                self.grid_view.load(target, rows, self.cols, self.grid_page_rows)
+                self.grid_view.show()
+            else:
+                self.grid_view.hide()
+                self.grid_view.load({}, 0, 0)
+                for (row, col), (label, audio_path, dsp, mode) in target.items():
+                    btn = current.get((row, col))
+                    if btn is None:
+                        btn = self.acquire_button(label, audio_path, dsp, mode)
+                        self.layout.addWidget(btn, row, col)
+                    else:
+                        if btn.text() != label:
+                            btn.setText(label)
+                        if btn.audio_path != audio_path:
+                            btn.audio_path = audio_path
+                        btn.dsp = dsp
+                        btn.mode = mode
+                    self.buttons.append((btn, row, col))
+            self.virtual_grid = virtual
+            # Default buttons on a loaded config are not in the database yet
+            self.journal.reset(saved=bool(buttons) or not self.current_config_id)
+            self.layout.activate()
+            self.adjustSize()
+        finally:
+            self.setUpdatesEnabled(True)
+        self.load_triggers()
+        self.analyze_board()
+        self.preload_clips()
+        self.check_missing_files()
+
+    def acquire_button(self, label, audio_path, dsp=None, mode=None):
+        if self.button_pool:
+            btn = self.button_pool.pop()
+            btn.setText(label)
+            btn.audio_path = audio_path
+            btn.dsp = dsp
+            btn.mode = mode
+            btn.voice_ids = []
+            btn.set_missing(audio_path in self.missing_paths)
+            btn.show()
+            return btn
+        return SoundButton(label, self, audio_path, dsp, mode)
+
+    def release_button(self, btn):
+        self.cancel_pending_plays(btn)
+        self.layout.removeWidget(btn)
+        if len(self.button_pool) < BUTTON_POOL_SIZE:
+            btn.hide()
+            self.button_pool.append(btn)
         else:
-            for i in range(self.rows):
-                for j in range(self.cols):
-                    self.add_button(i, j)
-        self.layout.invalidate()  # Invalidate layout to force recalculation
-        self.layout.activate()    # Recalculate layout
-        self.updateGeometry()     # Update widget geometry
-        self.adjustSize()         # Adjust window size to fit new layout
-
-    def add_button(self, row, col, label=None, audio_path=None):
+            btn.deleteLater()
+
+    def analyze_clips(self, paths):
+        # Clips added before the analyzer exists are picked up by analyze_board
+        if self.analyzer is not None:
+            self.analyzer.analyze(paths)
+
+    def analyze_board(self):
+        if self.analyzer is None:
+            return
+        self.analyzer.cancel()
+        self.analyzer.analyze(state[1] for state in self.board_cells().values())
+
+    def preload_clips(self):
+        if not self.audio_ready_event.is_set():
+            # The engine's format is unknown until the output device is chosen
+            return
+        # The virtual grid only warms the page on screen
+        self.core.preload(self.grid_view.model.page_cells() if self.virtual_grid else self.board_cells())
+
+    def add_button(self, row, col, label=None, audio_path=None, dsp=None, mode=None):
         label = label or f"Button {row*self.cols+col+1}"
-        btn = SoundButton(label, self, audio_path)
-        self.layout.addWidget(btn, row, col)
-        self.buttons.append((btn, row, col))
+        if self.virtual_grid:
+            self.grid_view.set_cell((row, col), (label, audio_path, dsp, mode))
+        else:
+            btn = self.acquire_button(label, audio_path, dsp, mode)
+            self.layout.addWidget(btn, row, col)
+            self.buttons.append((btn, row, col))
+        self.occupancy.add((row, col))
+        self.analyze_clips([audio_path])
+        self.update_trigger_map()
 
     def add_button_dialog(self):
-        positions = [(i, j) for i in range(self.rows) for j in range(self.cols)]
-        used = {(self.layout.getItemPosition(i)[0], self.layout.getItemPosition(i)[1]) for i in range(self.layout.count())}
-        free = [pos for pos in positions if pos not in used]
-        if not free:
+        cell = self.occupancy.first_free(self.rows)
+        if cell is None:
             self.rows += 1
-            row, col = self.rows-1, 0
-        else:
-            row, col = free[0]
+            cell = (self.rows-1, 0)
+        row, col = cell
         text, ok = QInputDialog.getText(self, "Button Label", "Enter label for new button:")
         if ok and text:
             file, _ = QFileDialog.getOpenFileName(self, "Select Audio File", "", "Audio Files (*.wav *.mp3 *.ogg)")
             if file:
+                file = self.store_clip(file)
                 self.add_button(row, col, text, file)
+                self.journal.record((row, col), None, (text, file, None, None))
 
-    def remove_button(self, btn):
-        idx = self.layout.indexOf(btn)
-        if idx != -1:
-            self.layout.removeWidget(btn)
-            btn.deleteLater()
-            self.buttons = [(b, r, c) for (b, r, c) in self.buttons if b != btn]
+    def remove_cell(self, cell):
+        state = self.cell_state(cell)
+        if state is not None:
+            self.journal.record(cell, state, None)
+            self.set_cell(cell, None)
+
+    def board_cells(self):
+        """Map of (row, col) -> (label, audio_path, dsp, mode) for every button on the board."""
+        if self.virtual_grid:
+            return self.grid_view.model.cells
+        return {(row, col): (btn.text(), btn.audio_path, btn.dsp, btn.mode) for (btn, row, col) in self.buttons}
+
+    def cell_state(self, cell):
+        if self.virtual_grid:
+            return self.grid_view.model.cells.get(cell)
+        btn = self.button_at(cell)
+        return (btn.text(), btn.audio_path, btn.dsp, btn.mode) if btn is not None else None
+
+    def button_at(self, cell):
+        return next((b for (b, r, c) in self.buttons if (r, c) == cell), None)
+
+    def cell_of(self, btn):
+        for (b, row, col) in self.buttons:
+            if b is btn:
+                return (row, col)
+        return None
+
+    def set_cell(self, cell, state):
+        """Put a cell back into a recorded state, used by undo/redo."""
+        old = self.cell_state(cell)
+        if state is None:
+            if old is not None:
+                from audio_cache import audio_cache
+                audio_cache.invalidate(old[1])
+            self.occupancy.discard(cell)
+            self.cell_voices.pop(cell, None)
+        else:
+            self.occupancy.add(cell)
+            self.analyze_clips([state[1]])
+        if self.virtual_grid:
+            self.grid_view.set_cell(cell, state)
+        else:
+            self._set_button(cell, state)
+        self.update_trigger_map()
+
+    def _set_button(self, cell, state):
+        row, col = cell
+        btn = self.button_at(cell)
+        if state is None:
+            if btn is not None:
+                self.release_button(btn)
+                self.buttons = [(b, r, c) for (b, r, c) in self.buttons if b is not btn]
+        elif btn is None:
+            self.add_button(row, col, *state)
+        else:
+            btn.setText(state[0])
+            btn.audio_path = state[1]
+            btn.dsp = state[2]
+            btn.mode = state[3]
+
+    def undo(self):
+        step = self.journal.undo()
+        if step:
+            self.set_cell(*step)
+
+    def redo(self):
+        step = self.journal.redo()
+        if step:
+            self.set_cell(*step)
 
     def save_config_dialog(self):
         text, ok = QInputDialog.getText(
@@ -406,11 +992,25 @@ class SoundBoard(QMainWindow):
             text=self.current_config_name if self.current_config_name else ""
         )
         if ok and text:
-            btns = [
-                {'label': btn.text(), 'audio_path': btn.audio_path, 'row': row, 'col': col}
-                for (btn, row, col) in self.buttons
-            ]
-            config_id = self.db.save_config(text, btns, self.rows, self.cols)
+            changed = self.journal.changed_cells() if self.current_config_id and text == self.current_config_name else None
+            cells = self.board_cells()
+            if changed is None:
+                btns = [
+                    {'label': label, 'audio_path': audio_path, 'row': row, 'col': col, 'dsp': dsp, 'mode': mode}
+                    for (row, col), (label, audio_path, dsp, mode) in cells.items()
+                ]
+                config_id = self.db.save_config(text, btns, self.rows, self.cols)
+            else:
+                # Same config: only write the cells the journal says have changed
+                upserts = [
+                    {'label': cells[cell][0], 'audio_path': cells[cell][1], 'row': cell[0], 'col': cell[1],
+                     'dsp': cells[cell][2], 'mode': cells[cell][3]}
+                    for cell in changed if cell in cells
+                ]
+                deletes = [cell for cell in changed if cell not in cells]
+                config_id = self.current_config_id
+                self.db.save_config_changes(config_id, upserts, deletes, self.rows, self.cols)
+            self.journal.mark_saved()
             self.db.set_last_used_config(config_id)
             self.current_config_id = config_id
             self.current_config_name = text
@@ -430,6 +1030,7 @@ class SoundBoard(QMainWindow):
             self.db.set_last_used_config(config_id)
             self.current_config_id = config_id
             self.current_config_name = config_name
+            self.load_config_dimensions(config_id)
             btns = self.db.get_config_buttons(config_id)
             self.init_ui(btns)
     def load_last_used_config(self):
@@ -437,27 +1038,33 @@ class SoundBoard(QMainWindow):
         if config:
             self.current_config_id = config[0]
             self.current_config_name = config[1] if len(config) > 1 else None
+            self.load_config_dimensions(config[0])
             btns = self.db.get_config_buttons(config[0])
             self.init_ui(btns)
         else:
             self.current_config_name = None
             self.init_ui()
 
+    def load_config_dimensions(self, config_id):
+        config = self.db.get_config(config_id)
+        if config:
+            self.rows = config['rows'] or self.rows
+            self.cols = config['cols'] or self.cols
+
     def get_pipewire_device(self):
-        devices = sd.query_devices()
-        for idx, dev in enumerate(devices):
-            if 'SoundboardSink' in dev['name']:
-                return idx
-        for idx, dev in enumerate(devices):
-            if 'pipewire' in dev['name'].lower():
-                return idx
-        for idx, dev in enumerate(devices):
-            if 'default' in dev['name'].lower():
-                return idx
+        for name in ('SoundboardSink', 'pipewire', 'default'):
+            dev = device_registry.find_matching(name)
+            if dev:
+                return dev['index']
         return 0
 
     def closeEvent(self, event):
         self.check_unsaved_changes()
+        self.triggers.stop()
+        self.library.stop()
+        if self.analyzer is not None:
+            self.analyzer.shutdown()
+        self.core.close()
         event.accept()
 
     def load_config(self, config_id):
@@ -467,19 +1074,26 @@ class SoundBoard(QMainWindow):
             return
         self.current_config_id = config_id
         self.current_config_name = config['name']
+        self.rows = config['rows'] or self.rows
+        self.cols = config['cols'] or self.cols
         buttons = self.db.get_config_buttons(config_id)
-        self.init_ui([(btn[0], btn[1], btn[2], btn[3]) for btn in buttons])  # Populate buttons using init_ui
-        self.layout.activate()  # Recalculate layout
-        self.updateGeometry()   # Update widget geometry
-        self.central.updateGeometry()  # Update central widget geometry
-        self.central.adjustSize()      # Adjust central widget size
-        self.adjustSize()              # Adjust window size to fit new layout
+        self.init_ui(buttons)  # Populate buttons using init_ui
         logger.debug(f"Loaded config: {config['name']} (id: {config_id})")
 
-if __name__ == "__main__":
-    from PyQt6.QtCore import QCoreApplication, Qt
+def run(argv=None, startup=None):
+    """Show the board first, then bring up PipeWire and the audio devices."""
+    from PyQt6.QtCore import QCoreApplication
+    startup = startup or StartupTimer()
     QCoreApplication.setAttribute(Qt.ApplicationAttribute.AA_DontUseNativeMenuBar, True)
-    app = QApplication(sys.argv)
-    win = SoundBoard()
+    app = QApplication(argv if argv is not None else sys.argv)
+    startup.mark('qt_init')
+    win = SoundBoard(startup)
     win.show()
-    sys.exit(app.exec())
+    app.processEvents()
+    startup.mark('first_paint')
+    win.start_audio()
+    return app.exec()
+
+
+if __name__ == "__main__":
+    sys.exit(run())
@@ -0,0 +1,248 @@
+import os
+import re
+import json
+import time
+import bisect
+import logging
+import threading
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+# Histogram bucket upper bounds in seconds; anything slower lands in +Inf
+BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+RECENT_PLAYS = 100
+PROMETHEUS_PREFIX = 'pysoundboard'
+
+
+class Histogram:
+    """Fixed-bucket latency histogram.
+
+    Not locked: each writer thread gets its own (the audio callback owns the
+    engine's), or the caller serialises access.
+    """
+
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, seconds):
+        self.counts[bisect.bisect_left(self.buckets, seconds)] += 1
+        self.count += 1
+        self.sum += seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    def quantile(self, q):
+        """Upper bound of the bucket holding the q-quantile, capped at the observed max."""
+        if not self.count:
+            return 0.0
+        target = q * self.count
+        seen = 0
+        for bound, count in zip(self.buckets, self.counts):
+            seen += count
+            if seen >= target:
+                return min(bound, self.max)
+        return self.max
+
+    def to_dict(self):
+        return {
+            'count': self.count,
+            'avg_ms': self.sum / self.count * 1000 if self.count else 0.0,
+            'p50_ms': self.quantile(0.5) * 1000,
+            'p95_ms': self.quantile(0.95) * 1000,
+            'p99_ms': self.quantile(0.99) * 1000,
+            'max_ms': self.max * 1000,
+        }
+
+
+class _NullSpan:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+NULL_SPAN = _NullSpan()
+
+
+class _Span:
+    __slots__ = ('metrics', 'name', 'start')
+
+    def __init__(self, metrics, name):
+        self.metrics = metrics
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.metrics.observe(self.name, time.perf_counter() - self.start)
+        return False
+
+
+def _metric_name(*parts):
+    return re.sub(r'[^a-zA-Z0-9_]', '_', '_'.join((PROMETHEUS_PREFIX,) + parts))
+
+
+def _histogram_lines(name, histogram):
+    lines = [f"# TYPE {name} histogram"]
+    cumulative = 0
+    for bound, count in zip(histogram.buckets, histogram.counts):
+        cumulative += count
+        lines.append(f'{name}_bucket{{le="{bound}"}} {cumulative}')
+    lines.append(f'{name}_bucket{{le="+Inf"}} {histogram.count}')
+    lines.append(f"{name}_sum {histogram.sum}")
+    lines.append(f"{name}_count {histogram.count}")
+    return lines
+
+
+class Metrics:
+    """Opt-in timing spans, counters and collected stats for the playback path.
+
+    ``span(name)`` times a stage (decode, resample, device query, stream open)
+    into a histogram; spans that run while a play is being started are also
+    recorded on that play, along with when its first buffer reached the
+    device. Other components register collectors returning their stats, and
+    everything can be exported as JSON or Prometheus text. When disabled,
+    ``span`` hands back a shared no-op context and nothing is recorded.
+    """
+
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self.histograms = {}
+        self.counters = {}
+        self.collectors = {}
+        self.recent_plays = deque(maxlen=RECENT_PLAYS)
+        self.started = time.time()
+        self._local = threading.local()
+        self._lock = threading.Lock()
+
+    def set_enabled(self, enabled):
+        self.enabled = enabled
+        logger.info(f"Metrics {'enabled' if enabled else 'disabled'}")
+
+    def span(self, name):
+        if not self.enabled:
+            return NULL_SPAN
+        return _Span(self, name)
+
+    def observe(self, name, seconds):
+        with self._lock:
+            histogram = self.histograms.get(name)
+            if histogram is None:
+                histogram = self.histograms[name] = Histogram()
+            histogram.observe(seconds)
+        play = getattr(self._local, 'play', None)
+        if play is not None:
+            play['spans'][name] = play['spans'].get(name, 0.0) + seconds * 1000
+
+    def incr(self, name, amount=1):
+        if not self.enabled:
+            return
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + amount
+
+    def begin_play(self, audio_path, start=None):
+        """Start recording the spans of one play on this thread.
+
+        Returns the play record, or None if metrics are off or a play is
+        already being recorded on this thread (the outer one owns it).
+        """
+        if not self.enabled or getattr(self._local, 'play', None) is not None:
+            return None
+        play = {
+            'path': audio_path,
+            'time': time.time(),
+            'start': start or time.perf_counter(),
+            'spans': {},
+            # Filled in by the audio callback that renders the first block
+            'first_buffer_ms': None,
+        }
+        self._local.play = play
+        return play
+
+    def current_play(self):
+        if not self.enabled:
+            return None
+        return getattr(self._local, 'play', None)
+
+    def end_play(self, play):
+        if play is None:
+            return
+        self._local.play = None
+        with self._lock:
+            self.recent_plays.append(play)
+            self.counters['plays'] = self.counters.get('plays', 0) + 1
+        logger.debug(f"Play {play['path']}: {play['spans']}")
+
+    def register(self, name, collector):
+        """collector() returns a dict of stats (numbers, strings or Histograms), or None."""
+        self.collectors[name] = collector
+
+    def reset(self):
+        with self._lock:
+            self.histograms.clear()
+            self.counters.clear()
+            self.recent_plays.clear()
+            self.started = time.time()
+
+    def _collect(self):
+        collected = {}
+        for name, collector in list(self.collectors.items()):
+            try:
+                values = collector()
+            except Exception as e:
+                logger.debug(f"Metrics collector {name} failed: {e}")
+                continue
+            if values is not None:
+                collected[name] = values
+        return collected
+
+    def snapshot(self):
+        with self._lock:
+            spans = {name: histogram.to_dict() for name, histogram in self.histograms.items()}
+            counters = dict(self.counters)
+            plays = [{key: value for key, value in play.items() if key != 'start'} for play in self.recent_plays]
+        snapshot = {
+            'enabled': self.enabled,
+            'uptime_s': time.time() - self.started,
+            'spans': spans,
+            'counters': counters,
+        }
+        for name, values in self._collect().items():
+            snapshot[name] = {key: value.to_dict() if isinstance(value, Histogram) else value
+                              for key, value in values.items()}
+        snapshot['recent_plays'] = plays
+        return snapshot
+
+    def to_json(self):
+        return json.dumps(self.snapshot(), indent=2, default=str)
+
+    def to_prometheus(self):
+        """Prometheus text exposition format; non-numeric stats are left out."""
+        lines = []
+        with self._lock:
+            histograms = list(self.histograms.items())
+            counters = list(self.counters.items())
+            for name, histogram in histograms:
+                lines.extend(_histogram_lines(_metric_name('span', name, 'seconds'), histogram))
+        for name, value in counters:
+            metric = _metric_name(name, 'total')
+            lines.extend([f"# TYPE {metric} counter", f"{metric} {value}"])
+        for group, values in self._collect().items():
+            for key, value in values.items():
+                if isinstance(value, Histogram):
+                    lines.extend(_histogram_lines(_metric_name(group, key, 'seconds'), value))
+                elif isinstance(value, (int, float)):
+                    metric = _metric_name(group, key)
+                    lines.extend([f"# TYPE {metric} gauge", f"{metric} {float(value)}"])
+        return "\n".join(lines) + "\n"
+
+
+metrics = Metrics(enabled=os.environ.get('PYSOUNDBOARD_METRICS') == '1')
@@ -0,0 +1,111 @@
+import time
+import logging
+import numpy as np
+from audio_engine import AudioEngine, DEFAULT_BLOCKSIZE, DEFAULT_MAX_VOICES
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_LIMITER_THRESHOLD = 0.89  # about -1 dBFS
+DEFAULT_LIMITER_RELEASE = 0.05
+
+
+class PeakLimiter:
+    """Block-wise peak limiter.
+
+    Gain drops immediately to keep each block's peak under the threshold and
+    recovers gradually over following blocks. The gain is ramped linearly
+    across every block to avoid zipper noise.
+    """
+
+    def __init__(self, threshold=DEFAULT_LIMITER_THRESHOLD, release=DEFAULT_LIMITER_RELEASE):
+        self.threshold = threshold
+        self.release = release
+        self.gain = 1.0
+        self.reduction_blocks = 0
+
+    def process(self, block):
+        peak = float(np.abs(block).max()) if block.size else 0.0
+        target = min(1.0, self.threshold / peak) if peak > 0 else 1.0
+        if target < self.gain:
+            new_gain = target
+            self.reduction_blocks += 1
+        else:
+            new_gain = self.gain + (target - self.gain) * self.release
+        if new_gain != 1.0 or self.gain != 1.0:
+            ramp = np.linspace(self.gain, new_gain, len(block), dtype=np.float32)
+            block *= ramp[:, np.newaxis]
+            # The ramp starts above the target, so clamp any remaining overshoot
+            np.clip(block, -self.threshold, self.threshold, out=block)
+        self.gain = new_gain
+
+
+class MicMixEngine(AudioEngine):
+    """Audio engine that also captures the mic and mixes it with the voices.
+
+    This replaces the SoundboardSink -> loopback -> SoundboardMix <- loopback
+    <- mic chain with one duplex stream: the mic is read, mixed with the
+    soundboard voices and written straight to the SoundboardMix sink, so the
+    loopback modules' buffering latency is avoided.
+    """
+
+    def __init__(self, device=None, info=None, input_device=None, input_info=None, blocksize=DEFAULT_BLOCKSIZE,
+                 mic_gain=1.0, board_gain=1.0, limiter_threshold=DEFAULT_LIMITER_THRESHOLD, max_voices=DEFAULT_MAX_VOICES):
+        super().__init__(device, info, blocksize, max_voices)
+        self.input_device = input_device
+        if input_info is None:
+            import sounddevice as sd
+            input_info = sd.query_devices(input_device, 'input')
+        self.input_name = input_info['name']
+        self.input_channels = max(1, min(self.channels, input_info['max_input_channels']))
+        self.mic_gain = mic_gain
+        self.board_gain = board_gain
+        self.limiter = PeakLimiter(limiter_threshold)
+        self.input_overflows = 0
+
+    def _open_stream(self, sd):
+        logger.debug(f"Starting mic mix engine: mic {self.input_device} -> {self.device_name} "
+                     f"({self.samplerate} Hz, block {self.blocksize})")
+        return sd.Stream(
+            samplerate=self.samplerate,
+            device=(self.input_device, self.device),
+            channels=(self.input_channels, self.channels),
+            dtype='float32',
+            blocksize=self.blocksize,
+            callback=self._duplex_callback
+        )
+
+    def _duplex_callback(self, indata, outdata, frames, time_info, status):
+        start = time.perf_counter()
+        if status.output_underflow:
+            self.underruns += 1
+        if status.input_overflow:
+            self.input_overflows += 1
+        self._track_clock(frames)
+        if self._mix_voices(outdata, frames) and self.board_gain != 1.0:
+            outdata *= self.board_gain
+        if self.input_channels == self.channels or self.input_channels == 1:
+            outdata += indata * self.mic_gain
+        else:
+            outdata += indata.mean(axis=1, keepdims=True) * self.mic_gain
+        self.limiter.process(outdata)
+        self._record_callback(start)
+
+    def latency(self):
+        """Estimated mic-to-sink latency in seconds: device latencies plus one block."""
+        if self.stream is None:
+            return None
+        input_latency, output_latency = self.stream.latency
+        return input_latency + output_latency + self.blocksize / self.samplerate
+
+    def stats(self):
+        stats = super().stats()
+        latency = self.latency()
+        stats.update({
+            'mode': 'native',
+            'mic_latency_ms': latency * 1000 if latency is not None else None,
+            'input_overflows': self.input_overflows,
+            'limiter_blocks': self.limiter.reduction_blocks,
+            'mic_gain': self.mic_gain,
+            'board_gain': self.board_gain,
+        })
+        return stats
@@ -0,0 +1,88 @@
+import time
+import logging
+import numpy as np
+from audio_engine import AudioEngine, DEFAULT_BLOCKSIZE, DEFAULT_MAX_VOICES
+
+logger = logging.getLogger(__name__)
+
+# Both clocks are measured for this long before the monitor's playback rate is adjusted
+DRIFT_MIN_SECONDS = 10.0
+# Real crystals differ by tens of ppm; anything beyond this is a measurement glitch
+MAX_DRIFT = 0.002
+
+
+class MonitorEngine(AudioEngine):
+    """Extra output that plays every clip started on a reference engine, e.g. headphones.
+
+    Device clocks never run at exactly the same rate, so a long clip would
+    slowly drift ahead of or behind the reference output. Once both clocks
+    have been measured, the monitor mixes its voices as usual and then
+    stretches the mix by the clock ratio with linear interpolation: one
+    resampling pass per block however many voices are playing.
+    """
+
+    def __init__(self, device, info, reference, gain=1.0, blocksize=DEFAULT_BLOCKSIZE, max_voices=DEFAULT_MAX_VOICES):
+        super().__init__(device, info, blocksize, max_voices, gain)
+        self.reference = reference
+        # Mixed frames consumed per output frame
+        self.drift_step = 1.0
+        self._carry = None
+        self._phase = 0.0
+        self._ramp = np.arange(blocksize, dtype=np.float64)
+
+    def _callback(self, outdata, frames, time_info, status):
+        start = time.perf_counter()
+        if status.output_underflow:
+            self.underruns += 1
+        self._track_clock(frames)
+        self.drift_step = self.measure_drift()
+        if self._carry is None and self.drift_step == 1.0:
+            active = self._mix_voices(outdata, frames)
+        else:
+            active = self._mix_stretched(outdata, frames, self.drift_step)
+        if active:
+            if self.gain != 1.0:
+                outdata *= self.gain
+            np.clip(outdata, -1.0, 1.0, out=outdata)
+        self._record_callback(start)
+
+    def _mix_stretched(self, outdata, frames, step):
+        if self._carry is None:
+            self._carry = np.zeros((0, self.channels), dtype=np.float32)
+        if len(self._ramp) < frames:
+            self._ramp = np.arange(frames, dtype=np.float64)
+        # Enough mixed frames that the last output frame has a right-hand neighbour
+        needed = int(self._phase + (frames - 1) * step) + 2
+        mixed = np.empty((needed - len(self._carry), self.channels), dtype=np.float32)
+        active = self._mix_voices(mixed, len(mixed))
+        buffer = np.concatenate((self._carry, mixed))
+        positions = self._phase + self._ramp[:frames] * step
+        index = positions.astype(np.intp)
+        frac = (positions - index).astype(np.float32)[:, np.newaxis]
+        left = buffer[index]
+        np.multiply(buffer[index + 1] - left, frac, out=outdata)
+        outdata += left
+        advanced = self._phase + frames * step
+        self._carry = buffer[int(advanced):]
+        self._phase = advanced - int(advanced)
+        return active
+
+    def measure_drift(self):
+        """Mixed frames per output frame that keep this output in step with the reference."""
+        ours = self.clock_ratio(DRIFT_MIN_SECONDS)
+        theirs = self.reference.clock_ratio(DRIFT_MIN_SECONDS)
+        if ours is None or theirs is None:
+            return self.drift_step
+        step = theirs / ours
+        if abs(step - 1.0) > MAX_DRIFT:
+            return self.drift_step
+        return step
+
+    def stats(self):
+        stats = super().stats()
+        stats.update({
+            'mode': 'monitor',
+            'reference': self.reference.device_name,
+            'drift_ppm': (self.drift_step - 1.0) * 1e6,
+        })
+        return stats
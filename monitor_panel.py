@@ -0,0 +1,67 @@
+import math
+from PyQt6.QtWidgets import QDialog, QVBoxLayout, QGridLayout, QCheckBox, QDoubleSpinBox, QLabel, QPushButton
+from device_registry import device_registry
+
+MIN_GAIN_DB = -60.0
+MAX_GAIN_DB = 12.0
+
+
+def gain_to_db(gain):
+    return 20 * math.log10(gain) if gain > 0 else MIN_GAIN_DB
+
+
+def db_to_gain(db):
+    return 10 ** (db / 20)
+
+
+class MonitorPanel(QDialog):
+    """Choose extra output devices every clip is played on, each with its own gain."""
+
+    def __init__(self, core, parent=None):
+        super().__init__(parent)
+        self.core = core
+        self.setWindowTitle("Monitor Outputs")
+        layout = QVBoxLayout(self)
+        layout.addWidget(QLabel("Play every sound on these devices as well, e.g. your headphones:"))
+        grid = QGridLayout()
+        gains = {output['device']: output.get('gain', 1.0) for output in core.monitor_outputs}
+        self.rows = []
+        main_output = core.engine.device_name if core.engine is not None else None
+        for row, dev in enumerate(device_registry.output_devices()):
+            box = QCheckBox(dev['name'])
+            box.setChecked(dev['name'] in gains)
+            if dev['name'] == main_output:
+                box.setEnabled(False)
+                box.setToolTip("This is the main output")
+            gain = self._gain_box(gain_to_db(gains.get(dev['name'], 1.0)))
+            box.toggled.connect(self.apply)
+            gain.valueChanged.connect(self.apply)
+            grid.addWidget(box, row, 0)
+            grid.addWidget(gain, row, 1)
+            self.rows.append((dev['name'], box, gain))
+        layout.addLayout(grid)
+        self.output_gain = self._gain_box(gain_to_db(core.output_gain))
+        self.output_gain.setToolTip("Gain of the main output; in native mic mixing use the board_gain setting")
+        self.output_gain.valueChanged.connect(lambda db: self.core.set_output_gain(db_to_gain(db)))
+        main_row = QGridLayout()
+        main_row.addWidget(QLabel("Main output gain"), 0, 0)
+        main_row.addWidget(self.output_gain, 0, 1)
+        layout.addLayout(main_row)
+        close = QPushButton("Close")
+        close.clicked.connect(self.accept)
+        layout.addWidget(close)
+
+    def _gain_box(self, db):
+        box = QDoubleSpinBox()
+        box.setRange(MIN_GAIN_DB, MAX_GAIN_DB)
+        box.setSingleStep(1.0)
+        box.setDecimals(1)
+        box.setSuffix(" dB")
+        box.setValue(db)
+        return box
+
+    def apply(self):
+        self.core.set_monitor_outputs([
+            {'device': name, 'gain': db_to_gain(gain.value())}
+            for name, box, gain in self.rows if box.isChecked()
+        ])
@@ -0,0 +1,180 @@
+import time
+import shlex
+import subprocess
+import logging
+from collections import namedtuple
+from metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+SOUNDBOARD_SINK = "SoundboardSink"
+MIX_SINK = "SoundboardMix"
+MIX_SOURCE = "SoundboardMixSource"
+
+Module = namedtuple('Module', ['id', 'name', 'args'])
+
+
+def run_pactl(args):
+    return subprocess.check_output(["pactl", *args], text=True)
+
+
+def parse_module_args(argument):
+    args = {}
+    try:
+        parts = shlex.split(argument)
+    except ValueError:
+        parts = argument.split()
+    for part in parts:
+        key, sep, value = part.partition('=')
+        if sep:
+            args[key] = value
+    return args
+
+
+def parse_modules(text):
+    """Parse `pactl list short modules` output into Module tuples."""
+    modules = []
+    for line in text.splitlines():
+        fields = line.split('\t')
+        if len(fields) < 2 or not fields[0].strip().isdigit():
+            continue
+        argument = fields[2] if len(fields) > 2 else ''
+        modules.append(Module(int(fields[0]), fields[1].strip(), parse_module_args(argument)))
+    return modules
+
+
+def module_spec(name, match, extra=None):
+    """A desired module: `match` args identify it, `extra` args are only passed on load."""
+    return {'name': name, 'match': match, 'extra': extra or {}}
+
+
+def matches(module, spec):
+    if module.name != spec['name']:
+        return False
+    return all(module.args.get(k) == v for k, v in spec['match'].items())
+
+
+class PipeWireGraph:
+    """Sets up the soundboard's sinks, loopbacks and remapped source idempotently.
+
+    State is read with a single `pactl list short modules` call and diffed
+    against the desired topology; only missing modules are loaded. IDs of
+    modules loaded here are remembered so cleanup never touches modules that
+    already existed or belong to other applications.
+    """
+
+    def __init__(self, runner=run_pactl, native_mix=False):
+        self.run = runner
+        self.native_mix = native_mix
+        self.owned = []
+        self.pactl_calls = 0
+        self.setup_time = None
+        self.duplicates = 0
+        self.foreign_loopbacks = 0
+
+    def _pactl(self, *args):
+        self.pactl_calls += 1
+        return self.run(list(args))
+
+    def snapshot(self):
+        return parse_modules(self._pactl("list", "short", "modules"))
+
+    def desired_topology(self):
+        if self.native_mix:
+            # pySoundBoard mixes the mic itself and writes straight to the mix sink
+            return [
+                module_spec("module-null-sink", {'sink_name': MIX_SINK},
+                            {'sink_properties': f"device.description={MIX_SINK}"}),
+                module_spec("module-remap-source", {'source_name': MIX_SOURCE},
+                            {'master': f"{MIX_SINK}.monitor",
+                             'source_properties': f"device.description={MIX_SOURCE}"}),
+            ]
+        return [
+            module_spec("module-null-sink", {'sink_name': SOUNDBOARD_SINK},
+                        {'sink_properties': f"device.description={SOUNDBOARD_SINK}"}),
+            module_spec("module-null-sink", {'sink_name': MIX_SINK},
+                        {'sink_properties': f"device.description={MIX_SINK}"}),
+            module_spec("module-loopback", {'source': f"{SOUNDBOARD_SINK}.monitor", 'sink': MIX_SINK}),
+            # The mic source is resolved only if this loopback has to be loaded
+            module_spec("module-loopback", {'source': None, 'sink': MIX_SINK}),
+            module_spec("module-remap-source", {'source_name': MIX_SOURCE},
+                        {'master': f"{MIX_SINK}.monitor",
+                         'source_properties': f"device.description={MIX_SOURCE}"}),
+        ]
+
+    def find(self, modules, spec):
+        if spec['name'] == "module-loopback" and spec['match']['source'] is None:
+            # Any loopback into the mix that is not the soundboard one is the mic
+            return [m for m in modules if m.name == spec['name']
+                    and m.args.get('sink') == MIX_SINK
+                    and m.args.get('source') != f"{SOUNDBOARD_SINK}.monitor"]
+        return [m for m in modules if matches(m, spec)]
+
+    def ensure(self):
+        start = time.perf_counter()
+        self.pactl_calls = 0
+        modules = self.snapshot()
+        logger.debug(f"Modules: {modules}")
+        self.duplicates = 0
+        loaded = 0
+        for spec in self.desired_topology():
+            found = self.find(modules, spec)
+            if found:
+                self.duplicates += len(found) - 1
+                continue
+            args = dict(spec['match'])
+            if args.get('source', '') is None:
+                args['source'] = self._pactl("get-default-source").strip()
+            args.update(spec['extra'])
+            logger.debug(f"Loading {spec['name']} {args}")
+            module_id = self._pactl("load-module", spec['name'], *[f"{k}={v}" for k, v in args.items()]).strip()
+            if module_id.isdigit():
+                self.owned.append(int(module_id))
+            loaded += 1
+        self.setup_time = time.perf_counter() - start
+        logger.info(f"PipeWire setup took {self.setup_time * 1000:.1f} ms: {loaded} modules loaded, "
+                    f"{self.pactl_calls} pactl calls, {self.duplicates} duplicate modules present")
+        if self.duplicates:
+            logger.warning(f"{self.duplicates} duplicate soundboard modules are loaded; "
+                           f"they were not created by this process and are left alone")
+        return loaded
+
+    def set_native_mix(self, enabled):
+        """Switch topology; in native mode the loopbacks into the mix would double the mic."""
+        self.native_mix = enabled
+        self.foreign_loopbacks = 0
+        if enabled:
+            for module in self.snapshot():
+                if module.name != "module-loopback" or module.args.get('sink') != MIX_SINK:
+                    continue
+                if module.id not in self.owned:
+                    self.foreign_loopbacks += 1
+                    continue
+                logger.debug(f"Unloading loopback {module.id} for native mixing")
+                self._pactl("unload-module", str(module.id))
+                self.owned.remove(module.id)
+            if self.foreign_loopbacks:
+                logger.warning(f"{self.foreign_loopbacks} loopbacks into {MIX_SINK} were not created by this "
+                               f"process and are left alone; they may play the mic twice")
+        return self.ensure()
+
+    def cleanup(self):
+        for module_id in reversed(self.owned):
+            try:
+                self._pactl("unload-module", str(module_id))
+            except Exception as e:
+                logger.warning(f"Could not unload module {module_id}: {e}")
+        self.owned.clear()
+
+    def stats(self):
+        return {
+            'setup_ms': self.setup_time * 1000 if self.setup_time is not None else None,
+            'pactl_calls': self.pactl_calls,
+            'owned_modules': list(self.owned),
+            'duplicates': self.duplicates,
+            'foreign_loopbacks': self.foreign_loopbacks,
+        }
+
+
+pipewire_graph = PipeWireGraph()
+metrics.register('pipewire', pipewire_graph.stats)
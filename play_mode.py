@@ -0,0 +1,32 @@
+from collections import namedtuple
+
+PLAY_MODE_FIELDS = ('retrigger', 'choke_group', 'loop', 'queue')
+# What pressing a button does while its previous play is still sounding
+RETRIGGER_MODES = ('overlap', 'restart', 'ignore', 'toggle')
+
+
+class PlayMode(namedtuple('PlayMode', PLAY_MODE_FIELDS, defaults=('overlap', 0, False, False))):
+    """How a button's clip is scheduled on the output timeline.
+
+    retrigger is one of RETRIGGER_MODES. Starting a clip cuts off every
+    other clip in the same choke group (0 is none) at its first sample.
+    loop repeats the clip until it is stopped, and queue plays it after
+    the clips already queued instead of straight away, with no gap.
+    """
+    __slots__ = ()
+
+
+DEFAULT_PLAY_MODE = PlayMode()
+
+
+def play_mode_or_none(values):
+    """PlayMode from stored values, or None for the default behaviour."""
+    if values is None:
+        return None
+    if isinstance(values, dict):
+        values = PlayMode(**values)
+    retrigger, choke_group, loop, queue = values
+    if retrigger not in RETRIGGER_MODES:
+        retrigger = 'overlap'
+    mode = PlayMode(retrigger, int(choke_group or 0), bool(loop), bool(queue))
+    return None if mode == DEFAULT_PLAY_MODE else mode
@@ -0,0 +1,121 @@
+import time
+import logging
+from audio_cache import audio_cache
+from sample_store import sample_store
+from audio_engine import BufferVoice
+from audio_stream import StreamReader
+from metrics import metrics
+from dsp import FadeVoice, output_frames
+from dsp_params import DEFAULT_DSP
+
+logger = logging.getLogger(__name__)
+
+
+def make_voice(engine, audio_path, voice_id, dsp=None, loop=False, reader=None):
+    """A voice playing audio_path in the engine's format, processed by dsp (DspParams or None).
+
+    Stored clips are memory-mapped, long files are streamed and everything else
+    comes from the audio cache, so outputs sharing a format share one array.
+    Trim, pitch and speed are rendered into the cache; gain and fades are
+    applied per block. A looping voice only fades in. reader is the clip's
+    StreamReader when it is streamed to several outputs, and the caller
+    starts it once every output has its voice.
+    """
+    if sample_store.is_managed(audio_path):
+        data = sample_store.pcm(audio_path, engine.samplerate, engine.channels)
+        gain = audio_cache.gain_for(audio_path)
+    elif reader is not None or audio_cache.should_stream(audio_path):
+        return _stream_voice(engine, audio_path, voice_id, dsp, loop, reader)
+    else:
+        data, fs = audio_cache.load(audio_path, engine.samplerate, engine.channels)
+        gain = 1.0
+    if dsp is None:
+        return BufferVoice(data, voice_id, gain, loop)
+    if dsp.needs_render():
+        data = audio_cache.render(audio_path, data, engine.samplerate, engine.channels, dsp)
+    if not dsp.has_fades():
+        return BufferVoice(data, voice_id, gain * dsp.gain, loop)
+    return FadeVoice(BufferVoice(data, voice_id, gain, loop), engine.samplerate, dsp, None if loop else len(data))
+
+
+def stream_reader(audio_path, dsp=None, loop=False):
+    """A StreamReader for audio_path if it is long enough to stream, else None."""
+    if sample_store.is_managed(audio_path) or not audio_cache.should_stream(audio_path):
+        return None
+    params = dsp or DEFAULT_DSP
+    if params.pitch:
+        logger.warning(f"Pitch shift is not applied to {audio_path}: it is streamed, not cached")
+    return StreamReader(audio_path, audio_cache.quality, audio_cache.gain_for(audio_path),
+                        params.trim_start, params.trim_end, params.speed, loop)
+
+
+def _stream_voice(engine, audio_path, voice_id, dsp, loop, reader):
+    if reader is None:
+        reader = stream_reader(audio_path, dsp, loop)
+        voice = reader.add_output(engine.samplerate, engine.channels, voice_id)
+        reader.start()
+    else:
+        voice = reader.add_output(engine.samplerate, engine.channels, voice_id)
+    if dsp is None or dsp.gain_db == 0 and not dsp.has_fades():
+        return voice
+    # The reader thread has already applied the file's gain to what it buffered, so wrap instead
+    total = None if loop else output_frames(audio_cache.duration(audio_path), engine.samplerate, dsp)
+    return FadeVoice(voice, engine.samplerate, dsp, total)
+
+
+def start_frame(engine, when):
+    """Where on engine's timeline a clip triggered at perf_counter time when starts.
+
+    A clip that took longer to load than the block its trigger fell in
+    starts with the next block instead, so a late start on the engine only
+    ever comes from the command itself missing its block.
+    """
+    frame = engine.schedule_frame(when)
+    if frame is not None and frame < engine.mix_frame:
+        frame = engine.schedule_frame()
+    return frame
+
+
+def start_clip(engine, audio_path, trigger_time=None, dsp=None, mode=None, key=None):
+    """Start audio_path on engine and on its monitor outputs; returns the voice id.
+
+    trigger_time is the perf_counter() time of the input event, if any: the
+    clip is placed on the engine's timeline at that time, and it feeds the
+    trigger latency statistics. dsp and mode are the button's DspParams and
+    PlayMode, if any, and key identifies the button for its retrigger mode.
+    Monitors play the clip under the same voice id, so stopping it on the
+    engine stops it everywhere, and a streamed clip is decoded once for all
+    of them. Safe to call from any thread.
+    """
+    when = trigger_time or time.perf_counter()
+    loop = mode is not None and mode.loop
+    record = metrics.begin_play(audio_path, trigger_time)
+    try:
+        with metrics.span('start_clip'):
+            reader = stream_reader(audio_path, dsp, loop)
+            voice_id = engine.next_voice_id()
+            voice = make_voice(engine, audio_path, voice_id, dsp, loop, reader)
+            monitor_voices = []
+            for monitor in engine.monitors:
+                try:
+                    monitor_voices.append((monitor, make_voice(monitor, audio_path, voice_id, dsp, loop, reader)))
+                except Exception as e:
+                    logger.warning(f"Could not play {audio_path} on monitor {monitor.device_name}: {e}")
+            if reader is not None:
+                reader.start()
+            voice.trigger_time = trigger_time
+            voice.play_record = metrics.current_play()
+            voice.key, voice.mode = key, mode
+            voice.start_frame = start_frame(engine, when)
+            voice_id = engine.play_voice(voice)
+        for monitor, monitor_voice in monitor_voices:
+            try:
+                monitor_voice.key, monitor_voice.mode = key, mode
+                monitor_voice.start_frame = start_frame(monitor, when)
+                monitor.play_voice(monitor_voice)
+            except Exception as e:
+                logger.warning(f"Could not play {audio_path} on monitor {monitor.device_name}: {e}")
+                monitor_voice.close()
+        return voice_id
+    finally:
+        metrics.end_play(record)
@@ -0,0 +1,91 @@
+import os
+import threading
+import logging
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from audio_cache import audio_cache
+from sample_store import sample_store
+
+logger = logging.getLogger(__name__)
+
+
+class AudioPreloader:
+    """Decodes and resamples a config's clips into the audio cache in the background.
+
+    Every call to ``preload`` starts a new generation; jobs queued by an older
+    generation are cancelled or skip themselves, so switching configs
+    mid-preload never wastes work on the old board.
+    """
+
+    def __init__(self, cache=audio_cache, store=sample_store, max_workers=2):
+        self.cache = cache
+        self.store = store
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='preload')
+        self.play_counts = Counter()
+        self._generation = 0
+        self._futures = []
+        self._lock = threading.Lock()
+
+    def record_play(self, path):
+        self.play_counts[path] += 1
+
+    def preload(self, clips, samplerate, channels=None, cancel=True):
+        """Queue (audio_path, row, col, dsp) clips, most played first, then by grid position.
+
+        Clips whose dsp needs rendering are rendered too. With cancel=False
+        the clips are added to the current generation, to warm the same
+        board for another output format.
+        """
+        if cancel:
+            self.cancel()
+        ordered = sorted(
+            (c for c in clips if c[0]),
+            key=lambda c: (-self.play_counts[c[0]], c[1], c[2])
+        )
+        seen = set()
+        with self._lock:
+            generation = self._generation
+            for path, _, _, dsp in ordered:
+                if (path, dsp) in seen:
+                    continue
+                seen.add((path, dsp))
+                self._futures.append(self.executor.submit(self._load, generation, path, samplerate, channels, dsp))
+        logger.debug(f"Queued {len(seen)} clips for preload at {samplerate} Hz")
+
+    def _load(self, generation, path, samplerate, channels, dsp=None):
+        if generation != self._generation:
+            return
+        if self.store.is_managed(path):
+            # Stored clips are memory-mapped rather than cached; just make sure the PCM exists
+            try:
+                data = self.store.pcm(path, samplerate, channels)
+                if dsp is not None and dsp.needs_render():
+                    self.cache.render(path, data, samplerate, channels, dsp)
+            except Exception as e:
+                logger.warning(f"Could not transcode {path}: {e}")
+            return
+        if self.cache.current_bytes >= self.cache.max_bytes:
+            logger.debug(f"Audio cache full, skipping preload of {path}")
+            return
+        if not os.path.exists(path):
+            logger.warning(f"Cannot preload missing file: {path}")
+            return
+        try:
+            if self.cache.should_stream(path):
+                return
+            data, fs = self.cache.load(path, samplerate, channels)
+            if dsp is not None and dsp.needs_render():
+                self.cache.render(path, data, samplerate, channels, dsp)
+        except Exception as e:
+            logger.warning(f"Could not preload {path}: {e}")
+
+    def cancel(self):
+        with self._lock:
+            self._generation += 1
+            for future in self._futures:
+                future.cancel()
+            self._futures.clear()
+
+    def shutdown(self):
+        self.cancel()
+        self.executor.shutdown(wait=False, cancel_futures=True)
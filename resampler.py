@@ -0,0 +1,146 @@
+import math
+import logging
+from functools import lru_cache
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+logger = logging.getLogger(__name__)
+
+# Filter half-length (zero crossings per side) and Kaiser beta for each quality.
+# 'fast' is plain linear interpolation expressed as a two-tap kernel.
+QUALITY_SETTINGS = {
+    'fast': (1, None),
+    'medium': (16, 7.0),
+    'high': (48, 9.0),
+}
+DEFAULT_QUALITY = 'medium'
+ROLLOFF = 0.945
+MAX_PHASES = 1024
+CHUNK_FRAMES = 8192
+
+
+def rate_ratio(src_rate, dst_rate):
+    g = math.gcd(int(src_rate), int(dst_rate))
+    return int(dst_rate) // g, int(src_rate) // g
+
+
+@lru_cache(maxsize=32)
+def get_kernel(src_rate, dst_rate, quality=DEFAULT_QUALITY):
+    """Return the polyphase filter table for a rate pair, shape (phases, taps).
+
+    Row p holds the taps applied to input samples base-half+1 .. base+half for an
+    output that falls p/phases of the way between input samples base and base+1.
+    Rate pairs with more than MAX_PHASES phases share a quantised table.
+    """
+    half, beta = QUALITY_SETTINGS[quality]
+    up, down = rate_ratio(src_rate, dst_rate)
+    phases = min(up, MAX_PHASES)
+    frac = np.arange(phases) / phases
+    k = np.arange(-half + 1, half + 1)
+    x = k[np.newaxis, :] - frac[:, np.newaxis]
+    if beta is None:
+        kernel = np.clip(1.0 - np.abs(x), 0.0, None)
+    else:
+        cutoff = min(1.0, up / down) * ROLLOFF
+        window = np.i0(beta * np.sqrt(np.clip(1.0 - (x / half) ** 2, 0.0, None))) / np.i0(beta)
+        kernel = cutoff * np.sinc(cutoff * x) * window
+    kernel /= kernel.sum(axis=1, keepdims=True)
+    logger.debug(f"Built {quality} resampling kernel {src_rate}->{dst_rate} Hz: {kernel.shape}")
+    return kernel.astype(np.float32)
+
+
+def _polyphase(buffer, offset, n_start, n_end, up, down, kernel):
+    """Compute outputs n_start..n_end-1 from buffer, whose row 0 is input index offset."""
+    out = np.empty((n_end - n_start, buffer.shape[1]), dtype=np.float32)
+    if n_end <= n_start:
+        return out
+    taps = kernel.shape[1]
+    first_tap = 1 - taps // 2 - offset
+    if taps == 2:
+        n = np.arange(n_start, n_end, dtype=np.int64)
+        pos = n * down
+        base = pos // up + first_tap
+        frac = ((pos % up) / up).astype(np.float32)[:, np.newaxis]
+        np.multiply(buffer[base], 1.0 - frac, out=out)
+        out += buffer[base + 1] * frac
+        return out
+    if kernel.shape[0] == up and n_end - n_start >= 8 * up:
+        # Outputs n and n + up share a phase and their input windows are exactly
+        # `down` samples apart, so each phase is one strided matrix-vector product.
+        windows = sliding_window_view(buffer, taps, axis=0)
+        for r in range(min(up, n_end - n_start)):
+            pos = (n_start + r) * down
+            base = pos // up + first_tap
+            count = len(range(n_start + r, n_end, up))
+            out[r::up] = windows[base:base + (count - 1) * down + 1:down] @ kernel[pos % up]
+        return out
+    tap_offsets = np.arange(taps)
+    for chunk_start in range(n_start, n_end, CHUNK_FRAMES):
+        n = np.arange(chunk_start, min(chunk_start + CHUNK_FRAMES, n_end), dtype=np.int64)
+        pos = n * down
+        base = pos // up + first_tap
+        phase = (pos % up) * kernel.shape[0] // up
+        windows = buffer[base[:, np.newaxis] + tap_offsets]
+        out[chunk_start - n_start:chunk_start - n_start + len(n)] = np.einsum('nt,ntc->nc', kernel[phase], windows)
+    return out
+
+
+def resample(data, src_rate, dst_rate, quality=DEFAULT_QUALITY):
+    """Resample a (frames,) or (frames, channels) array, all channels in one pass."""
+    if src_rate == dst_rate:
+        return data
+    squeeze = data.ndim == 1
+    x = np.asarray(data, dtype=np.float32)
+    if squeeze:
+        x = x[:, np.newaxis]
+    kernel = get_kernel(src_rate, dst_rate, quality)
+    half = kernel.shape[1] // 2
+    up, down = rate_ratio(src_rate, dst_rate)
+    padded = np.pad(x, ((half, half + 1), (0, 0)))
+    out = _polyphase(padded, -half, 0, len(x) * up // down, up, down, kernel)
+    return out[:, 0] if squeeze else out
+
+
+class StreamingResampler:
+    """Block-by-block resampler that produces the same output as ``resample``.
+
+    Feed input blocks to ``process`` and call ``flush`` once at the end of the
+    stream. Only the filter history is kept between calls, so memory does not
+    grow with the length of the signal.
+    """
+
+    def __init__(self, src_rate, dst_rate, channels, quality=DEFAULT_QUALITY):
+        self.kernel = get_kernel(src_rate, dst_rate, quality)
+        self.half = self.kernel.shape[1] // 2
+        self.up, self.down = rate_ratio(src_rate, dst_rate)
+        self.channels = channels
+        self.buffer = np.zeros((self.half, channels), dtype=np.float32)
+        self.offset = -self.half
+        self.received = 0
+        self.produced = 0
+
+    def process(self, block):
+        if block.ndim == 1:
+            block = block[:, np.newaxis]
+        self.buffer = np.concatenate((self.buffer, np.asarray(block, dtype=np.float32)))
+        self.received += len(block)
+        last_base = self.received - self.half - 1
+        n_end = max(self.produced, ((last_base + 1) * self.up + self.down - 1) // self.down) if last_base >= 0 else self.produced
+        # Never run past the output length resample() gives the whole signal
+        return self._run(min(n_end, self.received * self.up // self.down))
+
+    def flush(self):
+        self.buffer = np.concatenate((self.buffer, np.zeros((self.half + 1, self.channels), dtype=np.float32)))
+        return self._run(self.received * self.up // self.down)
+
+    def _run(self, n_end):
+        out = _polyphase(self.buffer, self.offset, self.produced, n_end, self.up, self.down, self.kernel)
+        self.produced = max(self.produced, n_end)
+        keep_from = (self.produced * self.down) // self.up - self.half + 1
+        # With a short kernel and a large decimation ratio the next output can
+        # start beyond everything received so far; keep offset on the buffer
+        drop = min(keep_from - self.offset, len(self.buffer))
+        if drop > 0:
+            self.buffer = self.buffer[drop:]
+            self.offset += drop
+        return out
@@ -0,0 +1,121 @@
+import os
+import glob
+import shutil
+import hashlib
+import logging
+import tempfile
+import threading
+import numpy as np
+from audio_cache import audio_cache
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_STORE_DIR = os.path.join(
+    os.environ.get('XDG_DATA_HOME') or os.path.expanduser('~/.local/share'), 'pySoundBoard', 'samples'
+)
+HASH_BLOCK_BYTES = 1024 * 1024
+PCM_SUFFIX = '.f32'
+
+
+def hash_file(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(HASH_BLOCK_BYTES), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class SampleStore:
+    """Content-addressed copies of clips, transcoded once per output format.
+
+    A clip added to the store is kept as ``<hash><ext>`` (the original bytes,
+    so identical files are stored once however many boards use them) plus
+    ``<hash>-<rate>-<channels>.f32`` raw float32 PCM for each device format it
+    has been played on. The PCM is memory-mapped, so playback hands views of
+    the page cache straight to the audio engine without decoding or copying.
+    """
+
+    def __init__(self, root=DEFAULT_STORE_DIR, cache=audio_cache):
+        self.root = root
+        self.cache = cache
+        self._hashes = {}
+        self._maps = {}
+        self._lock = threading.Lock()
+
+    def _dir(self, sample_hash):
+        return os.path.join(self.root, sample_hash[:2])
+
+    def is_managed(self, path):
+        return bool(path) and os.path.dirname(os.path.dirname(os.path.abspath(path))) == os.path.abspath(self.root)
+
+    def hash_of(self, path):
+        """Content hash of a managed clip, from its name; None for outside files."""
+        if not self.is_managed(path):
+            return None
+        return os.path.splitext(os.path.basename(path))[0]
+
+    def path_for(self, sample_hash):
+        """Stored original for a hash, or None if the store does not have it."""
+        matches = glob.glob(os.path.join(self._dir(sample_hash), glob.escape(sample_hash) + '.*'))
+        return matches[0] if matches else None
+
+    def add(self, path):
+        """Copy path into the store unless its content is already there; returns the stored path."""
+        if self.is_managed(path):
+            return path
+        stat = os.stat(path)
+        key = (os.path.abspath(path), stat.st_mtime, stat.st_size)
+        sample_hash = self._hashes.get(key)
+        if sample_hash is None:
+            sample_hash = self._hashes[key] = hash_file(path)
+        stored = self.path_for(sample_hash)
+        if stored is None:
+            stored = os.path.join(self._dir(sample_hash), sample_hash + os.path.splitext(path)[1].lower())
+            self._write(stored, lambda tmp: shutil.copyfile(path, tmp))
+            logger.info(f"Added {path} to sample store as {sample_hash}")
+        return stored
+
+    def pcm(self, path, samplerate, channels):
+        """Read-only (frames, channels) float32 memmap of a managed clip, transcoding it on first use."""
+        sample_hash = self.hash_of(path)
+        raw = os.path.join(self._dir(sample_hash), f"{sample_hash}-{samplerate}-{channels}{PCM_SUFFIX}")
+        with self._lock:
+            data = self._maps.get(raw)
+        if data is not None:
+            return data
+        if not os.path.exists(raw):
+            pcm, _ = self.cache.decode(path, samplerate, channels)
+            self._write(raw, lambda tmp: pcm.tofile(tmp))
+            logger.debug(f"Transcoded {sample_hash} to {samplerate} Hz, {channels} ch")
+        frames = os.path.getsize(raw) // (4 * channels)
+        data = np.memmap(raw, dtype=np.float32, mode='r', shape=(frames, channels)) if frames else np.zeros((0, channels), dtype=np.float32)
+        with self._lock:
+            self._maps[raw] = data
+        return data
+
+    def _write(self, target, write):
+        # Write next to the target and rename, so readers never see a partial file
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(target), suffix='.tmp')
+        os.close(fd)
+        try:
+            write(tmp)
+            os.replace(tmp, target)
+        except BaseException:
+            os.unlink(tmp)
+            raise
+
+    def stats(self):
+        files = pcm_bytes = source_bytes = 0
+        for dirpath, _, filenames in os.walk(self.root):
+            for name in filenames:
+                size = os.path.getsize(os.path.join(dirpath, name))
+                if name.endswith(PCM_SUFFIX):
+                    pcm_bytes += size
+                else:
+                    files += 1
+                    source_bytes += size
+        return {'samples': files, 'source_bytes': source_bytes, 'pcm_bytes': pcm_bytes, 'mapped': len(self._maps)}
+
+
+sample_store = SampleStore()
@@ -0,0 +1,78 @@
+"""Control a running soundboard_daemon.py, e.g. from Stream Deck or OBS scripts.
+
+    python soundboard_client.py play --label Airhorn
+    python soundboard_client.py switch_config --name Stream
+    python soundboard_client.py stats
+    python soundboard_client.py metrics --format prometheus
+"""
+import sys
+import json
+import socket
+import argparse
+import itertools
+from soundboard_daemon import DEFAULT_SOCKET
+
+
+class SoundboardClient:
+    """Blocking client for the daemon's line-delimited JSON protocol."""
+
+    def __init__(self, socket_path=DEFAULT_SOCKET, timeout=5.0):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(timeout)
+        self.sock.connect(socket_path)
+        self.reader = self.sock.makefile('rb')
+        self._ids = itertools.count(1)
+
+    def request(self, cmd, **params):
+        request_id = next(self._ids)
+        self.sock.sendall(json.dumps({'id': request_id, 'cmd': cmd, **params}).encode() + b'\n')
+        while True:
+            line = self.reader.readline()
+            if not line:
+                raise ConnectionError("daemon closed the connection")
+            response = json.loads(line)
+            if response.get('id') == request_id:
+                return response
+
+    def play(self, label=None, row=None, col=None, path=None):
+        params = {key: value for key, value in
+                  (('label', label), ('row', row), ('col', col), ('path', path)) if value is not None}
+        return self.request('play', **params)
+
+    def close(self):
+        self.reader.close()
+        self.sock.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Send a command to the pySoundBoard daemon.")
+    parser.add_argument('cmd', choices=('play', 'stop', 'stop_all', 'list', 'configs', 'switch_config', 'stats', 'metrics'))
+    parser.add_argument('--socket', default=DEFAULT_SOCKET)
+    parser.add_argument('--label')
+    parser.add_argument('--row', type=int)
+    parser.add_argument('--col', type=int)
+    parser.add_argument('--path')
+    parser.add_argument('--voice-id', type=int)
+    parser.add_argument('--name')
+    parser.add_argument('--config-id', type=int)
+    parser.add_argument('--format', choices=('json', 'prometheus'))
+    args = parser.parse_args(argv)
+
+    params = {key: value for key, value in (
+        ('label', args.label), ('row', args.row), ('col', args.col), ('path', args.path),
+        ('voice_id', args.voice_id), ('name', args.name), ('config_id', args.config_id), ('format', args.format),
+    ) if value is not None}
+    client = SoundboardClient(args.socket)
+    try:
+        response = client.request(args.cmd, **params)
+    finally:
+        client.close()
+    if 'text' in response:
+        print(response['text'], end='')
+    else:
+        print(json.dumps(response, indent=2))
+    return 0 if response.get('ok') else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,328 @@
+import json
+import threading
+import logging
+from soundboard_db import SoundboardDB
+from device_registry import device_registry
+from pipewire_graph import pipewire_graph, SOUNDBOARD_SINK, MIX_SINK
+from metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+
+class SoundboardCore:
+    """Everything needed to play a board, without any UI.
+
+    Owns the database, the audio engine and the preloader, and applies the
+    stored settings. The Qt window and the headless daemon each wrap one of
+    these. ``play`` may be called from any thread.
+    """
+
+    def __init__(self, db=None):
+        self.db = db or SoundboardDB()
+        self.native_mix = self.db.get_setting('mix_mode') == 'native'
+        # Loudness is analysed once per file version; stored gains are baked into the cache
+        self.normalize_loudness = self.db.get_setting('normalize_loudness') != '0'
+        self.loudness_target = None
+        self.analyses = self.db.get_clip_analyses()
+        if self.db.get_setting('metrics') == '1':
+            metrics.set_enabled(True)
+        # Extra outputs every clip is also played on: [{'device': name, 'gain': linear gain}]
+        self.monitor_outputs = json.loads(self.db.get_setting('monitor_outputs') or '[]')
+        self.output_gain = float(self.db.get_setting('output_gain') or 1.0)
+        # Set by setup_audio, along with the rest of the numpy-based audio stack
+        self.preloader = None
+        self._audio_lock = threading.Lock()
+        self.output_device = None
+        self.engine = None
+        self._engine_lock = threading.Lock()
+        self.config_id = None
+        self.config_name = None
+        self.cells = {}
+        metrics.register('engine', self.engine_metrics)
+
+    def setup_audio(self):
+        """Import the audio modules and apply the stored cache, sample store and loudness settings.
+
+        Importing numpy and soundfile takes longer than the rest of startup, so
+        the window runs this on its audio setup thread; anything that plays or
+        preloads calls it first. Later calls do nothing.
+        """
+        with self._audio_lock:
+            if self.preloader is not None:
+                return
+            from audio_cache import audio_cache
+            from resampler import QUALITY_SETTINGS
+            from preloader import AudioPreloader
+            from sample_store import sample_store
+            from loudness import DEFAULT_TARGET_LUFS
+            cache_mb = self.db.get_setting('audio_cache_mb')
+            if cache_mb:
+                audio_cache.set_max_bytes(int(cache_mb) * 1024 * 1024)
+            stream_threshold = self.db.get_setting('stream_threshold_seconds')
+            if stream_threshold:
+                audio_cache.stream_threshold_seconds = float(stream_threshold)
+            resample_quality = self.db.get_setting('resample_quality')
+            if resample_quality in QUALITY_SETTINGS:
+                audio_cache.set_quality(resample_quality)
+            store_dir = self.db.get_setting('sample_store_dir')
+            if store_dir:
+                sample_store.root = store_dir
+            self.loudness_target = float(self.db.get_setting('loudness_target') or DEFAULT_TARGET_LUFS)
+            self.preloader = AudioPreloader()
+        self.apply_clip_gains()
+
+    def setup_audio_graph(self):
+        pipewire_graph.native_mix = self.native_mix
+        with metrics.span('pipewire_setup'):
+            return pipewire_graph.ensure()
+
+    def set_native_mix(self, enabled):
+        self.native_mix = enabled
+        self.db.set_setting('mix_mode', 'native' if enabled else 'loopback')
+        self.close_engine()
+        pipewire_graph.set_native_mix(enabled)
+
+    def create_engine(self):
+        from audio_engine import AudioEngine, DEFAULT_BLOCKSIZE, DEFAULT_MAX_VOICES
+        from mic_mixer import MicMixEngine
+        blocksize = int(self.db.get_setting('blocksize') or DEFAULT_BLOCKSIZE)
+        max_voices = int(self.db.get_setting('max_voices') or DEFAULT_MAX_VOICES)
+        if self.native_mix:
+            # Write the mic + soundboard mix straight to the mix sink if PortAudio exposes it
+            mix_sink = device_registry.find_matching(MIX_SINK, kind='output')
+            if mix_sink:
+                device, info = mix_sink['index'], mix_sink
+            else:
+                device, info = self.output_device, device_registry.get(self.output_device)
+            mic = device_registry.default_input
+            return MicMixEngine(
+                device, info,
+                input_device=mic['index'] if mic else None,
+                input_info=mic,
+                blocksize=blocksize,
+                mic_gain=float(self.db.get_setting('mic_gain') or 1.0),
+                board_gain=float(self.db.get_setting('board_gain') or 1.0),
+                max_voices=max_voices
+            )
+        return AudioEngine(self.output_device, device_registry.get(self.output_device), blocksize, max_voices,
+                           self.output_gain)
+
+    def create_monitor(self, engine, output):
+        from monitor_output import MonitorEngine
+        dev = device_registry.find(output['device'])
+        if dev is None:
+            logger.warning(f"Monitor output {output['device']} is not connected")
+            return None
+        if dev['index'] == engine.device or dev['name'] == engine.device_name:
+            return None
+        return MonitorEngine(dev['index'], dev, engine, output.get('gain', 1.0), engine.blocksize, engine.max_voices)
+
+    def ensure_engine(self):
+        """The engine for the current device, created but not necessarily started."""
+        self.setup_audio()
+        with self._engine_lock:
+            if self.engine is None:
+                with metrics.span('device_query'):
+                    engine = self.create_engine()
+                    engine.monitors = [m for m in (self.create_monitor(engine, o) for o in self.monitor_outputs) if m]
+                    self.engine = engine
+            return self.engine
+
+    def get_engine(self):
+        engine = self.ensure_engine()
+        if engine.stream is None:
+            with metrics.span('stream_open'):
+                engine.start()
+        for monitor in engine.monitors:
+            if monitor.stream is None:
+                try:
+                    monitor.start()
+                except Exception as e:
+                    logger.warning(f"Could not open monitor output {monitor.device_name}: {e}")
+        return engine
+
+    def device_names(self):
+        """Names of the devices the engine and its monitors have open, the mic included."""
+        engine = self.engine
+        if engine is None:
+            return set()
+        names = {engine.device_name} | {monitor.device_name for monitor in engine.monitors}
+        if getattr(engine, 'input_name', None):
+            names.add(engine.input_name)
+        return names
+
+    def is_idle(self):
+        """True if nothing is playing or queued on the engine or its monitors."""
+        engine = self.engine
+        return engine is None or all(e.is_idle() for e in [engine] + engine.monitors)
+
+    def close_engine(self):
+        with self._engine_lock:
+            if self.engine is not None:
+                for monitor in self.engine.monitors:
+                    monitor.close()
+                self.engine.close()
+                self.engine = None
+
+    def select_default_output(self):
+        """Play to the soundboard's virtual sink when it exists, else the system default."""
+        sink = device_registry.find_matching(SOUNDBOARD_SINK, kind='output')
+        self.output_device = sink['index'] if sink else None
+        return self.output_device
+
+    def set_output_device(self, device):
+        self.output_device = device
+        self.db.set_setting('audio_device', device)
+        self.close_engine()
+
+    def set_monitor_outputs(self, outputs):
+        """Play every clip on these outputs too; unchanged devices keep playing, only their gain is updated."""
+        self.monitor_outputs = [dict(output) for output in outputs]
+        self.db.set_setting('monitor_outputs', json.dumps(self.monitor_outputs))
+        with self._engine_lock:
+            engine = self.engine
+            if engine is None:
+                return
+            current = {monitor.device_name: monitor for monitor in engine.monitors}
+            monitors = []
+            for output in self.monitor_outputs:
+                monitor = current.pop(output['device'], None)
+                if monitor is not None:
+                    monitor.gain = output.get('gain', 1.0)
+                else:
+                    monitor = self.create_monitor(engine, output)
+                if monitor is not None:
+                    monitors.append(monitor)
+            engine.monitors = monitors
+        for monitor in current.values():
+            monitor.close()
+
+    def set_output_gain(self, gain):
+        self.output_gain = gain
+        self.db.set_setting('output_gain', gain)
+        engine = self.engine
+        if engine is None:
+            return
+        from mic_mixer import MicMixEngine
+        if not isinstance(engine, MicMixEngine):
+            engine.gain = gain
+
+    def play(self, audio_path, trigger_time=None, dsp=None, mode=None, key=None):
+        """Start a clip and return its voice id; raises if it cannot be played.
+
+        key identifies the button (its cell) for the retrigger mode in mode.
+        """
+        from playback import start_clip
+        record = metrics.begin_play(audio_path, trigger_time)
+        try:
+            engine = self.get_engine()
+            voice_id = start_clip(engine, audio_path, trigger_time, dsp, mode, key)
+        finally:
+            metrics.end_play(record)
+        self.preloader.record_play(audio_path)
+        return voice_id
+
+    def stop(self, voice_id):
+        if self.engine is not None:
+            self.engine.stop(voice_id)
+
+    def stop_all(self):
+        if self.engine is not None:
+            self.engine.stop_all()
+
+    def preload(self, cells):
+        """Warm the cache for a {(row, col): (label, audio_path, dsp, mode)} map."""
+        try:
+            engine = self.ensure_engine()
+        except Exception as e:
+            logger.warning(f"Skipping preload, could not query output device: {e}")
+            return
+        clips = [(state[1], row, col, state[2]) for (row, col), state in cells.items()]
+        self.preloader.preload(clips, engine.samplerate, engine.channels)
+        # Monitors on the engine's format share its cached arrays; others need their own copy
+        formats = {(m.samplerate, m.channels) for m in engine.monitors} - {(engine.samplerate, engine.channels)}
+        for samplerate, channels in formats:
+            self.preloader.preload(clips, samplerate, channels, cancel=False)
+
+    def set_metrics_enabled(self, enabled):
+        metrics.set_enabled(enabled)
+        self.db.set_setting('metrics', '1' if enabled else '0')
+
+    def engine_metrics(self):
+        engine = self.engine
+        if engine is None or engine.stream is None:
+            return None
+        stats = {**engine.stats(), 'callback_time': engine.callback_times, 'first_buffer': engine.first_buffer_times}
+        for i, monitor in enumerate(engine.monitors):
+            if monitor.stream is not None:
+                stats.update({f'monitor{i}_drift_ppm': (monitor.drift_step - 1.0) * 1e6,
+                              f'monitor{i}_underruns': monitor.underruns,
+                              f'monitor{i}_callback_time': monitor.callback_times})
+        return stats
+
+    def apply_clip_gains(self):
+        if self.preloader is None:
+            # setup_audio applies them
+            return
+        from audio_cache import audio_cache
+        from loudness import clip_gain
+        if not self.normalize_loudness:
+            audio_cache.clear_gains()
+            return
+        for path, analysis in self.analyses.items():
+            audio_cache.set_gain(path, analysis['mtime'], clip_gain(analysis, self.loudness_target))
+
+    def record_analysis(self, path, analysis):
+        self.analyses[path] = analysis
+        self.db.save_clip_analyses({path: analysis})
+        if self.normalize_loudness and self.preloader is not None:
+            from audio_cache import audio_cache
+            from loudness import clip_gain
+            audio_cache.set_gain(path, analysis['mtime'], clip_gain(analysis, self.loudness_target))
+
+    def set_normalize_loudness(self, enabled):
+        self.normalize_loudness = enabled
+        self.db.set_setting('normalize_loudness', '1' if enabled else '0')
+        self.apply_clip_gains()
+
+    def configs(self):
+        return self.db.get_all_configs()
+
+    def find_config(self, name=None, config_id=None):
+        for cid, cname in self.db.get_all_configs():
+            if cid == config_id or (name is not None and cname == name):
+                return cid
+        return None
+
+    def load_config(self, config_id):
+        """Make a saved config current; returns its dict or None if it does not exist."""
+        config = self.db.get_config(config_id)
+        if not config:
+            return None
+        self.config_id = config_id
+        self.config_name = config['name']
+        self.cells = {
+            (row, col): (label, audio_path, dsp, mode)
+            for (label, audio_path, row, col, dsp, mode) in self.db.get_config_buttons(config_id)
+        }
+        self.db.set_last_used_config(config_id)
+        self.preload(self.cells)
+        return config
+
+    def load_last_used_config(self):
+        config = self.db.get_last_used_config()
+        return self.load_config(config[0]) if config else None
+
+    def find_cell(self, label=None, row=None, col=None):
+        if row is not None and col is not None:
+            return (row, col) if (row, col) in self.cells else None
+        for cell, state in self.cells.items():
+            if state[0] == label:
+                return cell
+        return None
+
+    def close(self):
+        if self.preloader is not None:
+            self.preloader.shutdown()
+        self.close_engine()
+        self.db.flush()
@@ -0,0 +1,256 @@
+"""Headless pySoundBoard: plays boards from the database, driven over a Unix socket.
+
+Protocol: one JSON object per line in each direction. Requests carry a
+"cmd" and an optional "id" that is echoed back in the response:
+    {"id": 1, "cmd": "play", "label": "Airhorn"}   -> {"id": 1, "ok": true, "voice_id": 7}
+Commands: play (label | row+col | path), stop (voice_id), stop_all, list,
+configs, switch_config (name | config_id), stats, metrics (format: json |
+prometheus).
+"""
+import os
+import sys
+import json
+import time
+import signal
+import asyncio
+import logging
+import argparse
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SOCKET = os.path.join(os.environ.get('XDG_RUNTIME_DIR') or tempfile.gettempdir(), 'pysoundboard.sock')
+# Decoding a clip that is not cached yet must not stall other requests
+PLAY_WORKERS = 4
+MAX_LINE_BYTES = 64 * 1024
+
+
+class ApiError(Exception):
+    pass
+
+
+class SoundboardDaemon:
+    def __init__(self, core, socket_path=DEFAULT_SOCKET, workers=PLAY_WORKERS):
+        self.core = core
+        self.socket_path = socket_path
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='play')
+        self.server = None
+        self.clients = 0
+        self.requests = 0
+        self.errors = 0
+        self.commands = {
+            'play': self.cmd_play,
+            'stop': self.cmd_stop,
+            'stop_all': self.cmd_stop_all,
+            'list': self.cmd_list,
+            'configs': self.cmd_configs,
+            'switch_config': self.cmd_switch_config,
+            'stats': self.cmd_stats,
+            'metrics': self.cmd_metrics,
+        }
+        metrics.register('daemon', self.stats)
+
+    async def start(self):
+        if os.path.exists(self.socket_path):
+            # A stale socket from a crashed run; a live daemon would still accept connections
+            try:
+                _, writer = await asyncio.open_unix_connection(self.socket_path)
+                writer.close()
+                raise RuntimeError(f"Another daemon is already listening on {self.socket_path}")
+            except (ConnectionRefusedError, FileNotFoundError):
+                os.unlink(self.socket_path)
+        self.server = await asyncio.start_unix_server(self._serve_client, path=self.socket_path, limit=MAX_LINE_BYTES)
+        os.chmod(self.socket_path, 0o600)
+        logger.info(f"Listening on {self.socket_path}")
+
+    async def close(self):
+        if self.server is not None:
+            self.server.close()
+            await self.server.wait_closed()
+            self.server = None
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+    async def _serve_client(self, reader, writer):
+        self.clients += 1
+        pending = set()
+        try:
+            while True:
+                try:
+                    line = await reader.readline()
+                except ValueError:
+                    await self._send(writer, {'ok': False, 'error': 'request too long'})
+                    break
+                if not line:
+                    break
+                # Requests run concurrently; responses are matched up by id
+                task = asyncio.ensure_future(self._respond(line, writer))
+                pending.add(task)
+                task.add_done_callback(pending.discard)
+            if pending:
+                await asyncio.gather(*pending, return_exceptions=True)
+        except ConnectionResetError:
+            pass
+        finally:
+            self.clients -= 1
+            writer.close()
+
+    async def _respond(self, line, writer):
+        response = await self.handle_line(line)
+        await self._send(writer, response)
+
+    async def _send(self, writer, response):
+        writer.write(json.dumps(response).encode() + b'\n')
+        try:
+            await writer.drain()
+        except ConnectionError:
+            pass
+
+    async def handle_line(self, line):
+        request_id = None
+        self.requests += 1
+        try:
+            request = json.loads(line)
+            if not isinstance(request, dict):
+                raise ApiError("request must be a JSON object")
+            request_id = request.get('id')
+            command = self.commands.get(request.get('cmd'))
+            if command is None:
+                raise ApiError(f"unknown command {request.get('cmd')!r}")
+            result = await command(request)
+            response = {'ok': True, **result}
+        except (ApiError, ValueError) as e:
+            self.errors += 1
+            response = {'ok': False, 'error': str(e)}
+        except Exception as e:
+            self.errors += 1
+            logger.error(f"Request failed: {line!r}: {e}")
+            response = {'ok': False, 'error': str(e)}
+        if request_id is not None:
+            response['id'] = request_id
+        return response
+
+    def _resolve_path(self, request):
+        """(audio_path, dsp, mode, cell) to play; a bare path plays unprocessed."""
+        if request.get('path'):
+            return request['path'], None, None, None
+        cell = self.core.find_cell(request.get('label'), request.get('row'), request.get('col'))
+        if cell is None:
+            raise ApiError("no such button on the current board")
+        label, audio_path, dsp, mode = self.core.cells[cell]
+        if not audio_path:
+            raise ApiError("no audio file assigned to this button")
+        return audio_path, dsp, mode, cell
+
+    async def cmd_play(self, request):
+        audio_path, dsp, mode, cell = self._resolve_path(request)
+        received = time.perf_counter()
+        loop = asyncio.get_running_loop()
+        voice_id = await loop.run_in_executor(self.executor, self.core.play, audio_path, received, dsp, mode, cell)
+        return {'voice_id': voice_id}
+
+    async def cmd_stop(self, request):
+        if 'voice_id' not in request:
+            raise ApiError("stop needs a voice_id")
+        self.core.stop(int(request['voice_id']))
+        return {}
+
+    async def cmd_stop_all(self, request):
+        self.core.stop_all()
+        return {}
+
+    async def cmd_list(self, request):
+        return {
+            'config_id': self.core.config_id,
+            'config': self.core.config_name,
+            'buttons': [
+                {'row': row, 'col': col, 'label': label, 'audio_path': audio_path,
+                 'dsp': dsp._asdict() if dsp else None, 'mode': mode._asdict() if mode else None}
+                for (row, col), (label, audio_path, dsp, mode) in sorted(self.core.cells.items())
+            ],
+        }
+
+    async def cmd_configs(self, request):
+        return {'configs': [{'id': cid, 'name': name} for cid, name in self.core.configs()]}
+
+    async def cmd_switch_config(self, request):
+        config_id = self.core.find_config(request.get('name'), request.get('config_id'))
+        if config_id is None or not self.core.load_config(config_id):
+            raise ApiError("no such configuration")
+        return await self.cmd_list(request)
+
+    def stats(self):
+        return {'clients': self.clients, 'requests': self.requests, 'errors': self.errors}
+
+    async def cmd_stats(self, request):
+        engine = self.core.engine
+        return {
+            'daemon': self.stats(),
+            'engine': engine.stats() if engine is not None and engine.stream is not None else None,
+        }
+
+    async def cmd_metrics(self, request):
+        if request.get('format') == 'prometheus':
+            return {'text': metrics.to_prometheus()}
+        return {'metrics': metrics.snapshot()}
+
+
+async def serve(daemon):
+    await daemon.start()
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
+    try:
+        await stop.wait()
+    finally:
+        await daemon.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run pySoundBoard without a window, controlled over a Unix socket.")
+    parser.add_argument('--socket', default=DEFAULT_SOCKET)
+    parser.add_argument('--config', help="Name of the configuration to load instead of the last used one")
+    parser.add_argument('--no-pipewire', action='store_true', help="Do not create or remove the PipeWire virtual devices")
+    parser.add_argument('--metrics', action='store_true', help="Collect playback timing metrics (see the metrics command)")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(
+        filename='daemon.log',
+        filemode='a',
+        format='%(asctime)s %(levelname)s: %(message)s',
+        level=logging.INFO
+    )
+    from soundboard_core import SoundboardCore
+    from pipewire_graph import pipewire_graph
+    core = SoundboardCore()
+    if args.metrics:
+        metrics.set_enabled(True)
+    if not args.no_pipewire:
+        try:
+            core.setup_audio_graph()
+        except Exception as e:
+            logger.warning(f"Could not set up PipeWire virtual source: {e}")
+    core.select_default_output()
+    config_id = core.find_config(args.config) if args.config else None
+    if config_id is not None:
+        core.load_config(config_id)
+    else:
+        core.load_last_used_config()
+    print(f"pySoundBoard daemon listening on {args.socket} (board: {core.config_name})", file=sys.stderr)
+    try:
+        asyncio.run(serve(SoundboardDaemon(core, args.socket)))
+    finally:
+        core.close()
+        if not args.no_pipewire:
+            try:
+                pipewire_graph.cleanup()
+            except Exception as e:
+                logger.warning(f"Could not clean up PipeWire virtual source: {e}")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,45 +1,207 @@
+import re
 import sqlite3
 import os
+from dsp_params import DSP_FIELDS, DEFAULT_DSP, dsp_or_none
+from play_mode import PLAY_MODE_FIELDS, DEFAULT_PLAY_MODE, play_mode_or_none
 
 DB_PATH = os.path.join(os.path.dirname(__file__), 'soundboard.db')
 
+
+def _migrate_v1(cur):
+    cur.execute('''CREATE TABLE IF NOT EXISTS configurations (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        name TEXT UNIQUE NOT NULL,
+        last_used INTEGER DEFAULT 0
+    )''')
+    cur.execute('''CREATE TABLE IF NOT EXISTS buttons (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        config_id INTEGER,
+        label TEXT,
+        audio_path TEXT,
+        row INTEGER,
+        col INTEGER,
+        FOREIGN KEY(config_id) REFERENCES configurations(id)
+    )''')
+    cur.execute('''CREATE TABLE IF NOT EXISTS settings (
+        key TEXT PRIMARY KEY,
+        value TEXT
+    )''')
+
+
+def _migrate_v2(cur):
+    # Older databases could hold several buttons for one cell; keep the newest
+    cur.execute('''DELETE FROM buttons WHERE id NOT IN (
+        SELECT MAX(id) FROM buttons GROUP BY config_id, row, col
+    )''')
+    cur.execute('CREATE UNIQUE INDEX IF NOT EXISTS idx_buttons_position ON buttons(config_id, row, col)')
+    cur.execute('CREATE INDEX IF NOT EXISTS idx_configurations_last_used ON configurations(last_used)')
+    cur.execute('ALTER TABLE configurations ADD COLUMN rows INTEGER DEFAULT 3')
+    cur.execute('ALTER TABLE configurations ADD COLUMN cols INTEGER DEFAULT 3')
+
+
+def _migrate_v3(cur):
+    # One row per file; an analysis only counts while mtime matches the file on disk
+    cur.execute('''CREATE TABLE IF NOT EXISTS clip_analysis (
+        path TEXT PRIMARY KEY,
+        mtime REAL NOT NULL,
+        loudness REAL,
+        true_peak REAL,
+        duration REAL
+    )''')
+
+
+def _migrate_v4(cur):
+    # kind is 'key' or 'midi'; code is the key name or 'ch<channel>:<note>'
+    cur.execute('''CREATE TABLE IF NOT EXISTS triggers (
+        config_id INTEGER NOT NULL,
+        kind TEXT NOT NULL,
+        code TEXT NOT NULL,
+        row INTEGER NOT NULL,
+        col INTEGER NOT NULL,
+        PRIMARY KEY (config_id, kind, code),
+        FOREIGN KEY(config_id) REFERENCES configurations(id)
+    )''')
+
+
+def _migrate_v5(cur):
+    cur.execute('''CREATE TABLE IF NOT EXISTS library_folders (
+        path TEXT PRIMARY KEY
+    )''')
+    # format is NULL for files libsndfile could not open, so they are not probed again until they change
+    cur.execute('''CREATE TABLE IF NOT EXISTS library_files (
+        id INTEGER PRIMARY KEY,
+        path TEXT UNIQUE NOT NULL,
+        name TEXT NOT NULL,
+        format TEXT,
+        duration REAL,
+        samplerate INTEGER,
+        channels INTEGER,
+        size INTEGER,
+        mtime REAL
+    )''')
+    cur.execute('CREATE INDEX IF NOT EXISTS idx_library_files_name ON library_files(name)')
+    try:
+        # External-content FTS index over the file name and path, kept in sync by triggers;
+        # the prefix indexes make search-as-you-type queries cheap
+        cur.execute('''CREATE VIRTUAL TABLE IF NOT EXISTS library_fts USING fts5(
+            name, path, content='library_files', content_rowid='id', prefix='2 3'
+        )''')
+    except sqlite3.OperationalError:
+        # SQLite built without FTS5: search falls back to LIKE
+        return
+    cur.execute('''CREATE TRIGGER IF NOT EXISTS library_files_ai AFTER INSERT ON library_files BEGIN
+        INSERT INTO library_fts (rowid, name, path) VALUES (new.id, new.name, new.path);
+    END''')
+    cur.execute('''CREATE TRIGGER IF NOT EXISTS library_files_ad AFTER DELETE ON library_files BEGIN
+        INSERT INTO library_fts (library_fts, rowid, name, path) VALUES ('delete', old.id, old.name, old.path);
+    END''')
+    cur.execute('''CREATE TRIGGER IF NOT EXISTS library_files_au AFTER UPDATE OF name, path ON library_files BEGIN
+        INSERT INTO library_fts (library_fts, rowid, name, path) VALUES ('delete', old.id, old.name, old.path);
+        INSERT INTO library_fts (rowid, name, path) VALUES (new.id, new.name, new.path);
+    END''')
+
+
+def _migrate_v6(cur):
+    # Per-button DSP; the defaults leave the clip untouched
+    for column in ('trim_start REAL DEFAULT 0', 'trim_end REAL', 'fade_in REAL DEFAULT 0', 'fade_out REAL DEFAULT 0',
+                   'gain_db REAL DEFAULT 0', 'speed REAL DEFAULT 1', 'pitch REAL DEFAULT 0'):
+        cur.execute(f'ALTER TABLE buttons ADD COLUMN {column}')
+
+
+def _migrate_v7(cur):
+    # Per-button play mode; the defaults overlap plays and start them straight away.
+    # has_settings flags the few buttons with DSP or play mode settings, so loads skip the rest cheaply
+    for column in ("retrigger TEXT DEFAULT 'overlap'", 'choke_group INTEGER DEFAULT 0', 'loop INTEGER DEFAULT 0',
+                   'queue INTEGER DEFAULT 0', 'has_settings INTEGER DEFAULT 0'):
+        cur.execute(f'ALTER TABLE buttons ADD COLUMN {column}')
+    cur.execute('UPDATE buttons SET has_settings=1 WHERE NOT (trim_start = 0 AND trim_end IS NULL AND fade_in = 0 '
+                'AND fade_out = 0 AND gain_db = 0 AND speed = 1 AND pitch = 0)')
+
+
+# Index i upgrades a database from schema version i to i + 1
+MIGRATIONS = [_migrate_v1, _migrate_v2, _migrate_v3, _migrate_v4, _migrate_v5, _migrate_v6, _migrate_v7]
+BUTTON_COLUMNS = ('config_id', 'label', 'audio_path', 'row', 'col') + DSP_FIELDS + PLAY_MODE_FIELDS + ('has_settings',)
+LIBRARY_COLUMNS = ('path', 'name', 'format', 'duration', 'samplerate', 'channels', 'size', 'mtime')
+
+
+def _button_row(config_id, btn):
+    dsp, mode = btn.get('dsp'), btn.get('mode')
+    return ((config_id, btn['label'], btn['audio_path'], btn['row'], btn['col'])
+            + tuple(dsp or DEFAULT_DSP) + tuple(mode or DEFAULT_PLAY_MODE) + (int(bool(dsp or mode)),))
+
+
+def fts_query(text):
+    """Turn typed text into an FTS5 query matching every word as a prefix."""
+    return ' '.join(f'"{word}"*' for word in re.findall(r'\w+', text))
+
+
+def _tree_bounds(root):
+    # Every path below root sorts between root + '/' and root + '0' ('0' follows '/')
+    root = root.rstrip(os.sep)
+    return root + os.sep, root + chr(ord(os.sep) + 1)
+
+
 class SoundboardDB:
-    def __init__(self):
-        self.conn = sqlite3.connect(DB_PATH)
+    def __init__(self, path=DB_PATH):
+        self.path = path
+        self.conn = sqlite3.connect(path)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
         self.create_tables()
+        self._settings = dict(self.conn.execute('SELECT key, value FROM settings'))
+        self._pending_settings = {}
+        self.has_fts = self.conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type='table' AND name='library_fts'").fetchone() is not None
 
     def create_tables(self):
-        cur = self.conn.cursor()
-        cur.execute('''CREATE TABLE IF NOT EXISTS configurations (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            name TEXT UNIQUE NOT NULL,
-            last_used INTEGER DEFAULT 0
-        )''')
-        cur.execute('''CREATE TABLE IF NOT EXISTS buttons (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            config_id INTEGER,
-            label TEXT,
-            audio_path TEXT,
-            row INTEGER,
-            col INTEGER,
-            FOREIGN KEY(config_id) REFERENCES configurations(id)
-        )''')
-        cur.execute('''CREATE TABLE IF NOT EXISTS settings (
-            key TEXT PRIMARY KEY,
-            value TEXT
-        )''')
-        self.conn.commit()
+        version = self.conn.execute('PRAGMA user_version').fetchone()[0]
+        if version >= len(MIGRATIONS):
+            return
+        # sqlite3 only opens transactions before DML, so each ALTER or CREATE would commit on its
+        # own; an explicit one keeps an interrupted migration from being left half applied
+        self.conn.isolation_level = None
+        try:
+            for target, migrate in enumerate(MIGRATIONS[version:], start=version + 1):
+                cur = self.conn.cursor()
+                cur.execute('BEGIN')
+                try:
+                    migrate(cur)
+                    cur.execute(f'PRAGMA user_version={target}')
+                except BaseException:
+                    cur.execute('ROLLBACK')
+                    raise
+                cur.execute('COMMIT')
+        finally:
+            self.conn.isolation_level = ''
+
+    def schema_version(self):
+        return self.conn.execute('PRAGMA user_version').fetchone()[0]
 
     def get_setting(self, key):
-        cur = self.conn.cursor()
-        cur.execute('SELECT value FROM settings WHERE key=?', (key,))
-        row = cur.fetchone()
-        return row[0] if row else None
+        return self._settings.get(key)
 
     def set_setting(self, key, value):
-        cur = self.conn.cursor()
-        cur.execute('INSERT OR REPLACE INTO settings (key, value) VALUES (?, ?)', (key, str(value)))
-        self.conn.commit()
+        # Settings are cached and written on the next flush or transaction
+        value = str(value)
+        if self._settings.get(key) == value:
+            return
+        self._settings[key] = value
+        self._pending_settings[key] = value
+
+    def _write_pending_settings(self, cur):
+        if self._pending_settings:
+            cur.executemany('INSERT OR REPLACE INTO settings (key, value) VALUES (?, ?)',
+                            list(self._pending_settings.items()))
+            self._pending_settings.clear()
+
+    def flush(self):
+        if self._pending_settings:
+            with self.conn:
+                self._write_pending_settings(self.conn.cursor())
+
+    def close(self):
+        self.flush()
+        self.conn.close()
 
     def get_last_used_config(self):
         cur = self.conn.cursor()
@@ -47,29 +209,160 @@ class SoundboardDB:
         return cur.fetchone()
 
     def set_last_used_config(self, config_id):
+        with self.conn:
+            cur = self.conn.cursor()
+            cur.execute('UPDATE configurations SET last_used=0 WHERE last_used=1 AND id<>?', (config_id,))
+            cur.execute('UPDATE configurations SET last_used=1 WHERE id=? AND last_used<>1', (config_id,))
+            self._write_pending_settings(cur)
+
+    def get_config(self, config_id):
         cur = self.conn.cursor()
-        cur.execute('UPDATE configurations SET last_used=0')
-        cur.execute('UPDATE configurations SET last_used=1 WHERE id=?', (config_id,))
-        self.conn.commit()
+        cur.execute('SELECT id, name, rows, cols FROM configurations WHERE id=?', (config_id,))
+        row = cur.fetchone()
+        if not row:
+            return None
+        return {'id': row[0], 'name': row[1], 'rows': row[2], 'cols': row[3]}
 
     def get_config_buttons(self, config_id):
+        """(label, audio_path, row, col, dsp, mode) per button; dsp and mode are DspParams and PlayMode, or None."""
         cur = self.conn.cursor()
-        cur.execute('SELECT label, audio_path, row, col FROM buttons WHERE config_id=?', (config_id,))
-        return cur.fetchall()
+        # Few buttons have settings, so those columns are only read for the ones that do
+        cur.execute(f'SELECT row, col, {", ".join(DSP_FIELDS + PLAY_MODE_FIELDS)} FROM buttons '
+                    'WHERE config_id=? AND has_settings=1', (config_id,))
+        split = 2 + len(DSP_FIELDS)
+        settings = {(row[0], row[1]): (dsp_or_none(row[2:split]), play_mode_or_none(row[split:])) for row in cur}
+        cur.execute('SELECT label, audio_path, row, col FROM buttons WHERE config_id=? ORDER BY row, col', (config_id,))
+        if not settings:
+            return [row + (None, None) for row in cur]
+        return [row + settings.get((row[2], row[3]), (None, None)) for row in cur]
 
     def save_config(self, name, buttons, rows, cols):
-        cur = self.conn.cursor()
-        cur.execute('INSERT OR IGNORE INTO configurations (name) VALUES (?)', (name,))
-        cur.execute('SELECT id FROM configurations WHERE name=?', (name,))
-        config_id = cur.fetchone()[0]
-        cur.execute('DELETE FROM buttons WHERE config_id=?', (config_id,))
-        for btn in buttons:
-            cur.execute('INSERT INTO buttons (config_id, label, audio_path, row, col) VALUES (?, ?, ?, ?, ?)',
-                        (config_id, btn['label'], btn['audio_path'], btn['row'], btn['col']))
-        self.conn.commit()
+        with self.conn:
+            cur = self.conn.cursor()
+            cur.execute('INSERT OR IGNORE INTO configurations (name) VALUES (?)', (name,))
+            cur.execute('SELECT id FROM configurations WHERE name=?', (name,))
+            config_id = cur.fetchone()[0]
+            cur.execute('UPDATE configurations SET rows=?, cols=? WHERE id=?', (rows, cols, config_id))
+            cur.execute('DELETE FROM buttons WHERE config_id=?', (config_id,))
+            # Buttons without DSP or play mode settings leave those columns to their defaults
+            plain = [btn for btn in buttons if not btn.get('dsp') and not btn.get('mode')]
+            cur.executemany(
+                'INSERT OR REPLACE INTO buttons (config_id, label, audio_path, row, col) VALUES (?, ?, ?, ?, ?)',
+                [(config_id, btn['label'], btn['audio_path'], btn['row'], btn['col']) for btn in plain]
+            )
+            cur.executemany(
+                f'INSERT OR REPLACE INTO buttons ({", ".join(BUTTON_COLUMNS)}) VALUES ({", ".join("?" * len(BUTTON_COLUMNS))})',
+                [_button_row(config_id, btn) for btn in buttons if btn.get('dsp') or btn.get('mode')]
+            )
+            self._write_pending_settings(cur)
         return config_id
 
+    def save_config_changes(self, config_id, upserts, deletes, rows, cols):
+        """Write only the given cells of an existing config."""
+        with self.conn:
+            cur = self.conn.cursor()
+            cur.execute('UPDATE configurations SET rows=?, cols=? WHERE id=?', (rows, cols, config_id))
+            cur.executemany('DELETE FROM buttons WHERE config_id=? AND row=? AND col=?',
+                            [(config_id, row, col) for (row, col) in deletes])
+            cur.executemany(
+                f'''INSERT INTO buttons ({", ".join(BUTTON_COLUMNS)}) VALUES ({", ".join("?" * len(BUTTON_COLUMNS))})
+                    ON CONFLICT(config_id, row, col) DO UPDATE SET
+                    {", ".join(f"{c}=excluded.{c}" for c in BUTTON_COLUMNS[1:] if c not in ('row', 'col'))}''',
+                [_button_row(config_id, btn) for btn in upserts]
+            )
+            self._write_pending_settings(cur)
+
+    def get_clip_analyses(self):
+        cur = self.conn.cursor()
+        cur.execute('SELECT path, mtime, loudness, true_peak, duration FROM clip_analysis')
+        return {
+            row[0]: {'mtime': row[1], 'loudness': row[2], 'true_peak': row[3], 'duration': row[4]}
+            for row in cur.fetchall()
+        }
+
+    def save_clip_analyses(self, analyses):
+        """Store {path: analysis} results, replacing older versions of the same files."""
+        with self.conn:
+            self.conn.executemany(
+                'INSERT OR REPLACE INTO clip_analysis (path, mtime, loudness, true_peak, duration) VALUES (?, ?, ?, ?, ?)',
+                [(path, a['mtime'], a['loudness'], a['true_peak'], a['duration']) for path, a in analyses.items()]
+            )
+
+    def get_triggers(self, config_id):
+        cur = self.conn.cursor()
+        cur.execute('SELECT kind, code, row, col FROM triggers WHERE config_id=?', (config_id,))
+        return cur.fetchall()
+
+    def set_trigger(self, config_id, kind, code, row, col):
+        with self.conn:
+            self.conn.execute('INSERT OR REPLACE INTO triggers (config_id, kind, code, row, col) VALUES (?, ?, ?, ?, ?)',
+                              (config_id, kind, code, row, col))
+
+    def delete_triggers(self, config_id, row, col):
+        with self.conn:
+            self.conn.execute('DELETE FROM triggers WHERE config_id=? AND row=? AND col=?', (config_id, row, col))
+
     def get_all_configs(self):
         cur = self.conn.cursor()
         cur.execute('SELECT id, name FROM configurations')
         return cur.fetchall()
+
+    def get_library_folders(self):
+        return [row[0] for row in self.conn.execute('SELECT path FROM library_folders ORDER BY path')]
+
+    def add_library_folder(self, path):
+        with self.conn:
+            self.conn.execute('INSERT OR IGNORE INTO library_folders (path) VALUES (?)', (path,))
+
+    def remove_library_folder(self, path):
+        with self.conn:
+            self.conn.execute('DELETE FROM library_folders WHERE path=?', (path,))
+            self.conn.execute('DELETE FROM library_files WHERE path > ? AND path < ?', _tree_bounds(path))
+
+    def get_library_files(self, root):
+        """{path: (mtime, size)} for every indexed file below root."""
+        cur = self.conn.execute('SELECT path, mtime, size FROM library_files WHERE path > ? AND path < ?',
+                                _tree_bounds(root))
+        return {row[0]: (row[1], row[2]) for row in cur}
+
+    def save_library_files(self, entries):
+        with self.conn:
+            self.conn.executemany(
+                f'''INSERT INTO library_files ({', '.join(LIBRARY_COLUMNS)}) VALUES ({', '.join('?' * len(LIBRARY_COLUMNS))})
+                   ON CONFLICT(path) DO UPDATE SET {', '.join(f'{c}=excluded.{c}' for c in LIBRARY_COLUMNS[1:])}''',
+                [tuple(entry[c] for c in LIBRARY_COLUMNS) for entry in entries]
+            )
+
+    def delete_library_files(self, paths):
+        with self.conn:
+            self.conn.executemany('DELETE FROM library_files WHERE path=?', [(path,) for path in paths])
+
+    def library_file_count(self):
+        return self.conn.execute('SELECT COUNT(*) FROM library_files WHERE format IS NOT NULL').fetchone()[0]
+
+    def search_library(self, text, limit=200):
+        """Playable files where every typed word starts a word of the name or path.
+
+        Files matching on their name come first. Results are not ranked by
+        relevance: scoring every match of a one-letter prefix over a large
+        library takes far longer than the unordered LIMIT queries.
+        """
+        columns = ', '.join(f'f.{c}' for c in LIBRARY_COLUMNS)
+        query = fts_query(text)
+        if not query:
+            rows = self.conn.execute(f'SELECT {columns} FROM library_files f WHERE f.format IS NOT NULL '
+                                     'ORDER BY f.name LIMIT ?', (limit,)).fetchall()
+        elif self.has_fts:
+            sql = (f'SELECT {columns} FROM library_fts JOIN library_files f ON f.id = library_fts.rowid '
+                   'WHERE library_fts MATCH ? AND f.format IS NOT NULL LIMIT ?')
+            rows = self.conn.execute(sql, (f'name : ({query})', limit)).fetchall()
+            if len(rows) < limit:
+                seen = {row[0] for row in rows}
+                rows += [row for row in self.conn.execute(sql, (query, limit)) if row[0] not in seen][:limit - len(rows)]
+        else:
+            words = re.findall(r'\w+', text)
+            rows = self.conn.execute(
+                f"SELECT {columns} FROM library_files f WHERE f.format IS NOT NULL AND "
+                + ' AND '.join('f.path LIKE ?' for _ in words) + ' ORDER BY f.name LIMIT ?',
+                [f'%{word}%' for word in words] + [limit]).fetchall()
+        return [dict(zip(LIBRARY_COLUMNS, row)) for row in rows]
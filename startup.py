@@ -0,0 +1,28 @@
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class StartupTimer:
+    """Logs how long each startup phase took, to track time-to-interactive."""
+
+    def __init__(self, start=None):
+        self.start = start or time.perf_counter()
+        self.last = self.start
+        self.phases = []
+
+    def mark(self, phase):
+        now = time.perf_counter()
+        self.phases.append((phase, now - self.last))
+        logger.info(f"Startup: {phase} took {(now - self.last) * 1000:.0f} ms, "
+                    f"{(now - self.start) * 1000:.0f} ms since launch")
+        self.last = now
+
+    def elapsed(self):
+        return self.last - self.start
+
+    def stats(self):
+        stats = {f'{phase}_ms': seconds * 1000 for phase, seconds in self.phases}
+        stats['total_ms'] = self.elapsed() * 1000
+        return stats
@@ -0,0 +1,10 @@
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, 'benchmarks'))
+
+# The app modules import sounddevice at load time; never open real audio hardware in tests
+from fakes import install_fake_sounddevice
+install_fake_sounddevice()
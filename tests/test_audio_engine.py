@@ -0,0 +1,91 @@
+import sys
+import time
+import threading
+import numpy as np
+from fakes import FAKE_DEVICES, FakeOutputStream
+from audio_engine import AudioEngine, BufferVoice
+from play_mode import PlayMode
+
+BLOCK = 256
+
+
+def make_engine(max_voices=8):
+    engine = AudioEngine(0, dict(FAKE_DEVICES[0], index=0), blocksize=BLOCK, max_voices=max_voices)
+    engine.start()
+    return engine
+
+
+def voice(engine, frames, key, mode=None, start_frame=None):
+    voice = BufferVoice(np.full((frames, 2), 0.01, dtype=np.float32), engine.next_voice_id())
+    voice.key = key
+    voice.mode = mode
+    voice.start_frame = start_frame
+    engine.play_voice(voice)
+    return voice
+
+
+def test_queued_voice_starts_when_lane_voice_is_stopped():
+    engine = make_engine()
+    a = voice(engine, BLOCK * 100, 'a', PlayMode(queue=True))
+    b = voice(engine, BLOCK, 'b', PlayMode(queue=True))
+    engine.stream.pump(2)
+    assert a.started_frame == 0 and b.started_frame is None
+    engine.stop(a.voice_id)
+    engine.stream.pump()
+    assert b.started_frame == 2 * BLOCK
+
+
+def test_queued_voice_starts_when_lane_voice_is_stolen():
+    engine = make_engine(max_voices=2)
+    a = voice(engine, BLOCK * 100, 'a', PlayMode(queue=True))
+    b = voice(engine, BLOCK * 100, 'b', PlayMode(queue=True))
+    x = voice(engine, BLOCK * 100, 'x')
+    engine.stream.pump()
+    assert b.started_frame is None
+    # c steals the lane voice; b takes over the lane and steals the next oldest
+    c = voice(engine, BLOCK * 100, 'c')
+    engine.stream.pump()
+    assert a.finished and x.finished
+    assert engine.voices_stolen == 2
+    assert b.started_frame == BLOCK and c.started_frame == BLOCK
+    assert [v.voice_id for v in engine.voices] == [c.voice_id, b.voice_id]
+
+
+def test_queued_voice_starts_when_lane_voice_is_cut_before_playing():
+    engine = make_engine()
+    engine.stream.pump()
+    a = voice(engine, BLOCK * 100, 'a', PlayMode(retrigger='toggle', queue=True), start_frame=BLOCK * 10)
+    b = voice(engine, BLOCK, 'b', PlayMode(queue=True))
+    engine.stream.pump()
+    # Pressing a toggle button again before its first sample cuts it off
+    voice(engine, BLOCK * 100, 'a', PlayMode(retrigger='toggle', queue=True), start_frame=BLOCK * 2)
+    out = engine.stream.pump()
+    assert a.finished and a.started_frame is None
+    assert b.started_frame == BLOCK * 2 and b.finished
+    assert np.allclose(out, 0.01)
+    assert engine._lane is None and not engine.queue
+
+
+def test_concurrent_starts_open_one_stream(monkeypatch):
+    opened = []
+
+    class SlowStream(FakeOutputStream):
+        def __init__(self, *args, **kwargs):
+            # Opening a real device takes a while, which is when racing starts overlap
+            time.sleep(0.05)
+            super().__init__(*args, **kwargs)
+            opened.append(self)
+    monkeypatch.setattr(sys.modules['sounddevice'], 'OutputStream', SlowStream)
+    engine = AudioEngine(0, dict(FAKE_DEVICES[0], index=0), blocksize=BLOCK)
+    barrier = threading.Barrier(4)
+
+    def start():
+        barrier.wait()
+        engine.start()
+    threads = [threading.Thread(target=start) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(opened) == 1
+    assert engine.stream is opened[0] and engine.stream.active
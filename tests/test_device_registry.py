@@ -0,0 +1,44 @@
+import io
+import types
+import device_registry
+from device_registry import DeviceRegistry
+
+
+class FakeServer:
+    """Each `pactl subscribe` replays a batch of events and exits; `pactl list` shows that session's sinks."""
+
+    def __init__(self, sessions):
+        self.sessions = list(sessions)
+        self.sinks = {}
+
+    def popen(self, args, **kwargs):
+        if not self.sessions:
+            raise FileNotFoundError('pactl')
+        self.sinks, events = self.sessions.pop(0)
+        return types.SimpleNamespace(stdout=io.StringIO(''.join(f"Event '{e}' on sink #{i}\n" for e, i in events)),
+                                     wait=lambda: 1, returncode=1)
+
+    def run(self, args, **kwargs):
+        if args[2] == 'sources':
+            return types.SimpleNamespace(stdout='')
+        return types.SimpleNamespace(stdout=''.join(f"Sink #{index}\n\tName: sink{index}\n\tDescription: {name}\n"
+                                                    for index, name in self.sinks.items()))
+
+
+def test_hotplug_watcher_names_removed_devices_and_restarts(monkeypatch):
+    server = FakeServer([
+        ({1: 'SoundboardSink', 2: 'USB Headset', 3: 'HDMI Output'}, [('new', 3), ('remove', 2), ('remove', 9)]),
+        # The sound server restarted without the HDMI output; nothing reports its removal
+        ({1: 'SoundboardSink'}, []),
+    ])
+    monkeypatch.setattr(device_registry.subprocess, 'Popen', server.popen)
+    monkeypatch.setattr(device_registry.subprocess, 'run', server.run)
+    monkeypatch.setattr(device_registry.time, 'sleep', lambda seconds: None)
+    registry = DeviceRegistry()
+    registry.stale = False
+    events = []
+    registry.add_listener(lambda event, name: events.append((event, name)))
+    # Returns once pactl can no longer be started
+    registry._watch()
+    assert events == [('new', 'HDMI Output'), ('remove', 'USB Headset'), ('remove', None), ('remove', 'HDMI Output')]
+    assert registry.stale
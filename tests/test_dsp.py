@@ -0,0 +1,30 @@
+import numpy as np
+import pytest
+from dsp import PV_FRAME, time_stretch, pitch_shift, render
+from dsp_params import DspParams
+
+
+def tone(frames, samplerate=48000, freq=440.0):
+    t = np.arange(frames) / samplerate
+    return (0.5 * np.sin(2 * np.pi * freq * t)[:, np.newaxis] * np.ones((1, 2))).astype(np.float32)
+
+
+@pytest.mark.parametrize('frames', [1, 100, 1000, PV_FRAME - 1, PV_FRAME, 5000, 48000])
+@pytest.mark.parametrize('rate', [0.25, 0.5, 0.9, 1.5, 2.0, 4.0])
+def test_time_stretch_length(frames, rate):
+    assert len(time_stretch(tone(frames), rate)) == round(frames / rate)
+
+
+@pytest.mark.parametrize('frames', [1, 100, 1000, PV_FRAME - 1, 5000, 48000])
+@pytest.mark.parametrize('semitones', [-24, -12, -5, 3, 7, 12, 24])
+def test_pitch_shift_keeps_length(frames, semitones):
+    assert pitch_shift(tone(frames), 48000, semitones).shape == (frames, 2)
+
+
+def test_short_clip_is_pitch_shifted():
+    data = tone(1000, freq=1000.0)
+    shifted = render(data, 48000, DspParams(pitch=12.0))
+    assert shifted.shape == data.shape
+    # An octave up moves the peak from about 1 kHz to about 2 kHz
+    spectrum = np.abs(np.fft.rfft(shifted[:, 0] * np.hanning(len(shifted)), n=48000))
+    assert 1900 <= np.argmax(spectrum) <= 2100
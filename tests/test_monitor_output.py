@@ -0,0 +1,71 @@
+import numpy as np
+import pytest
+import audio_engine
+from fakes import FAKE_DEVICES
+from audio_engine import AudioEngine, BufferVoice
+from monitor_output import MonitorEngine, DRIFT_MIN_SECONDS
+
+BLOCK = 256
+
+
+def make_monitor():
+    reference = AudioEngine(0, dict(FAKE_DEVICES[0], index=0), blocksize=BLOCK)
+    monitor = MonitorEngine(1, dict(FAKE_DEVICES[1], index=1), reference, blocksize=BLOCK)
+    reference.start()
+    monitor.start()
+    return reference, monitor
+
+
+def test_measured_drift_converges_on_clock_ratio(monkeypatch):
+    now = [0.0]
+    monkeypatch.setattr(audio_engine.time, 'perf_counter', lambda: now[0])
+    reference, monitor = make_monitor()
+    # The reference device runs 100 ppm fast and the monitor 50 ppm slow
+    rates = {reference: 48000 * (1 + 100e-6), monitor: 48000 * (1 - 50e-6)}
+    due = {reference: 0.0, monitor: 0.0}
+    expected = rates[reference] / rates[monitor]
+    # Callbacks run up to half a millisecond late, which a longer measurement averages out
+    jitter = np.random.default_rng(0)
+    errors = []
+    while now[0] < 6 * DRIFT_MIN_SECONDS:
+        # Run whichever device asks for its next block first, as the two audio threads would
+        engine = min(due, key=due.get)
+        now[0] = due[engine] + jitter.uniform(0, 0.0005)
+        engine.stream.pump()
+        due[engine] += BLOCK / rates[engine]
+        if engine is monitor and monitor.drift_step != 1.0:
+            # Nothing is corrected until both clocks have been measured for long enough
+            assert now[0] >= DRIFT_MIN_SECONDS
+            errors.append(abs(monitor.drift_step - expected))
+    tenth = len(errors) // 10
+    assert max(errors[-tenth:]) < (expected - 1) / 10
+    assert np.mean(errors[-tenth:]) < np.mean(errors[:tenth]) / 2
+
+
+@pytest.mark.parametrize('step', [0.99, 1.01])
+def test_stretched_mix_is_continuous_across_blocks(step):
+    reference, monitor = make_monitor()
+    slope = 1e-5
+    ramp = np.repeat((np.arange(BLOCK * 40) * slope)[:, np.newaxis], 2, axis=1).astype(np.float32)
+    monitor.play_voice(BufferVoice(ramp, monitor.next_voice_id()))
+    blocks = []
+    for _ in range(20):
+        out = np.empty((BLOCK, 2), dtype=np.float32)
+        monitor._mix_stretched(out, BLOCK, step)
+        blocks.append(out)
+    out = np.concatenate(blocks)[:, 0]
+    # A stretched ramp is still a ramp: no step or repeated frame where the blocks meet
+    assert out[0] == 0.0
+    assert np.allclose(np.diff(out), slope * step, atol=1e-7)
+
+
+def test_stretched_mix_carry_stays_bounded():
+    reference, monitor = make_monitor()
+    monitor.play_voice(BufferVoice(np.zeros((BLOCK * 5000, 2), dtype=np.float32), monitor.next_voice_id(), loop=True))
+    longest = 0
+    for i in range(4000):
+        out = np.empty((BLOCK, 2), dtype=np.float32)
+        monitor._mix_stretched(out, BLOCK, 1.0015 if i % 2 else 0.9985)
+        longest = max(longest, len(monitor._carry))
+        assert 0.0 <= monitor._phase < 1.0
+    assert longest <= 2
@@ -0,0 +1,81 @@
+from fakes import FakePactl
+from pipewire_graph import PipeWireGraph, SOUNDBOARD_SINK, MIX_SINK
+
+FOREIGN_LOOPBACK = ('module-loopback', 'source=bluez_input.headset sink=alsa_output.speakers')
+
+
+def loads(pactl):
+    return [call for call in pactl.calls if call[0] == 'load-module']
+
+
+def test_ensure_loads_topology_once():
+    pactl = FakePactl()
+    graph = PipeWireGraph(runner=pactl)
+    assert graph.ensure() == 5
+    assert len(graph.owned) == 5
+    pactl.calls.clear()
+    assert graph.ensure() == 0
+    assert loads(pactl) == []
+    assert graph.pactl_calls == 1
+    assert len(pactl.modules) == 5
+
+
+def test_existing_duplicates_are_counted_not_loaded():
+    soundboard_loopback = ('module-loopback', f"source={SOUNDBOARD_SINK}.monitor sink={MIX_SINK}")
+    pactl = FakePactl({
+        10: ('module-null-sink', f"sink_name={SOUNDBOARD_SINK}"),
+        11: ('module-null-sink', f"sink_name={SOUNDBOARD_SINK}"),
+        12: soundboard_loopback,
+        13: soundboard_loopback,
+        14: soundboard_loopback,
+    })
+    graph = PipeWireGraph(runner=pactl)
+    assert graph.ensure() == 3
+    assert graph.duplicates == 3
+    loaded = [call[1] for call in loads(pactl)]
+    assert sorted(loaded) == ['module-loopback', 'module-null-sink', 'module-remap-source']
+    # The mic loopback is the one that was missing, so only it resolves the default source
+    assert ['get-default-source'] in pactl.calls
+
+
+def test_cleanup_unloads_only_owned_modules():
+    pactl = FakePactl({
+        10: ('module-null-sink', f"sink_name={SOUNDBOARD_SINK}"),
+        20: FOREIGN_LOOPBACK,
+    })
+    graph = PipeWireGraph(runner=pactl)
+    graph.ensure()
+    owned = list(graph.owned)
+    graph.cleanup()
+    unloaded = [int(call[1]) for call in pactl.calls if call[0] == 'unload-module']
+    assert sorted(unloaded) == sorted(owned)
+    assert 10 not in unloaded and 20 not in unloaded
+    assert pactl.modules == {10: ('module-null-sink', f"sink_name={SOUNDBOARD_SINK}"), 20: FOREIGN_LOOPBACK}
+    assert graph.owned == []
+
+
+def test_native_mix_keeps_foreign_loopbacks():
+    pactl = FakePactl({20: FOREIGN_LOOPBACK})
+    graph = PipeWireGraph(runner=pactl)
+    graph.ensure()
+    graph.set_native_mix(True)
+    names = [name for name, _ in pactl.modules.values()]
+    assert names.count('module-loopback') == 1
+    assert pactl.modules[20] == FOREIGN_LOOPBACK
+    graph.cleanup()
+    assert pactl.modules == {20: FOREIGN_LOOPBACK}
+
+
+def test_native_mix_only_unloads_its_own_loopbacks_into_the_mix():
+    # Another application's loopback into the mix sink, e.g. a second soundboard
+    foreign = ('module-loopback', f"source=alsa_input.usb-mic sink={MIX_SINK}")
+    pactl = FakePactl({30: foreign})
+    graph = PipeWireGraph(runner=pactl)
+    graph.ensure()
+    graph.set_native_mix(True)
+    assert pactl.modules[30] == foreign
+    assert graph.foreign_loopbacks == 1
+    assert graph.stats()['foreign_loopbacks'] == 1
+    # The soundboard loopback was ours; the mic one was already there, so it was never loaded
+    loopbacks = [module_id for module_id, (name, _) in pactl.modules.items() if name == 'module-loopback']
+    assert loopbacks == [30]
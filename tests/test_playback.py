@@ -0,0 +1,51 @@
+import numpy as np
+import soundfile as sf
+import pytest
+import audio_stream
+import playback
+from fakes import FAKE_DEVICES
+from audio_cache import audio_cache
+from audio_engine import AudioEngine
+from monitor_output import MonitorEngine
+
+BLOCK = 256
+
+
+@pytest.fixture
+def long_clip(tmp_path, monkeypatch):
+    # Anything over a second is streamed; the tone's level tells the outputs' audio apart from silence
+    monkeypatch.setattr(audio_cache, 'stream_threshold_seconds', 1.0)
+    path = str(tmp_path / 'long.wav')
+    sf.write(path, np.full((48000 * 3, 2), 0.25, dtype=np.float32), 48000)
+    return path
+
+
+def test_streamed_clip_is_decoded_once_for_all_outputs(long_clip, monkeypatch):
+    opened = []
+    # Only count the reader: deciding to stream the clip reads its header once too
+    audio_cache.duration(long_clip)
+
+    class CountingSoundFile(sf.SoundFile):
+        def __init__(self, *args, **kwargs):
+            super().__init__(*args, **kwargs)
+            opened.append(self)
+    monkeypatch.setattr(audio_stream.sf, 'SoundFile', CountingSoundFile)
+    engine = AudioEngine(0, dict(FAKE_DEVICES[0], index=0), blocksize=BLOCK)
+    # A 48 kHz monitor shares the file's format; the 44.1 kHz one is resampled
+    engine.monitors = [MonitorEngine(1, dict(FAKE_DEVICES[1], index=1), engine, blocksize=BLOCK),
+                       MonitorEngine(2, dict(FAKE_DEVICES[2], index=2), engine, blocksize=BLOCK)]
+    engine.start()
+    for monitor in engine.monitors:
+        monitor.start()
+    voice_id = playback.start_clip(engine, long_clip)
+    for output in [engine] + engine.monitors:
+        output.stream.pump()
+        out = output.stream.pump()
+        assert np.allclose(out, 0.25, atol=0.01), output.device_name
+    assert len(opened) == 1
+    voices = [v for output in [engine] + engine.monitors for v in output.voices]
+    assert [v.voice_id for v in voices] == [voice_id] * 3
+    assert len({v.reader for v in voices}) == 1
+    engine.stop(voice_id)
+    engine.stream.pump()
+    assert voices[0].closed
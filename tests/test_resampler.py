@@ -0,0 +1,22 @@
+import numpy as np
+import pytest
+from resampler import resample, StreamingResampler, QUALITY_SETTINGS
+
+RATE_PAIRS = [(44100, 48000), (48000, 44100), (48000, 16000), (16000, 48000), (48000, 24000), (8000, 48000)]
+
+
+def stream(data, src_rate, dst_rate, quality, block):
+    resampler = StreamingResampler(src_rate, dst_rate, data.shape[1], quality)
+    blocks = [resampler.process(data[i:i + block]) for i in range(0, len(data), block)]
+    return np.concatenate(blocks + [resampler.flush()])
+
+
+@pytest.mark.parametrize('quality', sorted(QUALITY_SETTINGS))
+@pytest.mark.parametrize('src_rate, dst_rate', RATE_PAIRS)
+@pytest.mark.parametrize('block', [1, 37, 512, 8192])
+def test_streaming_matches_one_shot(quality, src_rate, dst_rate, block):
+    data = (np.random.default_rng(0).standard_normal((6000, 2)) * 0.1).astype(np.float32)
+    expected = resample(data, src_rate, dst_rate, quality)
+    out = stream(data, src_rate, dst_rate, quality, block)
+    assert out.shape == expected.shape
+    np.testing.assert_allclose(out, expected, atol=1e-5)
@@ -0,0 +1,44 @@
+import sqlite3
+import pytest
+import soundboard_db
+from soundboard_db import SoundboardDB
+from play_mode import PlayMode
+
+
+def test_library_migration_can_run_again(tmp_path):
+    path = str(tmp_path / 'soundboard.db')
+    SoundboardDB(path).close()
+    conn = sqlite3.connect(path)
+    # An index left without its sync triggers has them recreated rather than being taken for no FTS5
+    with conn:
+        for name in ('library_files_ai', 'library_files_ad', 'library_files_au'):
+            conn.execute(f'DROP TRIGGER {name}')
+        soundboard_db._migrate_v5(conn.cursor())
+    conn.close()
+    db = SoundboardDB(path)
+    db.save_library_files([{'path': '/sounds/horn.wav', 'name': 'horn.wav', 'format': 'WAV', 'duration': 1.0,
+                            'samplerate': 48000, 'channels': 2, 'size': 1000, 'mtime': 0.0}])
+    assert db.has_fts
+    assert [entry['path'] for entry in db.search_library('horn')] == ['/sounds/horn.wav']
+    db.close()
+
+
+def test_interrupted_migration_is_rolled_back(tmp_path, monkeypatch):
+    path = str(tmp_path / 'soundboard.db')
+    monkeypatch.setattr(soundboard_db, 'MIGRATIONS', soundboard_db.MIGRATIONS[:6])
+    SoundboardDB(path).close()
+
+    def interrupted_v7(cur):
+        cur.execute("ALTER TABLE buttons ADD COLUMN retrigger TEXT DEFAULT 'overlap'")
+        cur.execute('ALTER TABLE buttons ADD COLUMN choke_group INTEGER DEFAULT 0')
+        raise KeyboardInterrupt
+    monkeypatch.setattr(soundboard_db, 'MIGRATIONS', soundboard_db.MIGRATIONS + [interrupted_v7])
+    with pytest.raises(KeyboardInterrupt):
+        SoundboardDB(path)
+    monkeypatch.undo()
+    db = SoundboardDB(path)
+    assert db.schema_version() == len(soundboard_db.MIGRATIONS)
+    db.save_config('Show', [{'label': 'Horn', 'audio_path': '/sounds/horn.wav', 'row': 0, 'col': 0,
+                             'mode': PlayMode(choke_group=2)}], 1, 1)
+    assert db.get_config_buttons(1)[0][5] == PlayMode(choke_group=2)
+    db.close()
@@ -0,0 +1,171 @@
+import os
+import time
+import types
+import threading
+import pytest
+import triggers
+import playback
+from triggers import TriggerDispatcher, EvdevSource, MidiSource, midi_code
+from soundboard_db import SoundboardDB
+from play_mode import PlayMode
+
+EV_KEY = 1
+KEY_F13 = 183
+KEY_F14 = 184
+FAKE_ECODES = types.SimpleNamespace(EV_KEY=EV_KEY, KEY={KEY_F13: 'KEY_F13', KEY_F14: 'KEY_F14'})
+
+
+class FakeInputDevice:
+    """Stands in for evdev.InputDevice: a pipe the selector can wait on and a queue of events."""
+
+    def __init__(self):
+        self._read_fd, self._write_fd = os.pipe()
+        self.events = []
+
+    def fileno(self):
+        return self._read_fd
+
+    def send(self, code, value):
+        self.events.append(types.SimpleNamespace(type=EV_KEY, code=code, value=value))
+        os.write(self._write_fd, b'\0')
+
+    def read(self):
+        os.read(self._read_fd, 4096)
+        events, self.events = self.events, []
+        return events
+
+    def close(self):
+        if self._read_fd is not None:
+            os.close(self._read_fd)
+            os.close(self._write_fd)
+            self._read_fd = self._write_fd = None
+
+
+@pytest.fixture
+def db(tmp_path):
+    db = SoundboardDB(str(tmp_path / 'soundboard.db'))
+    yield db
+    db.close()
+
+
+@pytest.fixture
+def played(monkeypatch):
+    calls = []
+    done = threading.Event()
+
+    def start_clip(engine, audio_path, event_time, dsp=None, mode=None, cell=None):
+        calls.append((engine, audio_path, dsp, mode, cell))
+        done.set()
+    monkeypatch.setattr(playback, 'start_clip', start_clip)
+    return types.SimpleNamespace(calls=calls, done=done)
+
+
+def saved_board(db):
+    buttons = [
+        {'label': 'Horn', 'audio_path': '/sounds/horn.wav', 'row': 0, 'col': 0},
+        {'label': 'Drum', 'audio_path': '/sounds/drum.wav', 'row': 0, 'col': 1, 'mode': PlayMode(loop=True)},
+    ]
+    return db.save_config('Show', buttons, 2, 2)
+
+
+def load_bindings(db, config_id, dispatcher):
+    # What the window does in load_triggers / update_trigger_map
+    cells = {(row, col): (label, audio_path, dsp, mode)
+             for label, audio_path, row, col, dsp, mode in db.get_config_buttons(config_id)}
+    dispatcher.set_bindings({
+        (kind, code): cells[(row, col)][1:] + ((row, col),)
+        for kind, code, row, col in db.get_triggers(config_id) if (row, col) in cells
+    })
+
+
+def test_midi_note_on_plays_bound_button(db, played):
+    config_id = saved_board(db)
+    db.set_trigger(config_id, 'midi', midi_code(0, 60), 0, 1)
+    engine = object()
+    dispatcher = TriggerDispatcher(lambda: engine)
+    load_bindings(db, config_id, dispatcher)
+    source = MidiSource(dispatcher)
+    source._on_message(([0x90, 60, 100], 0.0))
+    assert played.calls == [(engine, '/sounds/drum.wav', None, PlayMode(loop=True), (0, 1))]
+    assert dispatcher.dispatched == 1
+
+
+def test_midi_note_off_and_unbound_notes_are_ignored(db, played):
+    config_id = saved_board(db)
+    db.set_trigger(config_id, 'midi', midi_code(0, 60), 0, 1)
+    dispatcher = TriggerDispatcher(lambda: object())
+    load_bindings(db, config_id, dispatcher)
+    source = MidiSource(dispatcher)
+    source._on_message(([0x80, 60, 0], 0.0))
+    # Note-on with velocity 0 is a note-off too
+    source._on_message(([0x90, 60, 0], 0.0))
+    source._on_message(([0x90, 61, 100], 0.0))
+    source._on_message(([0x91, 60, 100], 0.0))
+    source._on_message(([0xB0, 60, 127], 0.0))
+    assert played.calls == []
+    assert dispatcher.dispatched == 0
+
+
+def test_learned_midi_note_is_persisted(db, played):
+    config_id = saved_board(db)
+    dispatcher = TriggerDispatcher(lambda: object())
+    dispatcher.learn(lambda kind, code: db.set_trigger(config_id, kind, code, 0, 0))
+    source = MidiSource(dispatcher)
+    source._on_message(([0x92, 64, 90], 0.0))
+    assert played.calls == []
+    assert db.get_triggers(config_id) == [('midi', midi_code(2, 64), 0, 0)]
+    # Learn mode only takes one event; the next one plays the new binding
+    load_bindings(db, config_id, dispatcher)
+    source._on_message(([0x92, 64, 90], 0.0))
+    assert played.calls[0][1] == '/sounds/horn.wav'
+
+
+@pytest.fixture
+def keyboard(monkeypatch):
+    monkeypatch.setattr(triggers, 'ecodes', FAKE_ECODES, raising=False)
+    device = FakeInputDevice()
+    yield device
+    device.close()
+
+
+def test_key_press_plays_bound_button(db, played, keyboard):
+    config_id = saved_board(db)
+    db.set_trigger(config_id, 'key', 'KEY_F13', 0, 0)
+    engine = object()
+    dispatcher = TriggerDispatcher(lambda: engine)
+    load_bindings(db, config_id, dispatcher)
+    source = EvdevSource(dispatcher, [keyboard])
+    assert source.start()
+    try:
+        # Releases, auto-repeats and unbound keys must not play anything
+        keyboard.send(KEY_F14, 1)
+        keyboard.send(KEY_F13, 2)
+        keyboard.send(KEY_F13, 0)
+        keyboard.send(KEY_F13, 1)
+        assert played.done.wait(2.0)
+        time.sleep(0.05)
+    finally:
+        source.stop()
+    assert played.calls == [(engine, '/sounds/horn.wav', None, None, (0, 0))]
+
+
+def test_learned_key_is_persisted(db, played, keyboard):
+    config_id = saved_board(db)
+    learned = threading.Event()
+    dispatcher = TriggerDispatcher(lambda: object())
+
+    def bind(kind, code):
+        db_thread = SoundboardDB(db.path)
+        db_thread.set_trigger(config_id, kind, code, 0, 1)
+        db_thread.close()
+        learned.set()
+    dispatcher.learn(bind)
+    source = EvdevSource(dispatcher, [keyboard])
+    source.start()
+    try:
+        keyboard.send(KEY_F14, 1)
+        assert learned.wait(2.0)
+    finally:
+        source.stop()
+    assert played.calls == []
+    assert db.get_triggers(config_id) == [('key', 'KEY_F14', 0, 1)]
@@ -0,0 +1,199 @@
+import time
+import logging
+import selectors
+import threading
+
+logger = logging.getLogger(__name__)
+
+try:
+    import evdev
+    from evdev import ecodes
+except ImportError:
+    evdev = None
+
+try:
+    import rtmidi
+except ImportError:
+    rtmidi = None
+
+KEY_DOWN = 1
+MIDI_NOTE_ON = 0x90
+
+
+def midi_code(channel, note):
+    return f"ch{channel + 1}:{note}"
+
+
+class TriggerDispatcher:
+    """Maps input events to clips and starts them on the engine directly.
+
+    Sources call ``handle`` on their own threads. Bindings are kept as a
+    ready-made (kind, code) -> (audio path, dsp, mode, cell) map that the UI replaces wholesale,
+    so the input threads never wait on Qt. In learn mode the next event is
+    handed to the learn callback instead of playing anything.
+    """
+
+    def __init__(self, engine_getter):
+        self.engine_getter = engine_getter
+        self.bindings = {}
+        self.learn_callback = None
+        self.sources = []
+        self.dispatched = 0
+        self.errors = 0
+
+    def set_bindings(self, bindings):
+        self.bindings = bindings
+
+    def learn(self, callback):
+        self.learn_callback = callback
+
+    def handle(self, kind, code, event_time=None):
+        event_time = event_time or time.perf_counter()
+        learn_callback = self.learn_callback
+        if learn_callback is not None:
+            self.learn_callback = None
+            learn_callback(kind, code)
+            return
+        binding = self.bindings.get((kind, code))
+        if not binding:
+            return
+        # Deferred so that the window can build the dispatcher before numpy is loaded
+        from playback import start_clip
+        audio_path, dsp, mode, cell = binding
+        engine = self.engine_getter()
+        if engine is None:
+            logger.warning(f"Trigger {kind} {code} ignored, no audio engine")
+            return
+        try:
+            start_clip(engine, audio_path, event_time, dsp, mode, cell)
+            self.dispatched += 1
+        except Exception as e:
+            self.errors += 1
+            logger.error(f"Could not play {audio_path} for trigger {kind} {code}: {e}")
+
+    def start(self, keyboard=True, midi=True, midi_port=None):
+        """Start every available source; returns the names of those that started."""
+        started = []
+        if keyboard:
+            if evdev is None:
+                logger.info("evdev is not installed, global hotkeys are disabled")
+            else:
+                source = EvdevSource(self)
+                if source.start():
+                    self.sources.append(source)
+                    started.append('keyboard')
+        if midi:
+            if rtmidi is None:
+                logger.info("python-rtmidi is not installed, MIDI triggers are disabled")
+            else:
+                source = MidiSource(self, midi_port)
+                if source.start():
+                    self.sources.append(source)
+                    started.append('midi')
+        return started
+
+    def stop(self):
+        for source in self.sources:
+            source.stop()
+        self.sources = []
+
+    def stats(self):
+        return {'bindings': len(self.bindings), 'dispatched': self.dispatched, 'errors': self.errors,
+                'sources': [type(source).__name__ for source in self.sources]}
+
+
+class EvdevSource:
+    """Global key presses read straight from /dev/input.
+
+    Works the same under X11 and Wayland since it sits below the display
+    server; the user needs read access to the event devices (usually the
+    ``input`` group). Devices are not grabbed, so keys still reach other apps.
+    """
+
+    def __init__(self, dispatcher, devices=None):
+        self.dispatcher = dispatcher
+        self.devices = devices
+        self.selector = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self.devices is None:
+            self.devices = []
+            for path in evdev.list_devices():
+                try:
+                    device = evdev.InputDevice(path)
+                except OSError as e:
+                    logger.debug(f"Cannot open {path}: {e}")
+                    continue
+                if ecodes.EV_KEY in device.capabilities():
+                    self.devices.append(device)
+                else:
+                    device.close()
+        if not self.devices:
+            logger.warning("No readable keyboard devices found for global hotkeys")
+            return False
+        self.selector = selectors.DefaultSelector()
+        for device in self.devices:
+            self.selector.register(device, selectors.EVENT_READ)
+        self._thread = threading.Thread(target=self._run, name='evdev-triggers', daemon=True)
+        self._thread.start()
+        logger.info(f"Listening for hotkeys on {len(self.devices)} devices")
+        return True
+
+    def _run(self):
+        while not self._stop.is_set():
+            for key, _ in self.selector.select(timeout=0.5):
+                try:
+                    events = key.fileobj.read()
+                except OSError:
+                    # Device unplugged
+                    self.selector.unregister(key.fileobj)
+                    continue
+                for event in events:
+                    if event.type == ecodes.EV_KEY and event.value == KEY_DOWN:
+                        name = ecodes.KEY.get(event.code, event.code)
+                        if isinstance(name, list):
+                            name = name[0]
+                        self.dispatcher.handle('key', str(name), time.perf_counter())
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(1.0)
+        for device in self.devices or []:
+            device.close()
+
+
+class MidiSource:
+    """Note-on messages from an ALSA sequencer / JACK MIDI port via python-rtmidi."""
+
+    def __init__(self, dispatcher, port_name=None):
+        self.dispatcher = dispatcher
+        self.port_name = port_name
+        self.midi_in = None
+
+    def start(self):
+        self.midi_in = rtmidi.MidiIn()
+        ports = self.midi_in.get_ports()
+        if not ports:
+            # A virtual port lets other software (or a test) send notes to us
+            self.midi_in.open_virtual_port('pySoundBoard')
+            logger.info("No MIDI inputs found, opened virtual port 'pySoundBoard'")
+        else:
+            index = next((i for i, name in enumerate(ports) if self.port_name and self.port_name in name), 0)
+            self.midi_in.open_port(index)
+            logger.info(f"Listening for MIDI notes on {ports[index]}")
+        self.midi_in.set_callback(self._on_message)
+        return True
+
+    def _on_message(self, message, data=None):
+        event_time = time.perf_counter()
+        status, *params = message[0]
+        if status & 0xF0 == MIDI_NOTE_ON and len(params) == 2 and params[1] > 0:
+            self.dispatcher.handle('midi', midi_code(status & 0x0F, params[0]), event_time)
+
+    def stop(self):
+        if self.midi_in is not None:
+            self.midi_in.close_port()
+            self.midi_in = None